@@ -1,69 +1,40 @@
 import streamlit as st
-import json
 import os
 import time
 import pandas as pd
-import base64
 
 # --- 1. 基础配置与模块导入 ---
 st.set_page_config(page_title="智慧医疗装备管理平台", layout="wide")
 
+# 扫码通道：带签名的 ?asset= 链接只渲染设备卡片与报修表单，跳过样式注入、侧边栏与全量资产表
+if "asset" in st.query_params:
+    from modules.scan_page import show_scan
+    show_scan(st.query_params["asset"])
+    st.stop()
+
 try:
     from modules.asset_page import show_asset
     from modules.repair_page import show_repair
-    from modules.file_library import show_library
+    from modules.file_library import show_library, show_upload_panel
+    from modules.storage import get_backend, migrate_to_sqlite
+    from modules.asset_import import run_import, upsert_import
+    from modules.branding import save_logo, remove_logo, logo_data_uri, migrate_inline_logo
+    from modules.settings import get_config, get_users
+    from modules.auth import SESSION_COOKIE, authenticate, hash_password, issue_session, verify_session, \
+        end_sessions, end_session, cookie_script
+    from modules.profiling import QUERY_FLAG, env_enabled, start_run, finish_run, stage, render_overlay
 except ImportError as e:
     st.error(f"核心模块导入失败: {e}")
 
 CONFIG_PATH = "data/config.json"
-USERS_PATH = "data/users.json"
-EQUIPMENT_PATH = "data/equipment.csv"
-
-def load_json_data(path, default_val):
-    if not os.path.exists(path):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(default_val, f, ensure_ascii=False, indent=4)
-        return default_val
-    with open(path, 'r', encoding='utf-8') as f:
-        try: return json.load(f)
-        except: return default_val
-
-def save_json_data(path, data):
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
-# 将上传的图片转为 Base64 字符串
-def img_to_base64(image_file):
-    return base64.b64encode(image_file.read()).decode()
+# 分段耗时：环境变量 APP_PROFILE=1 全局开启，或登录后在地址后加 ?profile=1 查看当前页面
+start_run(env_enabled() or st.query_params.get(QUERY_FLAG) == "1")
 
 # --- 资产数据合并导入逻辑 ---
-def run_hospital_import_logic():
-    standard_columns = [
-        "序号", "科室", "设备名称", "资产国标代码", "国标代码+地点+流水", "设备SN码", 
-        "老编号", "价值", "设备名", "数量", "品牌", "型号", "生产编号", 
-        "出厂日期", "价格", "验收日期", "设备状态", "械字号", "使用年限", 
-        "调拨情况", "可报废年限", "厂家电话", "工作站厂家", "工作站厂家电话", "备注"
-    ]
-    files = [f"三院资产表_已填充国标码.xlsx - Sheet{i}.csv" for i in range(1, 5)]
-    all_data = []
-    for f in files:
-        if os.path.exists(f):
-            df_temp = pd.read_csv(f, encoding='utf-8-sig')
-            df_std = pd.DataFrame(columns=standard_columns)
-            for col in df_temp.columns:
-                if col == "设备名": df_std["设备名称"] = df_temp["设备名"]
-                elif col == "设备名.1": df_std["设备名"] = df_temp["设备名.1"]
-                elif col in standard_columns: df_std[col] = df_temp[col]
-                elif col == "编号": df_std["老编号"] = df_temp["编号"]
-            all_data.append(df_std)
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-        final_df['序号'] = range(1, len(final_df) + 1)
-        os.makedirs("data", exist_ok=True)
-        final_df.to_csv(EQUIPMENT_PATH, index=False, encoding='utf-8-sig')
-        return len(final_df)
-    return 0
+def run_hospital_import_logic(sources=None, progress=None):
+    # 并行分块读取各工作表/CSV，按映射表归一化后流式写入资产存储
+    with stage("import"):
+        return run_import(sources, progress=progress)["rows"]
 
 # --- 2. 深度视觉样式优化 ---
 def apply_premium_style():
@@ -166,23 +137,42 @@ apply_premium_style()
 
 # --- 3. 初始化配置 ---
 ALL_PERMS = ["资产档案", "维修管理", "工作文库", "核心文件", "后台管理"]
-config = load_json_data(CONFIG_PATH, {
-    "sidebar_title": "梅州市\n第三人民医院\n装备科平台", 
-    "main_title": "医疗装备\n全生命周期管理平台",
-    "nav_label": "导航栏",
-    "logo_base64": ""
-})
-users_db = load_json_data(USERS_PATH, {"admin": {"password": "123", "name": "设备科科长", "perms": ALL_PERMS}})
+# 配置与账号均为进程级缓存，文件变化才重新读取；写入按键合并并加文件锁
+with stage("config"):
+    settings = get_config(CONFIG_PATH, {
+        "sidebar_title": "梅州市\n第三人民医院\n装备科平台", 
+        "main_title": "医疗装备\n全生命周期管理平台",
+        "nav_label": "导航栏",
+        "logo_version": ""
+    })
+    config = settings.get()
+    # 旧配置里内嵌的原图 base64 一次性转存为缩放后的文件
+    if migrate_inline_logo(config):
+        config = settings.update({"logo_version": config.get("logo_version", "")}, remove=["logo_base64"])
+    # 账号数据由存储后端提供 (默认 users.json，启用 SQLite 后为 users 表)
+    users = get_users({"admin": {"password": "123", "name": "设备科科长", "perms": ALL_PERMS}})
+    users_db = users.all()
 
 if 'logged_in' not in st.session_state: st.session_state.logged_in = False
+# 刷新或新开标签页时凭签名会话 Cookie 恢复登录 (校验结果带 TTL 缓存)，无需再次输入密码
+if not st.session_state.logged_in and not st.session_state.get("logged_out"):
+    session = verify_session(st.context.cookies.get(SESSION_COOKIE), users)
+    if session:
+        st.session_state.logged_in = True; st.session_state.user_id = session["uid"]
+        st.session_state.user_name = session["name"]; st.session_state.user_perms = session["perms"]
+        st.session_state.session_token = st.context.cookies.get(SESSION_COOKIE)
+# 登录/注销/改密后由浏览器端写入或清除会话 Cookie
+if "cookie_update" in st.session_state:
+    st.html(cookie_script(st.session_state.pop("cookie_update")), unsafe_allow_javascript=True)
 
 # --- 4. 侧边栏渲染 ---
 with st.sidebar:
     # 新增：显示 Logo 逻辑
-    if config.get("logo_base64"):
+    logo_uri = logo_data_uri(config.get("logo_version"))
+    if logo_uri:
         st.markdown(f'''
             <div class="sidebar-logo-container">
-                <img src="data:image/png;base64,{config["logo_base64"]}" class="sidebar-logo">
+                <img src="{logo_uri}" class="sidebar-logo">
             </div>
         ''', unsafe_allow_html=True)
         
@@ -219,16 +209,20 @@ elif "用户登录" in choice:
     with st.form("login"):
         u = st.text_input("账号"); p = st.text_input("密码", type="password")
         if st.form_submit_button("验证登录"):
-            if u in users_db and users_db[u]["password"] == p:
+            # 加盐 scrypt 校验；旧明文密码在本次登录成功后自动升级为哈希
+            record = authenticate(users, u, p)
+            if record:
                 st.session_state.logged_in = True; st.session_state.user_id = u
-                st.session_state.user_name = users_db[u].get("name", "用户")
-                st.session_state.user_perms = users_db[u].get("perms", [])
+                st.session_state.user_name = record.get("name", "用户")
+                st.session_state.user_perms = record.get("perms", [])
+                st.session_state.logged_out = False
+                st.session_state.cookie_update = st.session_state.session_token = issue_session(u, record)
                 st.rerun()
             else: st.error("登录失败")
     st.markdown("</div>", unsafe_allow_html=True)
 
 elif "后台管理" in choice:
-    t1, t2, t3, t4 = st.tabs(["🖼️ 视觉配置", "👥 账号运维", "🔐 权限分配", "🚀 资产导入"])
+    t1, t2, t3, t4, t5 = st.tabs(["🖼️ 视觉配置", "👥 账号运维", "🔐 权限分配", "🚀 资产导入", "📁 文件上传"])
     with t1:
         st.subheader("品牌视觉自定义")
         
@@ -236,22 +230,38 @@ elif "后台管理" in choice:
         new_logo = st.file_uploader("上传 Logo (PNG/JPG)", type=["png", "jpg", "jpeg"])
         if new_logo:
             if st.button("🆙 应用新 Logo"):
-                config["logo_base64"] = img_to_base64(new_logo)
-                save_json_data(CONFIG_PATH, config)
+                # 缩放到显示尺寸后存为文件，config 只记录版本号
+                settings.update({"logo_version": save_logo(new_logo.getvalue())})
                 st.success("Logo 已更新！")
                 time.sleep(1)
                 st.rerun()
         
-        if config.get("logo_base64") and st.button("🗑️ 移除当前 Logo"):
-            config["logo_base64"] = ""
-            save_json_data(CONFIG_PATH, config)
+        if config.get("logo_version") and st.button("🗑️ 移除当前 Logo"):
+            remove_logo()
+            settings.update({"logo_version": ""})
             st.rerun()
             
         st.divider()
-        config['sidebar_title'] = st.text_area("左侧大标题", config['sidebar_title'])
-        config['nav_label'] = st.text_input("导航分组标题", config.get('nav_label', '导航栏'))
-        config['main_title'] = st.text_area("首页流光标题", config['main_title'])
-        if st.button("💾 保存文字配置"): save_json_data(CONFIG_PATH, config); st.rerun()
+        texts = {
+            'sidebar_title': st.text_area("左侧大标题", config['sidebar_title']),
+            'nav_label': st.text_input("导航分组标题", config.get('nav_label', '导航栏')),
+            'main_title': st.text_area("首页流光标题", config['main_title']),
+        }
+        if st.button("💾 保存文字配置"): settings.update(texts); st.rerun()
+
+        st.divider()
+        # 资产标签二维码指向该地址，须为手机扫码可访问的院内网址
+        base_url = st.text_input("扫码访问地址", config.get("public_base_url", ""),
+                                 placeholder="例如 http://10.0.0.8:8501", help="资产标签二维码中的链接前缀")
+        if os.environ.get("PUBLIC_BASE_URL"):
+            st.caption(f"当前由环境变量 PUBLIC_BASE_URL 指定：{os.environ['PUBLIC_BASE_URL']}，此处设置不生效。")
+        elif not config.get("public_base_url"):
+            st.warning("尚未配置扫码访问地址，资产标签暂不能打印。")
+        if st.button("💾 保存扫码地址"):
+            if base_url.strip() and not base_url.strip().startswith(("http://", "https://")):
+                st.error("地址须以 http:// 或 https:// 开头")
+            else:
+                settings.update({"public_base_url": base_url.strip()}); st.rerun()
         
     with t2:
         st.subheader("账号运维")
@@ -260,8 +270,7 @@ elif "后台管理" in choice:
         with st.form("add_user"):
             n_u = st.text_input("新账号"); n_n = st.text_input("姓名"); n_p = st.text_input("密码")
             if st.form_submit_button("确认创建"):
-                users_db[n_u] = {"password": n_p, "name": n_n, "perms": ["资产档案"]}
-                save_json_data(USERS_PATH, users_db); st.rerun()
+                users.update(n_u, password=hash_password(n_p), name=n_n, perms=["资产档案"]); st.rerun()
     with t3:
         st.subheader("权限分配")
         target = st.selectbox("选择员工", list(users_db.keys()))
@@ -270,18 +279,62 @@ elif "后台管理" in choice:
             p_a = st.checkbox("📊 资产档案", value="资产档案" in u_d.get("perms", []))
             p_r = st.checkbox("🛠️ 维修管理", value="维修管理" in u_d.get("perms", []))
             p_l = st.checkbox("📂 工作文库", value="工作文库" in u_d.get("perms", []))
+            p_c = st.checkbox("🔐 核心文件", value="核心文件" in u_d.get("perms", []))
             p_ad = st.checkbox("⚙️ 后台管理", value="后台管理" in u_d.get("perms", []))
             if st.form_submit_button("更新权限"):
                 new_ps = []
                 if p_a: new_ps.append("资产档案")
                 if p_r: new_ps.append("维修管理")
                 if p_l: new_ps.append("工作文库")
+                if p_c: new_ps.append("核心文件")
                 if p_ad: new_ps.append("后台管理")
-                users_db[target]["perms"] = new_ps; save_json_data(USERS_PATH, users_db); st.rerun()
+                # 权限变更后该员工已登录的会话全部失效，重新登录时按新权限生效
+                end_sessions(users, target, perms=new_ps); st.rerun()
     with t4:
+        uploads = st.file_uploader("上传资产台账 (.xlsx / .csv，可多选；不上传则读取默认导出文件)",
+                                   type=["xlsx", "csv"], accept_multiple_files=True)
+        mode = st.radio("导入方式", ["增量合并（按 SN码 / 国标代码+地点+流水 / 老编号 去重，保留手工修改）",
+                                    "覆盖重建（清空现有台账后重新导入）"])
         if st.button("🚀 合并导入资产"):
-            count = run_hospital_import_logic()
-            if count > 0: st.success(f"成功合并 {count} 条记录")
+            bar = st.progress(0.0, text="准备导入…")
+            file_box = st.empty()
+            def on_progress(stats):
+                files = stats["files"]
+                done = sum(f["status"] == "完成" for f in files.values())
+                bar.progress(done / len(files), text=f"已写入 {stats['rows']:,} 行 · {stats['rows_per_sec']:,.0f} 行/秒")
+                file_box.table(pd.DataFrame([{"来源": k, "已读行数": v["rows"], "状态": v["status"]} for k, v in files.items()]))
+            if mode.startswith("增量"):
+                r = upsert_import(uploads or None, progress=on_progress)
+                if r["rows"] > 0:
+                    st.success(f"增量合并完成：新增 {r['inserted']} 条，更新 {r['updated']} 条，"
+                               f"未变化 {r['unchanged']} 条，冲突 {r['conflicts']} 条")
+                    if r["conflict_rows"]:
+                        st.warning("以下记录的多个编码分别匹配到不同的已有设备，已跳过，请人工核对：")
+                        st.dataframe(pd.DataFrame(r["conflict_rows"]), use_container_width=True)
+                else: st.warning("未找到可导入的资产表。")
+            else:
+                count = run_hospital_import_logic(uploads or None, on_progress)
+                if count > 0: st.success(f"成功合并 {count} 条记录")
+                else: st.warning("未找到可导入的资产表。")
+
+        st.divider()
+        st.subheader("🗄️ 存储后端")
+        backend = get_backend()
+        st.caption(f"当前后端：{backend.name}（CSV/JSON 适合小规模部署；SQLite 带索引，适合大规模台账）")
+        if backend.name == "csv":
+            if st.button("📦 迁移现有数据到 SQLite 并启用"):
+                counts = migrate_to_sqlite()
+                settings.update({"storage_backend": "sqlite"})
+                st.success(f"迁移完成：资产 {counts['equipment']} 条，维修 {counts['maintenance']} 条，账号 {counts['users']} 个")
+                time.sleep(1); st.rerun()
+        else:
+            st.warning("切回 CSV 后端不会回写 SQLite 中的新数据。")
+            if st.button("↩️ 切回 CSV 后端"):
+                settings.update({"storage_backend": "csv"}); st.rerun()
+
+    with t5:
+        st.subheader("工作文件上传")
+        show_upload_panel(st.session_state.get("user_perms", []), st.session_state.user_name, "admin")
 
 elif "资产档案" in choice: show_asset()
 elif "维修管理" in choice: show_repair()
@@ -290,6 +343,18 @@ elif "个人中心" in choice:
     with st.form("pwd"):
         np = st.text_input("新密码", type="password")
         if st.form_submit_button("修改"):
-            users_db[st.session_state.user_id]["password"] = np
-            save_json_data(USERS_PATH, users_db); st.success("成功")
-elif "注销退出" in choice: st.session_state.logged_in = False; st.rerun()
+            uid = st.session_state.user_id
+            end_sessions(users, uid, password=hash_password(np))
+            # 改密后旧令牌失效，给当前浏览器换发新令牌
+            st.session_state.cookie_update = st.session_state.session_token = issue_session(uid, users.get(uid))
+            st.success("成功")
+elif "注销退出" in choice:
+    # 只吊销当前浏览器的令牌 (服务端记录，其他进程同样拒绝)，其他设备上的登录不受影响
+    end_session(users, st.session_state.pop("session_token", None))
+    st.session_state.logged_in = False; st.session_state.logged_out = True
+    st.session_state.cookie_update = None; st.rerun()
+
+# 分段耗时浮层 (仅在开启剖析时显示)
+stages = finish_run()
+if stages and (env_enabled() or st.session_state.logged_in):
+    render_overlay(stages)
@@ -0,0 +1,206 @@
+"""
+合成医院资产数据：按真实的 25 列台账结构生成 equipment.csv / maintenance.csv 与工作文库文件，
+日期列混用 2015-03-01、2015.03、2015年3月、Excel 序列号、空值等格式，与导入的原始台账一致。
+
+    python -m benchmarks.generate --rows 100000 --out /tmp/mz_data
+"""
+import argparse
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from modules.asset_import import DEFAULT_SOURCES
+from modules.repair_store import STATUS_FLOW, APPROVAL_BY_STATUS
+from modules.storage import ASSET_COLUMNS, MAINTENANCE_COLUMNS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 仓库自带的真实模板，按仓库根目录定位，不依赖当前工作目录
+TEMPLATES_DIR = os.path.join(ROOT, "work_files")
+CHUNK_ROWS = 50000
+DEPARTMENTS = ["ICU", "手术室", "放射科", "检验科", "急诊科", "内科", "外科", "儿科", "妇产科", "康复科",
+               "口腔科", "眼科", "超声科", "心内科", "神经内科", "呼吸内科", "消化内科", "病理科"]
+# (设备名称, 型号, 价值区间)
+DEVICES = [
+    ("监护仪", ["iMEC8", "uMEC10", "BeneView T5"], (8000, 60000)),
+    ("呼吸机", ["SV300", "Savina 300", "Bellavista"], (80000, 400000)),
+    ("输液泵", ["SK-600II", "BeneFusion VP3"], (3000, 12000)),
+    ("除颤仪", ["BeneHeart D3", "M3535A"], (30000, 120000)),
+    ("B超", ["Resona 7", "LOGIQ E10", "EPIQ 7"], (300000, 1800000)),
+    ("CT", ["uCT 760", "Revolution ACT"], (2000000, 9000000)),
+    ("DR", ["uDR 780i", "DigitalDiagnost"], (600000, 2500000)),
+    ("心电图机", ["ECG-1250", "CardiMax FX-8322"], (10000, 60000)),
+    ("麻醉机", ["WATO EX-65", "Primus"], (150000, 600000)),
+    ("全自动生化分析仪", ["BS-2000M", "AU5800"], (800000, 3000000)),
+]
+BRANDS = ["迈瑞", "联影", "GE", "飞利浦", "西门子", "德尔格", "日本光电", "鱼跃", "开立"]
+STATES = ["在用", "在用", "在用", "在用", "维修中", "停用", "待报废"]
+
+
+def _pad(values):
+    return pd.Series(values).astype(str).str.zfill(2)
+
+
+def messy_dates(rng, n, start_year=1998, end_year=2025):
+    """生成 n 个格式混杂的日期文本 (约 5% 为空、1% 为 “不详”)。"""
+    years = rng.integers(start_year, end_year, n)
+    months = rng.integers(1, 13, n)
+    days = rng.integers(1, 29, n)
+    y, m, d = pd.Series(years).astype(str), _pad(months), _pad(days)
+    stamps = pd.to_datetime({"year": years, "month": months, "day": days})
+    serial = (stamps - pd.Timestamp(1899, 12, 30)).dt.days.astype(str)
+    formats = [
+        y + "-" + m + "-" + d,
+        y + "." + m,
+        y + "年" + pd.Series(months).astype(str) + "月",
+        serial,
+        y + "/" + pd.Series(months).astype(str) + "/" + pd.Series(days).astype(str),
+        y + m + d,
+        pd.Series([""] * n),
+        pd.Series(["不详"] * n),
+    ]
+    pick = rng.choice(len(formats), n, p=[0.35, 0.2, 0.15, 0.1, 0.08, 0.06, 0.05, 0.01])
+    return pd.Series(np.choose(pick, [f.to_numpy(dtype=object) for f in formats]))
+
+
+def _blank(rng, values, ratio):
+    values = pd.Series(values, dtype=object)
+    values[rng.random(len(values)) < ratio] = ""
+    return values
+
+
+def equipment_chunk(rng, start, n):
+    """生成序号从 start+1 开始的 n 行资产台账。"""
+    kinds = rng.integers(0, len(DEVICES), n)
+    names = np.array([d[0] for d in DEVICES], dtype=object)[kinds]
+    models = np.array([rng.choice(DEVICES[k][1]) for k in kinds], dtype=object)
+    low = np.array([DEVICES[k][2][0] for k in kinds])
+    high = np.array([DEVICES[k][2][1] for k in kinds])
+    values = np.round(low + (high - low) * rng.random(n), 2)
+    depts = np.array(DEPARTMENTS, dtype=object)[rng.integers(0, len(DEPARTMENTS), n)]
+    serial = np.arange(start, start + n)
+    gb = pd.Series(rng.integers(6000, 7000, n)).astype(str)
+    life = np.array(["5", "6", "8", "10", ""], dtype=object)[rng.integers(0, 5, n)]
+    frame = pd.DataFrame({
+        "序号": serial + 1,
+        "科室": _blank(rng, depts, 0.01),
+        "设备名称": names,
+        "资产国标代码": gb,
+        "国标代码+地点+流水": gb + "-" + pd.Series(rng.integers(100, 999, n)).astype(str) + "-"
+                            + pd.Series(serial).astype(str).str.zfill(7),
+        "设备SN码": _blank(rng, pd.Series(serial).map(lambda i: f"SN{i * 7919 % 10 ** 9:09d}"), 0.08),
+        "老编号": _blank(rng, pd.Series(serial).map(lambda i: f"LB{i:07d}"), 0.3),
+        "价值": values,
+        "设备名": names,
+        "数量": np.where(rng.random(n) < 0.95, 1, rng.integers(2, 6, n)),
+        "品牌": np.array(BRANDS, dtype=object)[rng.integers(0, len(BRANDS), n)],
+        "型号": models,
+        "生产编号": _blank(rng, pd.Series(serial).map(lambda i: f"P{i:08d}"), 0.2),
+        "出厂日期": messy_dates(rng, n),
+        "价格": values,
+        "验收日期": messy_dates(rng, n),
+        "设备状态": np.array(STATES, dtype=object)[rng.integers(0, len(STATES), n)],
+        "械字号": _blank(rng, pd.Series(rng.integers(10 ** 7, 10 ** 8, n)).map(lambda i: f"国械注准{i}"), 0.4),
+        "使用年限": life,
+        "调拨情况": _blank(rng, pd.Series(["调入"] * n), 0.95),
+        "可报废年限": life,
+        "厂家电话": _blank(rng, pd.Series(rng.integers(10 ** 9, 10 ** 10, n)).map(lambda i: f"400{i}"), 0.5),
+        "工作站厂家": _blank(rng, pd.Series(["东软"] * n), 0.9),
+        "工作站厂家电话": "",
+        "备注": _blank(rng, pd.Series(["已贴标"] * n), 0.8),
+    }, columns=ASSET_COLUMNS)
+    return frame
+
+
+def write_equipment(path, rows, seed=0):
+    """分块写出 rows 行资产台账，内存占用只与 CHUNK_ROWS 有关。"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = equipment_chunk(rng, start, min(CHUNK_ROWS, rows - start))
+            chunk.to_csv(f, header=start == 0, index=False)
+
+
+def write_maintenance(path, equipment_rows, orders, seed=1):
+    """生成 orders 张工单；每张工单按状态流转追加 1-4 条快照，与 RepairStore 的写法一致。"""
+    rng = np.random.default_rng(seed)
+    steps = rng.integers(1, len(STATUS_FLOW) + 1, orders)
+    order_idx = np.repeat(np.arange(orders), steps)
+    status_idx = np.concatenate([np.arange(k) for k in steps]) if orders else np.array([], dtype=int)
+    n = len(order_idx)
+    statuses = np.array(STATUS_FLOW, dtype=object)[status_idx]
+    assets = rng.integers(0, max(equipment_rows, 1), orders)[order_idx]
+    kinds = rng.integers(0, len(DEVICES), orders)[order_idx]
+    opened = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365 * 86400, orders), unit="s")
+    opened = pd.Series(opened[order_idx])
+    updated = opened + pd.to_timedelta(status_idx * rng.integers(3600, 5 * 86400, n), unit="s")
+    frame = pd.DataFrame({
+        "单号": pd.Series(order_idx).map(lambda i: f"REQ-BENCH-{i:07d}"),
+        "设备编号": pd.Series(assets).map(lambda i: f"LB{i:07d}"),
+        "设备名称": np.array([d[0] for d in DEVICES], dtype=object)[kinds],
+        "设备规格型号": np.array([d[1][0] for d in DEVICES], dtype=object)[kinds],
+        "购置价格": np.round(rng.random(orders) * 100000, 2)[order_idx],
+        "生产厂家及国别": np.array(BRANDS, dtype=object)[rng.integers(0, len(BRANDS), orders)][order_idx],
+        "购置日期": messy_dates(rng, orders).to_numpy()[order_idx],
+        "是否在保修期内": np.where(rng.random(orders) < 0.3, "是", "否")[order_idx],
+        "使用科室": np.array(DEPARTMENTS, dtype=object)[rng.integers(0, len(DEPARTMENTS), orders)][order_idx],
+        "维修状态": statuses,
+        "故障描述": "开机报错，无法自检",
+        "申请时间": opened.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "审批状态": pd.Series(statuses).map(APPROVAL_BY_STATUS),
+        "分管领导审核意见": "",
+        "院长审批意见": "",
+        "操作人": "bench",
+        "状态更新时间": updated.dt.strftime("%Y-%m-%d %H:%M:%S"),
+    }, columns=MAINTENANCE_COLUMNS)
+    frame.to_csv(path, index=False, encoding="utf-8-sig")
+
+
+def write_work_files(root, count, templates=TEMPLATES_DIR, seed=2):
+    """在 root/public 下生成 count 个文件 (分散在子目录)，并复制真实模板以覆盖全文检索。"""
+    rng = np.random.default_rng(seed)
+    public = os.path.join(root, "public")
+    os.makedirs(os.path.join(root, "core"), exist_ok=True)
+    real = [e.path for e in os.scandir(templates) if e.is_file()] if os.path.isdir(templates) else []
+    for i in range(count):
+        folder = os.path.join(public, f"{DEPARTMENTS[i % len(DEPARTMENTS)]}", f"{2015 + i % 10}")
+        os.makedirs(folder, exist_ok=True)
+        if real and i % 10 == 0:
+            src = real[i // 10 % len(real)]
+            shutil.copyfile(src, os.path.join(folder, f"{i:06d}_{os.path.basename(src)}"))
+            continue
+        with open(os.path.join(folder, f"工作记录_{i:06d}.txt"), "w", encoding="utf-8") as f:
+            f.write(" ".join(rng.choice(DEPARTMENTS + [d[0] for d in DEVICES], 50)))
+    for src in real:
+        shutil.copyfile(src, os.path.join(root, os.path.basename(src)))
+
+
+def write_dataset(out, rows, files=None, orders=None, seed=0):
+    """
+    在 out 下生成一套完整的运行目录数据：data/equipment.csv、data/maintenance.csv、
+    导入来源 CSV (DEFAULT_SOURCES[0]) 与 work_files。
+    """
+    files = min(max(rows // 100, 20), 5000) if files is None else files
+    orders = rows // 5 if orders is None else orders
+    equipment = os.path.join(out, "data", "equipment.csv")
+    write_equipment(equipment, rows, seed)
+    write_maintenance(os.path.join(out, "data", "maintenance.csv"), rows, orders, seed + 1)
+    # 后台 “覆盖重建” 导入在未上传文件时读取默认导出文件
+    shutil.copyfile(equipment, os.path.join(out, DEFAULT_SOURCES[0]))
+    write_work_files(os.path.join(out, "work_files"), files, seed=seed + 2)
+    return {"rows": rows, "orders": orders, "files": files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成资产台账、维修工单与工作文库文件")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--files", type=int, default=None, help="工作文库文件数 (默认 rows/100，20-5000)")
+    parser.add_argument("--orders", type=int, default=None, help="维修工单数 (默认 rows/5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    print(write_dataset(args.out, args.rows, args.files, args.orders, args.seed))
+
+
+if __name__ == "__main__":
+    main()
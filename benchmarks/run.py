@@ -0,0 +1,224 @@
+"""
+页面渲染基准：用合成数据在临时目录中无头运行 app.py (Streamlit AppTest)，
+记录每个页面的首次/重复重跑耗时、分段耗时 (modules.profiling) 与进程内存峰值，结果写成 JSON。
+
+    python -m benchmarks.run                                  # 1k/10k/100k/500k 行，全部页面
+    python -m benchmarks.run --sizes 1000,10000 --pages asset,library --repeat 5
+    python -m benchmarks.run --baseline benchmarks/results/上一次.json  # 与上次结果对比
+
+每个 (数据规模, 页面) 在独立子进程中运行，缓存与内存峰值互不影响。
+--tracemalloc 会额外记录各分段的 Python 内存峰值，但耗时会明显变长，不宜与耗时对比混用。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SIZES = [1000, 10000, 100000, 500000]
+# 页面键 → 侧边栏菜单文字
+PAGES = {"asset": "资产档案", "repair": "维修管理", "library": "工作文库", "import": "后台管理"}
+IMPORT_BUTTON = "🚀 合并导入资产"
+REBUILD_MODE = "覆盖重建"
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return round(peak / (1 << 20) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _stages():
+    """最近一次重跑的分段：{分段名: {"ms", "calls", "peak_mb"}}。"""
+    from modules.profiling import last_run
+    return {s["stage"]: {k: (round(v, 2) if isinstance(v, float) else v) for k, v in s.items() if k != "stage"}
+            for s in last_run()}
+
+
+def _timed(action):
+    t0 = time.perf_counter()
+    at = action()
+    return at, round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _errors(at):
+    return [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+
+
+def _navigate(at, label):
+    for radio in at.sidebar.radio:
+        options = [o for o in radio.options if label in o]
+        if options:
+            radio.set_value(options[0])
+            return at
+    raise RuntimeError(f"侧边栏中没有 “{label}” 菜单，请检查登录权限")
+
+
+def worker(rows, page, dataset, repeat, timeout, trace):
+    """在数据目录的副本中运行单个页面，返回结果字典。"""
+    workdir = tempfile.mkdtemp(prefix=f"mz_bench_{rows}_{page}_")
+    try:
+        shutil.copytree(dataset, workdir, dirs_exist_ok=True)
+        os.chdir(workdir)
+        sys.path.insert(0, ROOT)
+        os.environ["APP_PROFILE"] = "1"
+        if trace:
+            import tracemalloc
+            tracemalloc.start()
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=timeout)
+        at.session_state.logged_in = True
+        at.session_state.user_id = "admin"
+        at.session_state.user_name = "bench"
+        at, boot_ms = _timed(at.run)
+        at, cold_ms = _timed(_navigate(at, PAGES[page]).run)
+        cold_stages = _stages()
+        warm, warm_stages = [], {}
+        if page == "import":
+            # 后台导入：未上传文件时 “覆盖重建” 读取默认导出文件，即 run_hospital_import_logic 的完整路径
+            mode = next(r for r in at.radio if r.label == "导入方式")
+            mode.set_value(next(o for o in mode.options if REBUILD_MODE in o))
+            for _ in range(max(repeat, 1)):
+                button = next(b for b in at.button if b.label == IMPORT_BUTTON)
+                at, ms = _timed(button.click().run)
+                warm.append(ms)
+                warm_stages = _stages()
+        else:
+            for _ in range(repeat):
+                at, ms = _timed(at.run)
+                warm.append(ms)
+                warm_stages = _stages()
+        return {
+            "rows": rows, "page": page, "boot_ms": boot_ms, "cold_ms": cold_ms,
+            "warm_ms": warm, "warm_median_ms": round(statistics.median(warm), 1) if warm else None,
+            "cold_stages": cold_stages, "warm_stages": warm_stages,
+            "peak_rss_mb": _peak_rss_mb(), "errors": _errors(at),
+        }
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _meta():
+    import pandas as pd
+    import streamlit
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"time": datetime.now().isoformat(timespec="seconds"), "commit": commit,
+            "python": platform.python_version(), "pandas": pd.__version__, "streamlit": streamlit.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, threshold):
+    """逐项对比页面中位耗时与各分段耗时，返回超过 threshold 倍的回退项。"""
+    old = {(r["rows"], r["page"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        prev = old.get((r["rows"], r["page"]))
+        if not prev:
+            continue
+        pairs = [("warm_median_ms", prev.get("warm_median_ms"), r.get("warm_median_ms")),
+                 ("cold_ms", prev.get("cold_ms"), r.get("cold_ms"))]
+        for kind in ("cold_stages", "warm_stages"):
+            for name, s in r.get(kind, {}).items():
+                before = prev.get(kind, {}).get(name)
+                pairs.append((f"{kind}.{name}", before and before["ms"], s["ms"]))
+        for name, before, after in pairs:
+            # 1ms 以下的波动不计
+            if before and after and after > before * threshold and after - before > 1:
+                regressions.append({"rows": r["rows"], "page": r["page"], "metric": name,
+                                    "before": before, "after": after, "ratio": round(after / before, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="页面渲染基准测试")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="逗号分隔的资产行数")
+    parser.add_argument("--pages", default=",".join(PAGES), help=f"逗号分隔，可选 {', '.join(PAGES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="每个页面重复重跑次数")
+    parser.add_argument("--timeout", type=float, default=600, help="单次重跑超时 (秒)")
+    parser.add_argument("--tracemalloc", action="store_true", help="记录各分段 Python 内存峰值 (较慢)")
+    parser.add_argument("--out", default=None, help="结果 JSON 路径 (默认 benchmarks/results/时间戳.json)")
+    parser.add_argument("--baseline", default=None, help="对比的历史结果 JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="判定回退的耗时倍数")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--dataset", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    pages = [p for p in args.pages.split(",") if p]
+    unknown = set(pages) - set(PAGES)
+    if unknown:
+        parser.error(f"未知页面：{', '.join(sorted(unknown))}")
+
+    if args.worker:
+        result = worker(sizes[0], pages[0], args.dataset, args.repeat, args.timeout, args.tracemalloc)
+        print(RESULT_PREFIX + json.dumps(result, ensure_ascii=False), flush=True)
+        return
+
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from benchmarks.generate import write_dataset
+    results = []
+    for rows in sizes:
+        dataset = tempfile.mkdtemp(prefix=f"mz_data_{rows}_")
+        try:
+            t0 = time.perf_counter()
+            info = write_dataset(dataset, rows)
+            print(f"[{rows:>7} 行] 生成数据 {time.perf_counter() - t0:.1f}s  {info}", flush=True)
+            for page in pages:
+                cmd = [sys.executable, "-m", "benchmarks.run", "--worker", "--sizes", str(rows), "--pages", page,
+                       "--dataset", dataset, "--repeat", str(args.repeat), "--timeout", str(args.timeout)]
+                if args.tracemalloc:
+                    cmd.append("--tracemalloc")
+                proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True, encoding="utf-8")
+                lines = [l for l in proc.stdout.splitlines() if l.startswith(RESULT_PREFIX)]
+                if proc.returncode or not lines:
+                    result = {"rows": rows, "page": page, "errors": [proc.stderr.strip()[-2000:]]}
+                else:
+                    result = json.loads(lines[-1][len(RESULT_PREFIX):])
+                results.append(result)
+                stages = ", ".join(f"{k} {v['ms']:.0f}" for k, v in result.get("cold_stages", {}).items())
+                print(f"[{rows:>7} 行] {page:<8} 首次 {result.get('cold_ms')} ms · 重跑中位 "
+                      f"{result.get('warm_median_ms')} ms · RSS 峰值 {result.get('peak_rss_mb')} MB"
+                      + (f"\n            分段(ms): {stages}" if stages else "")
+                      + (f"\n            ⚠️ {result['errors']}" if result.get("errors") else ""), flush=True)
+        finally:
+            shutil.rmtree(dataset, ignore_errors=True)
+
+    report = {"meta": _meta(), "config": {"sizes": sizes, "pages": pages, "repeat": args.repeat,
+                                          "tracemalloc": args.tracemalloc}, "results": results}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["regressions"] = compare(results, json.load(f), args.threshold)
+        for r in report["regressions"]:
+            print(f"🔺 {r['rows']} 行 {r['page']} {r['metric']}: {r['before']} → {r['after']} ms (×{r['ratio']})")
+        if not report["regressions"]:
+            print("与基线相比没有超过阈值的回退。")
+    out = args.out or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {out}")
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+AGE_THRESHOLDS = (5, 7, 10, 13)
+
+# Excel 序列日期的合理区间 (约 1954 ~ 2064 年) 与起点
+_EXCEL_SERIAL_MIN, _EXCEL_SERIAL_MAX = 20000, 60000
+_EXCEL_EPOCH = np.datetime64("1899-12-30")
+
+# 2015-03-01 / 2015.03 / 2015/3/1 / 2015年3月 / 2015年3月1日 / 2015
+_YMD_RE = r"^\s*(\d{4})(?!\d)\s*(?:[-./年]\s*(\d{1,2})\s*(?:[-./月]\s*(\d{1,2}))?)?\s*[日号]?"
+_COMPACT_RE = r"^\s*(\d{4})(\d{2})(\d{2})\s*$"
+
+
+def parse_dates(series):
+    """批量解析杂乱的日期列，无法识别的返回 NaT。"""
+    s = series.astype("string").str.strip()
+    year = pd.Series(np.nan, index=s.index)
+    month = pd.Series(np.nan, index=s.index)
+    day = pd.Series(np.nan, index=s.index)
+
+    # 1. 20150301 这类紧凑写法
+    m = s.str.extract(_COMPACT_RE).astype(float)
+    hit = m[0].notna()
+    year[hit], month[hit], day[hit] = m.loc[hit, 0], m.loc[hit, 1], m.loc[hit, 2]
+
+    # 2. 年-月-日 / 年.月 / X年X月 等分隔写法
+    m = s.str.extract(_YMD_RE).astype(float)
+    hit = year.isna() & m[0].notna()
+    year[hit], month[hit], day[hit] = m.loc[hit, 0], m.loc[hit, 1], m.loc[hit, 2]
+
+    # 只缺省未写的月/日；越界的 (13 月、2 月 30 日) 由 to_datetime 判为 NaT，不钳到边界
+    month = month.fillna(1)
+    day = day.fillna(1)
+    parts = pd.DataFrame({"year": year, "month": month, "day": day})
+    ok = year.between(1900, 2100)
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    out[ok] = pd.to_datetime(parts[ok].astype(int), errors="coerce")
+
+    # 3. Excel 序列号 (如 42064)；纯数字且 4 位的已按年份处理
+    serial = pd.to_numeric(s, errors="coerce")
+    hit = out.isna() & serial.between(_EXCEL_SERIAL_MIN, _EXCEL_SERIAL_MAX)
+    if hit.any():
+        out[hit] = _EXCEL_EPOCH + serial[hit].astype(int).to_numpy().astype("timedelta64[D]")
+    return out
+
+
+def _years_between(start, today):
+    return (pd.Timestamp(today) - start).dt.days / 365.25
+
+
+def build_derived(df, today=None):
+    """一次性向量化计算设备年龄、剩余年限、直线折旧后价值与可报废标记。"""
+    today = today or datetime.date.today()
+    made = parse_dates(df["出厂日期"])
+    accepted = parse_dates(df["验收日期"])
+    # 出厂日期缺失时以验收日期估算年龄；折旧自验收 (入账) 起算
+    age = _years_between(made.fillna(accepted), today)
+    in_service = _years_between(accepted.fillna(made), today).clip(lower=0)
+
+    life = pd.to_numeric(df["使用年限"], errors="coerce")
+    scrap_age = pd.to_numeric(df["可报废年限"], errors="coerce").fillna(life)
+    value = pd.to_numeric(df["价值"], errors="coerce").fillna(pd.to_numeric(df["价格"], errors="coerce"))
+
+    ratio = (1 - in_service / life.where(life > 0)).clip(0, 1)
+    return pd.DataFrame({
+        "age_years": np.floor(age),
+        "remaining_life": (life - in_service).round(1),
+        "depreciated_value": (value * ratio).round(2),
+        "scrap_eligible": (age >= scrap_age).fillna(False).astype(bool),
+    }, index=df.index)
+
+
+def patch_derived(frame, df, rids, today=None):
+    """只重算 rids 中仍存在的行，其余行沿用 frame 的结果；返回按 df 行顺序排列的派生列。"""
+    present = df.index.intersection(pd.Index(list(rids)))
+    fresh = build_derived(df.loc[present], today)
+    kept = frame.drop(index=list(rids), errors="ignore")
+    return pd.concat([kept, fresh]).reindex(df.index)
+
+
+class DerivedColumns:
+    """派生列结果及按年龄排好序的索引，按年限筛选只需一次二分查找。"""
+
+    def __init__(self, frame):
+        self.frame = frame
+        ages = frame["age_years"].dropna().sort_values()
+        self._ages = ages.to_numpy()
+        self._index = ages.index
+
+    def index_at_least(self, years):
+        # 返回年龄不低于 years 的行索引 (保持原表顺序)
+        pos = int(np.searchsorted(self._ages, years, side="left"))
+        return self._index[pos:].sort_values()
+
+
+def derived_for(store):
+    """与资产缓存同一生命周期，按日期区分以便跨天自动刷新；增量编辑后只重算改动行。"""
+    today = datetime.date.today()
+    return store.incremental(
+        ("derived", today),
+        lambda df: DerivedColumns(build_derived(df, today)),
+        lambda old, df, rids: DerivedColumns(patch_derived(old.frame, df, rids, today)))
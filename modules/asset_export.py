@@ -0,0 +1,382 @@
+import logging
+import os
+import re
+import shutil
+import uuid
+import zipfile
+from copy import copy
+from datetime import datetime
+from xml.sax.saxutils import escape
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+from modules.fileio import atomic_open
+
+EXPORT_DIR = "data/exports"
+TEMPLATE_DIR = "work_files"
+TEMPLATE_EXTS = {".docx", ".xlsx", ".xls"}
+KEEP_OUTPUTS = 10
+# 每次只取这么多行转换写出，内存占用与导出总行数无关
+CHUNK_ROWS = 2000
+MIME_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+CODE_COLUMN = "国标代码+地点+流水"
+# 单台设备表单 (调拨审批表、维修报告单等)：标签单元格 → 资产列，值填在右侧相邻的空单元格
+FORM_FIELDS = {
+    "设备名称": "设备名称", "设备编号": CODE_COLUMN, "数量": "数量",
+    "规格型号": "型号", "型号规格": "型号", "价值": "价值", "购置价格": "价值",
+    "厂家产地": "品牌", "生产国别、厂家": "品牌", "归置科室": "科室", "使用科室": "科室",
+    "购置日期": "验收日期",
+}
+# 清单式表格 (固定资产处置申请表等)：表头 → 资产列，明细行按设备数扩展
+LIST_FIELDS = {
+    "编号": CODE_COLUMN, "资产名称": "设备名称", "设备名称": "设备名称",
+    "型号规格": "型号", "规格型号": "型号", "数量": "数量",
+    "购置日期": "验收日期", "原值": "价值", "备注": "备注",
+}
+SUM_FIELDS = {"数量", "原值"}
+
+_kinds = {}
+_log = logging.getLogger(__name__)
+
+
+def _norm(text):
+    return re.sub(r"\s+", "", str(text))
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _cell(value):
+    # 写入 xlsx 的单元格值：缺失值留空，numpy 标量转 Python 类型，去掉 Excel 不接受的控制字符
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+
+def _number(value):
+    value = pd.to_numeric(_text(value), errors="coerce")
+    return None if pd.isna(value) else (int(value) if float(value).is_integer() else float(value))
+
+
+def _output_path(stem, ext):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(EXPORT_DIR, f"{stem}_{stamp}_{uuid.uuid4().hex[:4]}.{ext}")
+
+
+def _prune_outputs():
+    files = sorted((os.path.join(EXPORT_DIR, f) for f in os.listdir(EXPORT_DIR) if not f.startswith(".")),
+                   key=os.path.getmtime, reverse=True)
+    for path in files[KEEP_OUTPUTS:]:
+        os.remove(path)
+
+
+def _chunks(frames, positions):
+    """按块取出选中行 (多个同序的表按列拼接)，每次只物化 CHUNK_ROWS 行。"""
+    for start in range(0, len(positions), CHUNK_ROWS):
+        rows = positions[start:start + CHUNK_ROWS]
+        yield start + len(rows), pd.concat([f.iloc[rows] for f in frames], axis=1)
+
+
+# --- 表格导出 ---
+def export_table(frames, positions, fmt="xlsx", progress=None):
+    """
+    把选中行 (positions 为行位置) 流式写成 csv 或 xlsx，返回磁盘路径。
+    frames 为同序的若干表 (如资产表的可见列 + 派生列)，不预先拼成整表。
+    """
+    frames = [frames] if isinstance(frames, pd.DataFrame) else list(frames)
+    columns = [c for f in frames for c in f.columns]
+    path = _output_path("资产清单", fmt)
+    total = len(positions)
+    if fmt == "csv":
+        with atomic_open(path, encoding="utf-8-sig", newline="") as f:
+            if not total:
+                f.write(",".join(columns) + "\r\n")
+            for done, chunk in _chunks(frames, positions):
+                chunk.to_csv(f, header=done <= CHUNK_ROWS, index=False, lineterminator="\r\n")
+                if progress:
+                    progress(done, total)
+    else:
+        # write_only 模式逐行落到临时文件，不在内存中保留单元格对象
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("资产清单")
+        ws.append(columns)
+        for done, chunk in _chunks(frames, positions):
+            for row in chunk.itertuples(index=False, name=None):
+                ws.append([_cell(v) for v in row])
+            if progress:
+                progress(done, total)
+        with atomic_open(path, "wb") as f:
+            wb.save(f)
+    _prune_outputs()
+    return path
+
+
+# --- 模板识别 ---
+_TR = re.compile(r"<w:tr(?:\s[^>]*)?>.*?</w:tr>", re.S)
+_TC = re.compile(r"<w:tc(?:\s[^>]*)?>.*?</w:tc>", re.S)
+_RPR = re.compile(r"<w:r(?:\s[^>]*)?>\s*(<w:rPr>.*?</w:rPr>)", re.S)
+PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+def _xml_text(xml):
+    return _norm("".join(re.findall(r"<w:t(?:\s[^>]*)?>([^<]*)</w:t>", xml)))
+
+
+def _form_segments(body):
+    """把 docx 正文切成 [文本, (run 开头, 列名), 文本, ...]：标签右侧的空单元格处插入资产值。"""
+    segments, pos = [], 0
+    for row in _TR.finditer(body):
+        cells = list(_TC.finditer(row.group(0)))
+        for label, value in zip(cells, cells[1:]):
+            column = FORM_FIELDS.get(_xml_text(label.group(0)))
+            close = value.group(0).find("</w:p>")
+            if column is None or close < 0 or _xml_text(value.group(0)):
+                continue
+            at = row.start() + value.start() + close
+            # 沿用标签的字体字号
+            rpr = _RPR.search(label.group(0))
+            segments += [body[pos:at], ("<w:r>" + (rpr.group(1) if rpr else ""), column)]
+            pos = at
+    segments.append(body[pos:])
+    return segments
+
+
+def _split_document(xml):
+    start = xml.index("<w:body>") + len("<w:body>")
+    end = xml.rindex("</w:body>")
+    sect = xml.rfind("<w:sectPr", start, end)
+    sect = end if sect < 0 else sect
+    return xml[:start], xml[start:sect], xml[sect:]
+
+
+def _find_list_block(rows):
+    """在表格模板中定位 (表头行, 首个明细行, 明细行数, 合计行)；不是清单式表格时返回 None。"""
+    for r, row in enumerate(rows):
+        names = [_norm(v) for v, _ in row]
+        if "序号" not in names or sum(n in LIST_FIELDS for n in names) < 2:
+            continue
+        first = end = r + 1
+        while end < len(rows) and _number(rows[end][0][0]) is not None:
+            end += 1
+        if end == first:
+            return None
+        total = end if end < len(rows) and _norm(rows[end][0][0]) == "合计" else None
+        return r, first, end - first, total
+    return None
+
+
+def _template_kind(path):
+    """"form" (单台设备表单，每台一页) / "list" (清单式表格，明细行扩展) / None (无法填写)。"""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == ".docx":
+            with zipfile.ZipFile(path) as zf:
+                _, body, _ = _split_document(zf.read("word/document.xml").decode("utf-8"))
+            return "form" if sum(isinstance(s, tuple) for s in _form_segments(body)) >= 2 else None
+        return "list" if _find_list_block(_read_grid(path)["rows"]) else None
+    except Exception as e:
+        # 损坏或格式异常的文件 (如 xlrd 的 CompDocError) 只当作不是模板，不能拖垮整个资产页
+        _log.warning("无法识别模板 %s：%r", path, e)
+        return None
+
+
+def list_templates(root=TEMPLATE_DIR):
+    """work_files 根目录下可以按资产批量填写的模板 (结果按文件 mtime 缓存)。"""
+    found = []
+    if not os.path.isdir(root):
+        return found
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in TEMPLATE_EXTS:
+            continue
+        sig = (entry.path, entry.stat().st_mtime_ns)
+        if sig not in _kinds:
+            _kinds[sig] = _template_kind(entry.path)
+        if _kinds[sig]:
+            found.append({"name": entry.name, "path": entry.path, "kind": _kinds[sig]})
+    return found
+
+
+# --- Word 表单：每台设备一页 ---
+def _fill_docx(path, rows_iter, total, progress):
+    out_path = _output_path(os.path.splitext(os.path.basename(path))[0], "docx")
+    with zipfile.ZipFile(path) as src:
+        head, body, tail = _split_document(src.read("word/document.xml").decode("utf-8"))
+        segments = _form_segments(body)
+        with atomic_open(out_path, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as dst:
+            for info in src.infolist():
+                if info.filename == "word/document.xml":
+                    continue
+                with src.open(info) as a, dst.open(info, "w") as b:
+                    shutil.copyfileobj(a, b)
+            # 正文逐台写入压缩流，不在内存中拼出整份文档
+            with dst.open("word/document.xml", "w") as doc:
+                doc.write(head.encode("utf-8"))
+                for i, record in enumerate(rows_iter):
+                    if i:
+                        doc.write(PAGE_BREAK.encode("utf-8"))
+                    for seg in segments:
+                        if isinstance(seg, str):
+                            doc.write(seg.encode("utf-8"))
+                            continue
+                        value = _text(record.get(seg[1]))
+                        if value:
+                            doc.write(f'{seg[0]}<w:t xml:space="preserve">{escape(value)}</w:t></w:r>'.encode("utf-8"))
+                    if progress:
+                        progress(i + 1, total)
+                doc.write(tail.encode("utf-8"))
+    return out_path
+
+
+# --- Excel 清单：明细行按设备数扩展 ---
+def _xls_style(book, xf_index, cache):
+    if xf_index not in cache:
+        xf = book.xf_list[xf_index]
+        font = book.font_list[xf.font_index]
+        b = xf.border
+
+        def side(line):
+            return Side(style={2: "medium", 5: "thick"}.get(line, "thin")) if line else Side()
+
+        cache[xf_index] = {
+            "font": Font(name=font.name, size=font.height / 20, bold=bool(font.bold)),
+            "border": Border(left=side(b.left_line_style), right=side(b.right_line_style),
+                             top=side(b.top_line_style), bottom=side(b.bottom_line_style)),
+            "alignment": Alignment(horizontal={1: "left", 2: "center", 3: "right"}.get(xf.alignment.hor_align),
+                                   vertical={0: "top", 1: "center", 2: "bottom"}.get(xf.alignment.vert_align),
+                                   wrap_text=bool(xf.alignment.text_wrapped)),
+        }
+    return cache[xf_index]
+
+
+def _read_grid(path):
+    """读取表格模板首个工作表：值与样式、合并区域 (左闭右开)、列宽、行高。"""
+    if path.lower().endswith(".xls"):
+        try:
+            import xlrd
+        except ImportError:
+            raise ValueError("读取 .xls 模板需要安装 xlrd")
+        try:
+            book = xlrd.open_workbook(path, formatting_info=True)
+        except xlrd.XLRDError as e:
+            raise ValueError(str(e))
+        sh, cache = book.sheet_by_index(0), {}
+        return {
+            "title": sh.name,
+            "rows": [[(sh.cell_value(r, c), _xls_style(book, sh.cell_xf_index(r, c), cache))
+                      for c in range(sh.ncols)] for r in range(sh.nrows)],
+            "merges": [tuple(m) for m in sh.merged_cells],
+            "widths": {c: info.width / 256 for c, info in sh.colinfo_map.items()},
+            "heights": {r: info.height / 20 for r, info in sh.rowinfo_map.items()},
+        }
+    ws = load_workbook(path).worksheets[0]
+    return {
+        "title": ws.title,
+        "rows": [[(cell.value, {"font": copy(cell.font), "border": copy(cell.border),
+                                "alignment": copy(cell.alignment)}) for cell in row]
+                 for row in ws.iter_rows()],
+        "merges": [(m.min_row - 1, m.max_row, m.min_col - 1, m.max_col) for m in ws.merged_cells.ranges],
+        "widths": {c - 1: ws.column_dimensions[get_column_letter(c)].width
+                   for c in range(1, ws.max_column + 1) if ws.column_dimensions[get_column_letter(c)].width},
+        "heights": {r - 1: d.height for r, d in ws.row_dimensions.items() if d.height},
+    }
+
+
+def _fill_sheet(path, rows_iter, total, progress):
+    grid = _read_grid(path)
+    rows = grid["rows"]
+    header, first, count, total_row = _find_list_block(rows)
+    names = [_norm(v) for v, _ in rows[header]]
+    item_style = [s for _, s in rows[first]]
+    shift = total - count
+
+    def target(r):
+        # 模板行号 → 输出行号 (明细区之后的行整体下移)
+        return r if r < first else r + shift
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = grid["title"]
+
+    def put(r, c, value, style):
+        cell = ws.cell(row=r + 1, column=c + 1, value=_cell(value))
+        for attr, val in style.items():
+            setattr(cell, attr, copy(val))
+
+    for r, row in enumerate(rows):
+        if first <= r < first + count:
+            continue
+        for c, (value, style) in enumerate(row):
+            put(target(r), c, value, style)
+    sums = {}
+    for i, record in enumerate(rows_iter):
+        for c, name in enumerate(names):
+            if name == "序号":
+                value = i + 1
+            elif name in SUM_FIELDS:
+                value = _number(record.get(LIST_FIELDS[name]))
+                sums[c] = sums.get(c, 0) + (value or 0)
+            else:
+                value = _text(record.get(LIST_FIELDS.get(name))) if name in LIST_FIELDS else None
+            put(first + i, c, value, item_style[c] if c < len(item_style) else {})
+        if progress:
+            progress(i + 1, total)
+    if total_row is not None:
+        for c, value in sums.items():
+            ws.cell(row=target(total_row) + 1, column=c + 1, value=value)
+
+    for r0, r1, c0, c1 in grid["merges"]:
+        if r0 >= first + count or r1 <= first:
+            ws.merge_cells(start_row=target(r0) + 1, end_row=target(r1 - 1) + 1,
+                           start_column=c0 + 1, end_column=c1)
+    for c, width in grid["widths"].items():
+        ws.column_dimensions[get_column_letter(c + 1)].width = width
+    for r, height in grid["heights"].items():
+        if r < first or r >= first + count:
+            ws.row_dimensions[target(r) + 1].height = height
+    if first in grid["heights"]:
+        for i in range(total):
+            ws.row_dimensions[first + i + 1].height = grid["heights"][first]
+
+    out_path = _output_path(os.path.splitext(os.path.basename(path))[0], "xlsx")
+    with atomic_open(out_path, "wb") as f:
+        wb.save(f)
+    return out_path
+
+
+def fill_template(path, df, positions, progress=None):
+    """
+    按选中设备批量填写 work_files 中的模板，返回生成文件的路径。
+    Word 表单每台设备一页合成一份 .docx；Excel 清单 (.xls/.xlsx) 扩展明细行后输出 .xlsx。
+    """
+    kind = _template_kind(path)
+    if kind is None:
+        raise ValueError(f"无法识别可填写的字段：{os.path.basename(path)}")
+    total = len(positions)
+
+    def records():
+        for _, chunk in _chunks([df], positions):
+            yield from chunk.to_dict("records")
+
+    out_path = (_fill_docx if kind == "form" else _fill_sheet)(path, records(), total, progress)
+    _prune_outputs()
+    return out_path
@@ -0,0 +1,309 @@
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from modules.storage import ASSET_COLUMNS
+from modules.asset_store import get_asset_store
+
+# 源表列名 -> 标准列名；标准列名同名直接保留，其余列忽略。
+# 如需调整，可在 data/import_mapping.csv 中按 “源列,标准列” 两列覆盖
+COLUMN_MAPPING = {
+    "设备名": "设备名称",
+    "设备名.1": "设备名",
+    "编号": "老编号",
+}
+MAPPING_PATH = "data/import_mapping.csv"
+DEFAULT_SOURCES = [f"三院资产表_已填充国标码.xlsx - Sheet{i}.csv" for i in range(1, 5)]
+DEFAULT_WORKBOOK = "三院资产表_已填充国标码.xlsx"
+CHUNK_ROWS = 5000
+MAX_WORKERS = 4
+QUEUE_CHUNKS = 4
+
+
+def load_mapping():
+    mapping = dict(COLUMN_MAPPING)
+    if os.path.exists(MAPPING_PATH):
+        table = pd.read_csv(MAPPING_PATH, encoding='utf-8-sig', dtype=str).dropna()
+        mapping.update(zip(table.iloc[:, 0], table.iloc[:, 1]))
+    return mapping
+
+
+def default_sources():
+    # 优先直接读取原始 .xlsx 工作簿 (每个工作表一个来源)，否则退回导出的四个 CSV
+    if os.path.exists(DEFAULT_WORKBOOK):
+        return [DEFAULT_WORKBOOK]
+    return [f for f in DEFAULT_SOURCES if os.path.exists(f)]
+
+
+def _is_workbook(src):
+    return str(getattr(src, "name", src)).lower().endswith((".xlsx", ".xlsm"))
+
+
+def expand_sources(sources):
+    # 磁盘上的工作簿按工作表拆成独立来源 (路径, 表名)，各表可并行读取；上传的文件对象整体读取
+    out = []
+    for src in sources:
+        if isinstance(src, str) and _is_workbook(src):
+            from openpyxl import load_workbook
+            wb = load_workbook(src, read_only=True)
+            out.extend((src, name) for name in wb.sheetnames)
+            wb.close()
+        else:
+            out.append(src)
+    return out
+
+
+def _source_name(src):
+    if isinstance(src, tuple):
+        return f"{os.path.basename(src[0])} - {src[1]}"
+    return os.path.basename(str(getattr(src, "name", src)))
+
+
+def _dedupe(headers):
+    # 与 pandas 读取 CSV 一致：重复表头依次命名为 X, X.1, X.2 ...
+    seen, out = {}, []
+    for h in headers:
+        h = "" if h is None else str(h).strip()
+        n = seen.get(h, 0)
+        out.append(h if n == 0 else f"{h}.{n}")
+        seen[h] = n + 1
+    return out
+
+
+def _iter_xlsx(src, chunk_rows, sheet=None):
+    from openpyxl import load_workbook
+    wb = load_workbook(src, read_only=True, data_only=True)
+    try:
+        for ws in ([wb[sheet]] if sheet else wb.worksheets):
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = _dedupe(header)
+            buf = []
+            for r in rows:
+                if any(v is not None for v in r):
+                    buf.append(r)
+                if len(buf) >= chunk_rows:
+                    yield ws.title, pd.DataFrame(buf, columns=header).astype("string")
+                    buf = []
+            if buf:
+                yield ws.title, pd.DataFrame(buf, columns=header).astype("string")
+    finally:
+        wb.close()
+
+
+def iter_chunks(src, chunk_rows=CHUNK_ROWS):
+    """按块读取单个来源，产出 (子表名, DataFrame)；全部按文本读取以保留编码前导零与日期原样。"""
+    if isinstance(src, tuple):
+        yield from _iter_xlsx(src[0], chunk_rows, sheet=src[1])
+    elif _is_workbook(src):
+        yield from _iter_xlsx(src, chunk_rows)
+    else:
+        for chunk in pd.read_csv(src, encoding='utf-8-sig', dtype=str, chunksize=chunk_rows):
+            yield _source_name(src), chunk
+
+
+def normalize(chunk, mapping):
+    """按映射表把源列重命名为标准列，缺失列补空，列顺序与 ASSET_COLUMNS 一致。"""
+    # 目标列已存在且不会被改名让位时不再映射 (如标准格式台账中的 “设备名” 本身就是标准列)
+    cols = set(chunk.columns)
+    renames = {k: v for k, v in mapping.items() if k in cols and v not in cols}
+    renames.update({k: v for k, v in mapping.items() if k in cols and v in renames})
+    chunk = chunk.rename(columns=renames)
+    chunk = chunk.loc[:, ~chunk.columns.duplicated(keep="last")]
+    return chunk.reindex(columns=ASSET_COLUMNS)
+
+
+def _read_source(src, mapping, out, chunk_rows):
+    try:
+        for _, chunk in iter_chunks(src, chunk_rows):
+            out.put(("chunk", normalize(chunk, mapping)))
+        out.put(("done", None))
+    except Exception as e:
+        out.put(("error", e))
+
+
+def _drain(q):
+    # 读到结束标记为止，避免读线程阻塞在 put 上
+    while q.get()[0] == "chunk":
+        pass
+
+
+def _stream(sources, mapping, chunk_rows, max_workers, stats):
+    """各来源并行预读，按来源顺序产出 (来源名, 块)；每个来源结束时产出 (来源名, None)。"""
+    # 每个来源一个有界队列：消费跟不上读取时读线程自动等待，内存只保留少量块
+    queues = [queue.Queue(maxsize=QUEUE_CHUNKS) for _ in sources]
+    names = [_source_name(s) for s in sources]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(sources))) as pool:
+        for src, q in zip(sources, queues):
+            pool.submit(_read_source, src, mapping, q, chunk_rows)
+        finished = 0
+        try:
+            for name, q in zip(names, queues):
+                stats["files"][name]["status"] = "导入中"
+                while True:
+                    kind, payload = q.get()
+                    if kind != "chunk":
+                        break
+                    stats["files"][name]["rows"] += len(payload)
+                    yield name, payload
+                finished += 1
+                if kind == "error":
+                    stats["files"][name]["status"] = "失败"
+                    raise payload
+                stats["files"][name]["status"] = "完成"
+                yield name, None
+        finally:
+            for q in queues[finished:]:
+                _drain(q)
+
+
+def _new_stats(sources):
+    return {"rows": 0, "files": {_source_name(s): {"rows": 0, "status": "排队中"} for s in sources},
+            "rows_per_sec": 0.0, "seconds": 0.0, "started": time.perf_counter()}
+
+
+def _report(stats, progress):
+    stats["seconds"] = time.perf_counter() - stats["started"]
+    stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    if progress:
+        progress(stats)
+
+
+def run_import(sources=None, store=None, progress=None, chunk_rows=CHUNK_ROWS, max_workers=MAX_WORKERS):
+    """
+    并行分块读取各来源，边读边写入资产存储 (整表替换)。
+    各来源并行预读，但按来源顺序写出，序号与原表顺序一致。
+    progress(stats) 在每块写入后回调，stats 含总行数、每个来源行数与状态、行/秒。
+    """
+    sources = expand_sources(default_sources() if sources is None else sources)
+    stats = _new_stats(sources)
+    if not sources:
+        return stats
+    store = store or get_asset_store()
+    chunks = _stream(sources, load_mapping(), chunk_rows, max_workers, stats)
+    with closing(chunks), store.bulk_replace(ASSET_COLUMNS) as write:
+        for _, chunk in chunks:
+            if chunk is not None:
+                n = len(chunk)
+                chunk["序号"] = range(stats["rows"] + 1, stats["rows"] + n + 1)
+                write(chunk)
+                stats["rows"] += n
+            _report(stats, progress)
+    return stats
+
+
+# --- 增量合并 (去重 upsert) ---
+# 依次尝试的匹配键；同一行的多个键指向不同的已有记录时判为冲突
+MATCH_KEYS = ["设备SN码", "国标代码+地点+流水", "老编号"]
+
+
+def _clean_keys(series):
+    s = series.astype("string").str.strip()
+    return s.mask(s.isin(["", "nan", "None"]))
+
+
+def build_key_index(df):
+    """已有台账的哈希索引：{键列: {键值: 行ID}}，同一键值重复时保留首条。"""
+    index = {}
+    for col in MATCH_KEYS:
+        keys = _clean_keys(df[col]).dropna()
+        index[col] = dict(zip(keys[~keys.duplicated()], keys.index[~keys.duplicated()]))
+    return index
+
+
+def _changed_mask(old, new):
+    # 新值非空且与旧值不同才算变化；文本不同的再按数值比较一次 (5000 与 5000.0 视为相同)
+    new_s = new.astype("string").str.strip().fillna("")
+    old_s = old.astype("string").str.strip().fillna("")
+    diff = (new_s != "").to_numpy(bool) & (old_s != new_s).to_numpy(bool)
+    if diff.any():
+        num_old = pd.to_numeric(old_s[diff], errors="coerce").astype(float).to_numpy()
+        num_new = pd.to_numeric(new_s[diff], errors="coerce").astype(float).to_numpy()
+        diff[diff] = num_old != num_new
+    return pd.Series(diff, index=new.index)
+
+
+def upsert_import(sources=None, store=None, progress=None, chunk_rows=CHUNK_ROWS, max_workers=MAX_WORKERS):
+    """
+    增量合并导入：按 设备SN码 / 国标代码+地点+流水 / 老编号 匹配已有记录，
+    只更新发生变化的字段，未匹配的新增；不删除、不重排已有记录，保留手工修改。
+    返回 stats，另含 inserted / updated / unchanged / conflicts 计数及 conflict_rows 明细。
+    """
+    sources = expand_sources(default_sources() if sources is None else sources)
+    stats = _new_stats(sources)
+    stats.update(inserted=0, updated=0, unchanged=0, conflicts=0, conflict_rows=[])
+    if not sources:
+        return stats
+    store = store or get_asset_store()
+    existing = store.view()
+    if existing is None:
+        # 尚无台账时等同于首次全量导入
+        stats.update(run_import(sources, store, progress, chunk_rows, max_workers))
+        stats["inserted"] = stats["rows"]
+        return stats
+    generation = store.stats()["generation"]
+    index = store.derived("upsert_key_index", build_key_index)
+    cols = [c for c in ASSET_COLUMNS if c != "序号"]
+
+    updates, inserts = {}, []
+    pending = {col: {} for col in MATCH_KEYS}  # 本次新增行的键 -> inserts 下标，用于来源之间去重
+    chunks = _stream(sources, load_mapping(), chunk_rows, max_workers, stats)
+    with closing(chunks):
+        for name, chunk in chunks:
+            if chunk is None:
+                _report(stats, progress)
+                continue
+            stats["rows"] += len(chunk)
+            keys = pd.DataFrame({col: _clean_keys(chunk[col]) for col in MATCH_KEYS})
+            # 向量化查哈希索引，得到每个键命中的行 ID
+            hits = pd.DataFrame({col: keys[col].map(index[col]) for col in MATCH_KEYS}).astype(float)
+            rid = hits.bfill(axis=1).iloc[:, 0]
+            h = hits.to_numpy()
+            # 0 = 无命中，1 = 命中同一条记录，2 = 各键命中不同记录 (冲突)
+            n_hits = pd.Series(np.where(np.isnan(rid.to_numpy()), 0,
+                                        np.where((~np.isnan(h) & (h != rid.to_numpy()[:, None])).any(axis=1), 2, 1)),
+                               index=chunk.index)
+
+            conflict = n_hits > 1
+            if conflict.any():
+                stats["conflicts"] += int(conflict.sum())
+                stats["conflict_rows"].extend(
+                    {"来源": name, **keys[conflict].loc[i].dropna().to_dict(),
+                     "命中记录序号": sorted({int(existing.at[r, "序号"]) if "序号" in existing else int(r)
+                                            for r in hits.loc[i].dropna()})}
+                    for i in keys.index[conflict])
+
+            matched = (n_hits == 1)
+            if matched.any():
+                new = chunk.loc[matched, cols]
+                old = existing.loc[rid[matched].astype(int), cols].set_axis(new.index)
+                changed = pd.DataFrame({c: _changed_mask(old[c], new[c]) for c in cols})
+                # 只取变化的单元格：(行, 列) -> 新值
+                cells = new.astype(object).where(changed).stack().dropna()
+                row_rid = rid[matched].astype(int).to_dict()
+                for (i, c), v in cells.items():
+                    updates.setdefault(row_rid[i], {})[c] = v
+                stats["unchanged"] += int((~changed.any(axis=1)).sum())
+
+            for i in chunk.index[n_hits == 0]:
+                row_keys = keys.loc[i].dropna()
+                dup = next((pending[c][v] for c, v in row_keys.items() if v in pending[c]), None)
+                values = chunk.loc[i, cols].dropna().to_dict()
+                if dup is None:
+                    for c, v in row_keys.items():
+                        pending[c][v] = len(inserts)
+                    inserts.append(values)
+                else:
+                    inserts[dup].update(values)  # 多个来源中的同一台设备，后出现的补全/覆盖前者
+            _report(stats, progress)
+
+    stats["inserted"], stats["updated"] = len(inserts), len(updates)
+    if updates or inserts:
+        store.apply_changes(generation, updates, inserts, [])
+    _report(stats, progress)
+    return stats
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zipfile
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+import qrcode
+from itsdangerous import Signer, BadSignature
+from PIL import Image, ImageDraw, ImageFont
+from modules.auth import app_secret
+from modules.fileio import atomic_write
+from modules.storage import CONFIG_PATH
+
+CODE_COLUMN = "国标代码+地点+流水"
+LABEL_CACHE_DIR = "data/label_cache"
+OUTPUT_DIR = os.path.join(LABEL_CACHE_DIR, "out")
+# 版式变化时递增，旧缓存自然失效
+LABEL_VERSION = 1
+
+LABEL_SIZE = (540, 280)
+# A4 @200dpi，每页 3 列 × 8 行
+PAGE_SIZE = (1654, 2339)
+PAGE_GRID = (3, 8)
+PDF_BATCH_PAGES = 10
+KEEP_OUTPUTS = 10
+# 少量标签直接在本进程渲染，免去进程池启动开销
+POOL_MIN_LABELS = 64
+
+FONT_CANDIDATES = [
+    "C:/Windows/Fonts/msyh.ttc", "C:/Windows/Fonts/simhei.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+]
+
+
+def _signer():
+    return Signer(app_secret(), salt="asset-label")
+
+
+def sign_code(code, signer=None):
+    return (signer or _signer()).sign(str(code)).decode()
+
+
+def unsign_code(token):
+    """校验扫码链接中的签名，返回设备编号；签名不符时返回 None。"""
+    try:
+        return _signer().unsign(token).decode()
+    except BadSignature:
+        return None
+
+
+def public_base_url():
+    """扫码链接的对外地址：环境变量 PUBLIC_BASE_URL 优先，其次 config.json；未配置时返回空串。"""
+    url = os.environ.get("PUBLIC_BASE_URL")
+    if not url:
+        try:
+            with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                url = json.load(f).get("public_base_url")
+        except (OSError, ValueError):
+            url = None
+    # 不再回退到 localhost：那样印出来的二维码在手机上打不开
+    return (url or "").strip().rstrip("/")
+
+
+def label_url(code, base_url=None, signer=None):
+    """扫码链接；批量生成时由调用方传入 base_url 与 signer，避免每张标签重复读取配置。"""
+    base_url = base_url or public_base_url()
+    if not base_url:
+        raise ValueError("未配置扫码访问地址 (public_base_url)")
+    return f"{base_url}/?asset={quote(sign_code(code, signer))}"
+
+
+def label_items(df):
+    """从资产表取出需要打印的标签内容，无编码的行跳过。"""
+    rows = df[df[CODE_COLUMN].notna()]
+    base_url, signer = public_base_url(), _signer()
+    if not base_url:
+        raise ValueError("未配置扫码访问地址 (public_base_url)")
+    items = []
+    for code, name, dept in zip(rows[CODE_COLUMN].astype(str).str.strip(), rows["设备名称"], rows["科室"]):
+        if not code:
+            continue
+        item = {"code": code, "url": label_url(code, base_url, signer),
+                "name": "" if name is None or name != name else str(name),
+                "dept": "" if dept is None or dept != dept else str(dept)}
+        raw = json.dumps([LABEL_VERSION, item], ensure_ascii=False, sort_keys=True)
+        item["key"] = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        items.append(item)
+    return items
+
+
+def _label_path(key):
+    return os.path.join(LABEL_CACHE_DIR, key[:2], key + ".png")
+
+
+@lru_cache(maxsize=None)
+def _font(size):
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size=size)
+
+
+def render_label(item):
+    """渲染单张标签 (二维码 + 编码/名称/科室) 并写入缓存，已存在则直接返回路径。进程池中执行。"""
+    path = _label_path(item["key"])
+    if os.path.exists(path):
+        return path
+    w, h = LABEL_SIZE
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=1)
+    qr.add_data(item["url"])
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white").get_image().convert("RGB")
+    qr_img = qr_img.resize((h - 20, h - 20), Image.NEAREST)
+
+    img = Image.new("RGB", LABEL_SIZE, "white")
+    img.paste(qr_img, (10, 10))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, w - 1, h - 1], outline="black", width=2)
+    x = h
+    draw.text((x, 24), item["name"][:12], fill="black", font=_font(30))
+    draw.text((x, 80), item["dept"][:14], fill="black", font=_font(24))
+    code = item["code"]
+    for i in range(0, min(len(code), 48), 16):
+        draw.text((x, 140 + i // 16 * 32), code[i:i + 16], fill="black", font=_font(22))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, lambda f: img.save(f, "PNG"), mode="wb")
+    return path
+
+
+def render_labels(items, progress=None, max_workers=None):
+    """批量渲染：只把缓存中没有的标签交给进程池，返回与 items 同序的图片路径。"""
+    todo = [it for it in items if not os.path.exists(_label_path(it["key"]))]
+    done = len(items) - len(todo)
+    if progress:
+        progress(done, len(items))
+    if len(todo) < POOL_MIN_LABELS:
+        for _ in map(render_label, todo):
+            done += 1
+            if progress:
+                progress(done, len(items))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            for _ in pool.map(render_label, todo, chunksize=32):
+                done += 1
+                if progress and done % 32 == 0:
+                    progress(done, len(items))
+        if progress:
+            progress(done, len(items))
+    return [_label_path(it["key"]) for it in items]
+
+
+def _pages(paths):
+    cols, rows = PAGE_GRID
+    cell_w, cell_h = PAGE_SIZE[0] // cols, PAGE_SIZE[1] // rows
+    per_page = cols * rows
+    for start in range(0, len(paths), per_page):
+        page = Image.new("RGB", PAGE_SIZE, "white")
+        for i, path in enumerate(paths[start:start + per_page]):
+            with Image.open(path) as label:
+                x = (i % cols) * cell_w + (cell_w - label.width) // 2
+                y = (i // cols) * cell_h + (cell_h - label.height) // 2
+                page.paste(label, (x, y))
+        yield page
+
+
+def _write_pdf(paths, out_path):
+    # 分批追加写入 PDF，内存中最多保留 PDF_BATCH_PAGES 页
+    batch, first = [], True
+    for page in _pages(paths):
+        batch.append(page)
+        if len(batch) == PDF_BATCH_PAGES:
+            batch[0].save(out_path, "PDF", save_all=True, append_images=batch[1:], resolution=200, append=not first)
+            batch, first = [], False
+    if batch:
+        batch[0].save(out_path, "PDF", save_all=True, append_images=batch[1:], resolution=200, append=not first)
+
+
+def _write_zip(paths, items, out_path):
+    # PNG 已压缩，ZIP 直接存储
+    with zipfile.ZipFile(out_path, "w", zipfile.ZIP_STORED) as zf:
+        used = set()
+        for path, item in zip(paths, items):
+            name = re.sub(r'[\\/:*?"<>|]+', "_", item["code"]) + ".png"
+            if name in used:
+                name = f"{item['key'][:8]}_{name}"
+            used.add(name)
+            zf.write(path, name)
+
+
+def _prune_outputs():
+    files = sorted((os.path.join(OUTPUT_DIR, f) for f in os.listdir(OUTPUT_DIR) if not f.startswith(".")),
+                   key=os.path.getmtime, reverse=True)
+    for path in files[KEEP_OUTPUTS:]:
+        os.remove(path)
+
+
+def export_labels(df, fmt="pdf", progress=None, max_workers=None):
+    """
+    生成标签文件 (pdf 或 zip) 并返回磁盘路径。
+    输出按全部标签内容哈希命名，相同批次再次打印直接复用已有文件。
+    """
+    items = label_items(df)
+    if not items:
+        return None
+    batch_key = hashlib.sha1("".join(it["key"] for it in items).encode()).hexdigest()[:16]
+    out_path = os.path.join(OUTPUT_DIR, f"labels_{batch_key}.{fmt}")
+    if os.path.exists(out_path):
+        if progress:
+            progress(len(items), len(items))
+        return out_path
+    paths = render_labels(items, progress, max_workers)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", suffix="." + fmt, dir=OUTPUT_DIR)
+    os.close(fd)
+    try:
+        if fmt == "pdf":
+            os.remove(tmp)  # PIL 首批按新文件写入
+            _write_pdf(paths, tmp)
+        else:
+            _write_zip(paths, items, tmp)
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _prune_outputs()
+    return out_path
@@ -0,0 +1,127 @@
+import bisect
+import pandas as pd
+
+# 报修时可输入的设备编号：条码 / SN / 老编号 / 国标代码
+LOOKUP_COLUMNS = ["国标代码+地点+流水", "设备SN码", "老编号", "资产国标代码"]
+
+
+def _normalize(code):
+    return str(code).strip().lower()
+
+
+def _codes(series):
+    # 编号列可能被推断成数值 (插入空行后整数列会变成浮点)，统一转成不带 .0 的文本
+    if pd.api.types.is_float_dtype(series):
+        whole = series.notna() & (series == series.round())
+        text = series.astype("string")
+        text[whole] = series[whole].astype("int64").astype("string")
+        series = text
+    raw = series.astype("string").str.strip()
+    return raw[raw.notna() & (raw != "")]
+
+
+class AssetLookup:
+    """
+    设备编号查找索引：有序数组 (编码, 行ID) 做前缀联想 (二分定位)，字典做精确查找。
+    行 ID 即资产表索引，增量编辑后只需对改动的行删旧插新。
+    """
+
+    def __init__(self):
+        self._sorted = []   # [(编码小写, 行ID)]，按编码排序
+        self._exact = {}    # 编码小写 → {行ID}
+        self._by_rid = {}   # 行ID → {编码小写}
+        self._original = {}  # 编码小写 → 原始写法 (展示用)
+
+    def rebuild(self, df):
+        self._exact, self._by_rid, self._original = {}, {}, {}
+        cols = [c for c in LOOKUP_COLUMNS if c in df.columns]
+        for col in cols:
+            raw = _codes(df[col])
+            for rid, value, key in zip(raw.index, raw, raw.str.lower()):
+                self._exact.setdefault(key, set()).add(rid)
+                self._by_rid.setdefault(rid, set()).add(key)
+                self._original.setdefault(key, value)
+        self._sorted = sorted((k, rid) for k, rids in self._exact.items() for rid in rids)
+
+    def _remove(self, rid):
+        for key in self._by_rid.pop(rid, ()):
+            rids = self._exact.get(key)
+            if rids is None:
+                continue
+            # 集合与旧索引共享，替换而不原地修改
+            rids = rids - {rid}
+            if rids:
+                self._exact[key] = rids
+            else:
+                del self._exact[key]
+            i = bisect.bisect_left(self._sorted, (key, rid))
+            if i < len(self._sorted) and self._sorted[i] == (key, rid):
+                del self._sorted[i]
+
+    def patched(self, df, rids):
+        """
+        返回只更新了改动行的新索引：先删旧编码，再按当前内容插回 (已删除的行不再插回)。
+        在副本上修改，其他会话可以继续在旧索引上联想查找。
+        """
+        new = AssetLookup()
+        new._sorted = list(self._sorted)
+        new._exact = dict(self._exact)
+        new._by_rid = dict(self._by_rid)
+        new._original = dict(self._original)
+        new._patch(df, rids)
+        return new
+
+    def _patch(self, df, rids):
+        cols = [c for c in LOOKUP_COLUMNS if c in df.columns]
+        present = df.index.intersection(list(rids))
+        for rid in rids:
+            self._remove(rid)
+        rows = df.loc[present, cols]
+        keys_by_rid = {}
+        for col in cols:
+            raw = _codes(rows[col])
+            for rid, value in raw.items():
+                key = value.lower()
+                if key in keys_by_rid.setdefault(rid, set()):
+                    continue
+                keys_by_rid[rid].add(key)
+                self._original.setdefault(key, value)
+                self._exact[key] = self._exact.get(key, set()) | {rid}
+                bisect.insort(self._sorted, (key, rid))
+        self._by_rid.update(keys_by_rid)
+
+    def exact(self, code):
+        """精确查找，返回行 ID；同一编码对应多台设备时取第一条。"""
+        rids = self._exact.get(_normalize(code))
+        return min(rids) if rids else None
+
+    def prefix(self, text, limit=10):
+        """前缀联想：返回 [(编码原文, 行ID)]，最多 limit 条，按编码排序。"""
+        text = _normalize(text)
+        if not text:
+            return []
+        out = []
+        i = bisect.bisect_left(self._sorted, (text,))
+        while i < len(self._sorted) and len(out) < limit and self._sorted[i][0].startswith(text):
+            key, rid = self._sorted[i]
+            out.append((self._original.get(key, key), rid))
+            i += 1
+        return out
+
+
+def lookup_for(store):
+    """取与资产缓存同版本的查找索引；只有增量编辑时按改动行修补，整表重载时才全量重建。"""
+    def build(df):
+        index = AssetLookup()
+        index.rebuild(df)
+        return index
+    return store.incremental("asset_lookup", build, lambda old, df, rids: old.patched(df, rids))
+
+
+def asset_record(store, code):
+    """按设备编号精确查找，返回该设备的一行 (Series) 或 None。"""
+    index = lookup_for(store)
+    rid = index.exact(code) if index is not None else None
+    if rid is None:
+        return None
+    return store.view().loc[rid]
@@ -0,0 +1,70 @@
+import datetime
+import pandas as pd
+from modules.asset_derive import AGE_THRESHOLDS, derived_for
+
+NO_DEPT = ""
+MEASURES = ["count", "value", "quantity", "incomplete", "scrap"] + [f"age_{t}" for t in AGE_THRESHOLDS]
+
+
+def _row_facts(df, derived):
+    """每行对各指标的贡献 (按行 ID 索引)，增量更新时据此先减旧值再加新值；derived 为同版本的派生列。"""
+    derived = derived.loc[df.index]
+    facts = pd.DataFrame({
+        "dept": df["科室"].astype("string").fillna(NO_DEPT),
+        "value": pd.to_numeric(df["价值"], errors="coerce").fillna(0.0),
+        "quantity": pd.to_numeric(df["数量"], errors="coerce").fillna(0.0),
+        "incomplete": df.isna().any(axis=1).astype(int),
+        "scrap": derived["scrap_eligible"].astype(int),
+    }, index=df.index)
+    for t in AGE_THRESHOLDS:
+        facts[f"age_{t}"] = (derived["age_years"] >= t).astype(int)
+    facts["count"] = 1
+    return facts
+
+
+def _aggregate(facts):
+    if not len(facts):
+        return pd.DataFrame(columns=MEASURES, dtype=float)
+    return facts.groupby("dept", sort=True)[MEASURES].sum()
+
+
+class MetricsCube:
+    """
+    资产统计立方体：按科室汇总 数量/总价值/台套数/未完善行数/可报废数/各年限段计数。
+    数据整表重载时全量构建；看板编辑保存后只对改动的行做加减。
+    """
+
+    def __init__(self, df, derived, facts=None, by_dept=None):
+        self._facts = _row_facts(df, derived) if facts is None else facts
+        self.by_dept = _aggregate(self._facts) if by_dept is None else by_dept
+
+    def patched(self, df, derived, rids):
+        """对改动行先减旧值再加新值，返回新的立方体 (不修改自身，其他会话可能正在读取)。"""
+        rids = pd.Index(list(rids))
+        old = self._facts.loc[self._facts.index.intersection(rids)]
+        new = _row_facts(df.loc[df.index.intersection(rids)], derived)
+        cube = self.by_dept.sub(_aggregate(old), fill_value=0).add(_aggregate(new), fill_value=0)
+        return MetricsCube(df, derived, facts=pd.concat([self._facts.drop(old.index), new]),
+                           by_dept=cube[cube["count"] > 0].sort_index())
+
+    @property
+    def totals(self):
+        cube = self.by_dept
+        return {
+            "value": float(cube["value"].sum()),
+            "quantity": float(cube["quantity"].sum()),
+            "departments": len(cube.index.drop(NO_DEPT, errors="ignore")),
+            "incomplete": int(cube["incomplete"].sum()),
+            "scrap": int(cube["scrap"].sum()),
+            "age": {t: int(cube[f"age_{t}"].sum()) for t in AGE_THRESHOLDS},
+        }
+
+
+def metrics_for(store):
+    """取与资产缓存同版本的统计立方体；增量编辑只修补改动行，跨天或整表重载时重建。"""
+    today = datetime.date.today()
+    # 年龄与可报废标记直接取同版本的派生列，不再重复解析日期
+    return store.incremental(
+        ("metrics", today),
+        lambda df: MetricsCube(df, derived_for(store).frame),
+        lambda old, df, rids: old.patched(df, derived_for(store).frame, rids))
@@ -1,7 +1,40 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 import time
+from modules.asset_store import get_asset_store, StaleDataError
+from modules.asset_derive import AGE_THRESHOLDS, derived_for
+from modules.asset_query import PAGE_SIZES, select_positions, page_slice
+from modules.asset_tree import tree_for
+from modules.asset_labels import export_labels, public_base_url
+from modules.asset_metrics import metrics_for
+from modules.asset_export import MIME_TYPES, export_table, fill_template, list_templates
+from modules.profiling import stage
+
+DERIVED_LABELS = {
+    "age_years": "设备年龄", "remaining_life": "剩余年限",
+    "depreciated_value": "折旧后价值", "scrap_eligible": "可报废",
+}
+
+def editor_delta(state, row_ids, columns):
+    # data_editor 的增量以显示行位置为键，这里换算成主表的稳定行 ID，并丢弃只读的派生列
+    cols = set(columns) - {"序号"}
+    updates = {}
+    for pos, changes in state.get("edited_rows", {}).items():
+        changes = {c: v for c, v in changes.items() if c in cols}
+        if changes:
+            updates[row_ids[int(pos)]] = changes
+    inserts = [{c: v for c, v in row.items() if c in cols} for row in state.get("added_rows", [])]
+    deletes = [row_ids[int(pos)] for pos in state.get("deleted_rows", [])]
+    return updates, inserts, deletes
+
+def has_edits(state):
+    return bool(state and (state.get("edited_rows") or state.get("added_rows") or state.get("deleted_rows")))
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
 
 def show_asset():
     # 注入高级 CSS：修复金额显示不全，强化点击交互
@@ -34,45 +67,42 @@ def show_asset():
     """, unsafe_allow_html=True)
 
     st.header("📊 医疗装备综合资产档案")
-    path = "data/equipment.csv"
+    store = get_asset_store()
     
-    if not os.path.exists(path):
+    # 从进程级缓存取只读视图，文件未变化时不再重复读取 CSV
+    with stage("load"):
+        df = store.view()
+    if df is None:
         st.error("❌ 数据未初始化。请前往『后台管理』->『🚀 资产导入』点击同步。")
         return
-
-    # 安全读取数据
-    df = pd.read_csv(path, encoding='utf-8-sig')
+    cs = store.stats()
+    st.caption(f"🗄️ 资产缓存 v{cs['version']} · 命中 {cs['hits']} 次 / 加载 {cs['misses']} 次")
     
-    # 核心：年限计算 (基准2025年)
-    curr_yr = 2025
-    def calc_age(row):
-        try:
-            val = str(row['出厂日期'])
-            year = int(val[:4]) 
-            return curr_yr - year
-        except: return 0
-    df['age_years'] = df.apply(calc_age, axis=1)
+    # 核心：派生列 (年龄/剩余年限/折旧/可报废) 向量化计算，随资产缓存一起复用
+    with stage("age calc"):
+        derived = derived_for(store)
+    # 看板数字全部来自按科室预聚合的统计立方体，编辑保存后增量更新
+    with stage("metrics"):
+        totals = metrics_for(store).totals
 
     # --- 第一部分：综合统计看板 ---
     st.subheader("📈 资产数据实时统计")
     m1, m2, m3, m4 = st.columns(4)
     
     with m1:
-        total_val = pd.to_numeric(df['价值'], errors='coerce').sum()
+        total_val = totals["value"]
         st.markdown('<div class="main-stat">', unsafe_allow_html=True)
         st.metric("资产总价值", f"￥{total_val:,.2f}") # 增加了逗号分隔和完整位显示
         st.markdown('</div>', unsafe_allow_html=True)
         
     with m2:
-        total_qty = pd.to_numeric(df['数量'], errors='coerce').sum()
-        st.metric("资产总数量", f"{int(total_qty) if not pd.isna(total_qty) else 0} 台/套")
+        st.metric("资产总数量", f"{int(totals['quantity'])} 台/套")
         
     with m3:
-        st.metric("在管科室数", f"{df['科室'].dropna().nunique()} 个")
+        st.metric("在管科室数", f"{totals['departments']} 个")
         
     with m4:
-        incomplete = df.drop(columns=['age_years'], errors='ignore').isnull().any(axis=1).sum()
-        st.metric("未完善数据量", f"{incomplete} 条")
+        st.metric("未完善数据量", f"{totals['incomplete']} 条")
 
     st.divider()
 
@@ -83,20 +113,12 @@ def show_asset():
     if 'age_filter' not in st.session_state:
         st.session_state.age_filter = 0
 
-    c1, c2, c3, c4 = st.columns(4)
-    
-    with c1:
-        count_5 = len(df[df['age_years'] >= 5])
-        if st.button(f"5年以上: {count_5}", key="btn_5"): st.session_state.age_filter = 5
-    with c2:
-        count_7 = len(df[df['age_years'] >= 7])
-        if st.button(f"7年以上: {count_7}", key="btn_7"): st.session_state.age_filter = 7
-    with c3:
-        count_10 = len(df[df['age_years'] >= 10])
-        if st.button(f"10年以上: {count_10}", key="btn_10"): st.session_state.age_filter = 10
-    with c4:
-        count_13 = len(df[df['age_years'] >= 13])
-        if st.button(f"13年以上: {count_13}", key="btn_13"): st.session_state.age_filter = 13
+    # 各年限计数直接读统计立方体
+    for col, yrs in zip(st.columns(len(AGE_THRESHOLDS)), AGE_THRESHOLDS):
+        with col:
+            if st.button(f"{yrs}年以上: {totals['age'][yrs]}", key=f"btn_{yrs}"):
+                st.session_state.age_filter = yrs
+    st.caption(f"♻️ 已达可报废年限：{totals['scrap']} 台/套")
 
     # 重置筛选按钮
     if st.session_state.age_filter > 0:
@@ -109,41 +131,158 @@ def show_asset():
     # --- 第三部分：数据维护总表 (应用筛选) ---
     st.subheader("⌨️ 数据维护总表")
     
-    # 应用年限筛选
-    display_df = df.copy()
+    # 筛选、排序、分页都在服务端的共享缓存上完成，只把当前页发送到浏览器
+    all_cols = [c for c in df.columns]
+    f1, f2, f3, f4 = st.columns([2, 2, 2, 1])
+    keyword = f1.text_input("🔎 关键字（名称/编码/SN/型号等）", key="grid_kw")
+    dept = f2.selectbox("科室", ["全部"] + store.departments(), key="grid_dept")
+    sort_by = f3.selectbox("排序列", ["（原始顺序）"] + all_cols, key="grid_sort")
+    desc = f4.toggle("降序", key="grid_desc")
+    visible = st.multiselect("显示列", all_cols, default=all_cols, key="grid_cols")
+
+    with stage("filter"):
+        positions = select_positions(
+            store, derived, age_min=st.session_state.age_filter,
+            dept=None if dept == "全部" else dept, keyword=keyword,
+            sort_by=None if sort_by == "（原始顺序）" else sort_by, ascending=not desc)
     if st.session_state.age_filter > 0:
-        display_df = display_df[display_df['age_years'] >= st.session_state.age_filter]
         st.warning(f"🔍 当前正在查看：{st.session_state.age_filter} 年及以上的设备明细")
 
-    display_df['序号'] = range(1, len(display_df) + 1)
-    edit_ready = display_df.drop(columns=['age_years'], errors='ignore')
-    
-    edited = st.data_editor(
-        edit_ready,
-        num_rows="dynamic", use_container_width=True, height=450,
-        column_config={
-            "序号": st.column_config.NumberColumn(disabled=True),
-            "价值": st.column_config.NumberColumn(format="￥%.2f"),
-            "价格": st.column_config.NumberColumn(format="￥%.2f")
-        },
-        key="main_editor"
-    )
+    p1, p2, p3 = st.columns([1, 1, 3])
+    page_size = p1.selectbox("每页行数", PAGE_SIZES, key="grid_size")
+    pages = max(1, -(-len(positions) // page_size))
+    page = p2.number_input("页码", min_value=1, max_value=pages, value=1, step=1, key="grid_page")
+    p3.caption(f"共 {len(positions)} 条，{pages} 页；当前第 {page} 页")
+
+    with stage("editor serialize"):
+        edit_ready = page_slice(df, positions, page, page_size, ["序号"] + [c for c in visible if c != "序号"])
+        # 只有筛选条件或页码变化才换新 key；其他用户保存不会清掉本会话尚未保存的编辑
+        editor_key = "main_editor_" + str(hash((st.session_state.age_filter, keyword, dept,
+                                                 sort_by, desc, tuple(visible), page_size, page)))
+        # 渲染时记下本页的行 ID 与数据代次：有未保存的编辑时继续展示这份快照，保存时按它换算行 ID 并校验代次
+        snap = st.session_state.get("grid_snapshot")
+        if not snap or snap["key"] != editor_key or not has_edits(st.session_state.get(editor_key)):
+            # 派生列只读展示在表尾，保存前剔除
+            extra = derived.frame.loc[edit_ready.index].rename(columns=DERIVED_LABELS)
+            snap = {"key": editor_key, "generation": store.generation, "row_ids": edit_ready.index,
+                    "columns": edit_ready.columns, "frame": pd.concat([edit_ready, extra], axis=1)}
+            st.session_state.grid_snapshot = snap
+        edited = st.data_editor(
+            snap["frame"],
+            num_rows="dynamic", use_container_width=True, height=450,
+            column_config={
+                "序号": st.column_config.NumberColumn(disabled=True),
+                "价值": st.column_config.NumberColumn(format="￥%.2f"),
+                "价格": st.column_config.NumberColumn(format="￥%.2f"),
+                **{c: st.column_config.Column(disabled=True) for c in DERIVED_LABELS.values()},
+                "折旧后价值": st.column_config.NumberColumn(format="￥%.2f", disabled=True)
+            },
+            key=editor_key
+        )
 
     if st.button("💾 保存档案所有修改"):
-        # 注意：保存时需要同步回原 CSV，不能只保存筛选后的
-        # 这里逻辑是：如果是筛选状态，我们建议用户先清除筛选再大规模修改，或者合并保存
-        if st.session_state.age_filter > 0:
-            st.error("⚠️ 请在清除筛选状态下进行全局保存，以确保数据完整性。")
+        # 只提交编辑器记录的增量 (修改/新增/删除行)，按稳定行 ID 回写主表，筛选/分页状态下同样可以保存
+        updates, inserts, deletes = editor_delta(st.session_state[editor_key], snap["row_ids"], snap["columns"])
+        if not (updates or inserts or deletes):
+            st.info("没有需要保存的修改。")
         else:
-            edited['序号'] = range(1, len(edited) + 1)
-            edited.to_csv(path, index=False, encoding='utf-8-sig')
-            st.success("✅ 数据已保存。")
-            time.sleep(1); st.rerun()
+            try:
+                # 用渲染时的代次：期间数据被重新导入或外部修改时报错提示，而不是把编辑写到错位的行上
+                store.apply_changes(snap["generation"], updates, inserts, deletes)
+            except StaleDataError as e:
+                # 本次修改未写入；下次重跑改为展示最新数据
+                st.session_state.pop("grid_snapshot", None)
+                st.error(f"⚠️ {e} 本次 {len(updates) + len(inserts) + len(deletes)} 行修改未保存。")
+            else:
+                st.session_state.pop("grid_snapshot", None)
+                st.session_state.pop(editor_key, None)
+                st.success(f"✅ 数据已保存：修改 {len(updates)} 行，新增 {len(inserts)} 行，删除 {len(deletes)} 行。")
+                time.sleep(1); st.rerun()
 
-    # --- 第四部分：树状视图 ---
+    # --- 第四部分：树状视图 (与上方筛选条件一致) ---
     st.subheader("🌳 科室资产树状视图")
-    depts = sorted(edit_ready['科室'].dropna().unique().tolist())
-    for d in depts:
-        d_data = edit_ready[edit_ready['科室'] == d]
-        with st.expander(f"📁 {d} ({len(d_data)} 条)"):
-            st.dataframe(d_data, use_container_width=True)
+    with stage("tree view"):
+        tree = tree_for(store)
+        # 无筛选时直接复用缓存好的整棵树；有筛选时只对命中行做一次分组
+        filtered = len(positions) != len(df) or sort_by != "（原始顺序）"
+        nodes = tree.group(positions) if filtered else tree.full
+        for node in nodes:
+            d = node["dept"]
+            # 展开时才渲染明细表，折叠的科室不产生任何表格负载
+            exp = st.expander(f"📁 {d} ({node['count']} 条 · ￥{node['value']:,.2f})", key=f"tree_{d}", on_change="rerun")
+            if exp.open:
+                with exp:
+                    st.dataframe(pd.DataFrame([{"设备名称 / 型号": c["name"], "数量": c["count"], "总价值": c["value"]}
+                                               for c in node["children"]]),
+                                 use_container_width=True, hide_index=True,
+                                 column_config={"总价值": st.column_config.NumberColumn(format="￥%.2f")})
+                    names = [c["name"] for c in node["children"]]
+                    pick = st.selectbox("查看明细", ["全部"] + names, key=f"tree_pick_{d}")
+                    rows = node["positions"] if pick == "全部" else node["children"][names.index(pick)]["positions"]
+                    st.dataframe(df.iloc[np.sort(rows)], use_container_width=True)
+
+    # --- 第五部分：资产标签打印 ---
+    st.subheader("🏷️ 资产二维码标签")
+    l1, l2, l3 = st.columns([2, 1, 1])
+    label_dept = l1.selectbox("打印范围", ["全部科室"] + store.departments(), key="label_dept")
+    label_fmt = l2.radio("格式", ["PDF", "ZIP"], horizontal=True, key="label_fmt")
+    # 未配置对外地址时二维码指向不可达的链接，直接禁止打印
+    base_url = public_base_url()
+    if not base_url:
+        st.warning("⚠️ 尚未配置扫码访问地址，标签上的二维码将无法打开。请在「后台管理 → 视觉配置」中填写后再打印。")
+    if l3.button("🖨️ 生成标签", disabled=not base_url):
+        target = df if label_dept == "全部科室" else df.iloc[tree.dept_positions(label_dept)]
+        bar = st.progress(0.0, text="正在生成标签…")
+        # 渲染在进程池中进行，已生成过的标签直接复用磁盘缓存
+        path = export_labels(target, label_fmt.lower(),
+                             progress=lambda done, total: bar.progress(done / total, text=f"已生成 {done}/{total} 张"))
+        st.session_state.label_file = path
+        if path is None:
+            st.warning("所选范围内没有带国标代码的设备。")
+    path = st.session_state.get("label_file")
+    if path and os.path.exists(path):
+        # 文件已在磁盘上，点击下载时才读取
+        st.download_button(f"⬇️ 下载 {os.path.basename(path)}", data=lambda: _read_bytes(path),
+                           file_name=os.path.basename(path),
+                           mime="application/pdf" if path.endswith(".pdf") else "application/zip")
+
+    # --- 第六部分：导出与批量填表 (范围与上方筛选一致) ---
+    st.subheader("📤 导出与批量填表")
+    counts = {"当前筛选": len(positions), "当前页": len(edit_ready)}
+    x1, x2, x3 = st.columns([2, 1, 1])
+    scope = x1.radio("导出范围", list(counts), horizontal=True, key="export_scope",
+                     format_func=lambda s: f"{s} ({counts[s]} 条)")
+    export_fmt = x2.radio("格式", ["XLSX", "CSV"], horizontal=True, key="export_fmt")
+    with_derived = x3.checkbox("附带派生列", key="export_derived")
+    start = (page - 1) * page_size
+    rows = positions if scope == "当前筛选" else positions[start:start + page_size]
+    cols = [c for c in visible if c in df.columns]
+
+    def run(job, text):
+        bar = st.progress(0.0, text=text)
+        path = job(lambda done, total: bar.progress(done / max(total, 1), text=f"已处理 {done}/{total} 条"))
+        bar.empty()
+        st.session_state.export_file = path
+
+    b1, b2, b3 = st.columns([1, 2, 1])
+    if b1.button("📤 导出表格", disabled=not len(rows)):
+        # 按块流式写入磁盘，只有点击下载时才读入内存
+        frames = [df[cols]] + ([derived.frame.rename(columns=DERIVED_LABELS)] if with_derived else [])
+        run(lambda cb: export_table(frames, rows, export_fmt.lower(), progress=cb), "正在导出…")
+    templates = list_templates()
+    if templates:
+        names = [t["name"] for t in templates]
+        pick = b2.selectbox("填写模板", names, key="export_template", label_visibility="collapsed",
+                            format_func=lambda n: ("📄 " if templates[names.index(n)]["kind"] == "form" else "📊 ") + n)
+        if b3.button("📝 批量填表", disabled=not len(rows)):
+            tpl = templates[names.index(pick)]
+            try:
+                run(lambda cb: fill_template(tpl["path"], df, rows, progress=cb), "正在填写模板…")
+            except ValueError as e:
+                st.error(f"⚠️ {e}")
+        b2.caption("📄 Word 表单每台设备一页；📊 Excel 清单按设备数扩展明细行 (.xls 模板输出为 .xlsx)")
+    path = st.session_state.get("export_file")
+    if path and os.path.exists(path):
+        ext = path.rsplit(".", 1)[-1]
+        st.download_button(f"⬇️ 下载 {os.path.basename(path)}", data=lambda: _read_bytes(path),
+                           file_name=os.path.basename(path), mime=MIME_TYPES[ext], key="export_download")
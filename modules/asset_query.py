@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from modules.asset_derive import parse_dates
+from modules.asset_tree import tree_for
+
+DATE_COLUMNS = ("出厂日期", "验收日期")
+
+PAGE_SIZES = [50, 100, 200, 500]
+# 关键字搜索覆盖的列
+SEARCH_COLUMNS = ["设备名称", "设备名", "科室", "资产国标代码", "国标代码+地点+流水", "设备SN码",
+                  "老编号", "品牌", "型号", "生产编号"]
+
+
+def _search_text(df):
+    cols = [c for c in SEARCH_COLUMNS if c in df.columns]
+    text = df[cols].astype("string").fillna("")
+    # 按列向量化拼接，避免逐行 join
+    joined = text[cols[0]].str.cat([text[c] for c in cols[1:]], sep=" ")
+    return joined.str.lower().to_numpy(dtype=object)
+
+
+def _sort_order(df, column, ascending):
+    # 按位置返回排序结果，空值排最后；数值列按数值排序
+    values = df[column]
+    if column in DATE_COLUMNS:
+        # 日期格式杂乱，按解析后的日期排序
+        values = parse_dates(values)
+        numeric = values.astype("int64").where(values.notna())
+    else:
+        numeric = pd.to_numeric(values, errors="coerce")
+    if column in DATE_COLUMNS or numeric.notna().sum() >= values.notna().sum() * 0.9:
+        keys, nulls = numeric.to_numpy(dtype=float), numeric.isna().to_numpy()
+    else:
+        keys, nulls = values.astype("string").fillna("").to_numpy(dtype=str), values.isna().to_numpy()
+    order = np.argsort(keys, kind="stable")
+    if not ascending:
+        order = order[::-1]
+    return np.concatenate([order[~nulls[order]], order[nulls[order]]])
+
+
+def select_positions(store, derived=None, age_min=0, dept=None, keyword="", sort_by=None, ascending=True):
+    """在服务端缓存上完成筛选与排序，返回命中行在主表中的位置数组；排序顺序与搜索文本按数据版本缓存。"""
+    df = store.view()
+    if df is None:
+        return np.array([], dtype=int)
+    mask = np.ones(len(df), dtype=bool)
+    if age_min and derived is not None:
+        mask &= df.index.isin(derived.index_at_least(age_min))
+    if dept:
+        # 科室分组索引已缓存，直接取该科室的行位置
+        in_dept = np.zeros(len(df), dtype=bool)
+        in_dept[tree_for(store).dept_positions(dept)] = True
+        mask &= in_dept
+    keyword = (keyword or "").strip().lower()
+    if keyword:
+        text = store.derived("search_text", _search_text)
+        mask &= np.fromiter((keyword in t for t in text), dtype=bool, count=len(text))
+    if sort_by:
+        order = store.derived(("sort", sort_by, ascending), lambda d: _sort_order(d, sort_by, ascending))
+        return order[mask[order]]
+    return np.flatnonzero(mask)
+
+
+def page_slice(df, positions, page=1, page_size=PAGE_SIZES[0], columns=None):
+    """只取当前页 (索引为稳定行 ID)，并按可见列投影。"""
+    start = (max(page, 1) - 1) * page_size
+    page_df = df.iloc[positions[start:start + page_size]]
+    if columns:
+        page_df = page_df[[c for c in columns if c in page_df.columns]]
+    return page_df
@@ -0,0 +1,197 @@
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from modules.storage import get_backend, StaleDataError
+
+# pandas 2.x 需显式开启写时复制，视图上的修改才不会回写到共享主表 (3.x 默认开启)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+CHANGELOG_SIZE = 20
+
+
+class AssetStore:
+    """进程级资产表缓存：全部会话共享一份数据，存储签名 (文件 mtime/大小或库版本) 变化或本应用写入时失效。"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._df = None
+        self._sig = None
+        self._derived = {}
+        # 可增量修补的派生结果：键 → (版本, generation, 结果)，跨版本保留供 incremental() 修补
+        self._latest = {}
+        self.version = 0
+        # 行 ID (DataFrame 索引) 在同一 generation 内保持稳定；只有整表重载/替换才会递增
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        # 最近几次增量编辑涉及的行 ID：(编辑后版本, 行ID集合)，供派生索引增量更新
+        self._changelog = []
+
+    def _signature(self):
+        return self.backend.asset_signature()
+
+    def exists(self):
+        return self._signature() is not None
+
+    def _ensure_loaded(self):
+        sig = self._signature()
+        if sig is None:
+            self._df, self._sig = None, None
+            return
+        if self._df is not None and sig == self._sig:
+            self.hits += 1
+            return
+        self.misses += 1
+        self._df = self.backend.read_assets()
+        self._sig = sig
+        self._derived, self._latest = {}, {}
+        self.version += 1
+        self.generation += 1
+
+    def view(self):
+        # 返回只读视图 (浅拷贝 + 写时复制)，会话内的改动不会污染共享主表
+        with self._lock:
+            self._ensure_loaded()
+            return None if self._df is None else self._df.copy(deep=False)
+
+    def derived(self, key, builder):
+        """按数据版本缓存由主表派生的结果 (派生列、索引、统计等)，数据变化后自动重建。"""
+        with self._lock:
+            self._ensure_loaded()
+            if self._df is None:
+                return None
+            if key not in self._derived:
+                self._derived[key] = builder(self._df.copy(deep=False))
+            return self._derived[key]
+
+    def incremental(self, key, build, patch):
+        """
+        与 derived() 一样按数据版本缓存，但上一版本的结果跨版本保留：
+        其间只有增量编辑时调用 patch(旧结果, df, 改动行ID集合) 得到新结果，整表重载等情况调用 build(df) 重建。
+        patch 必须返回新对象而不是原地修改，其他会话可能正在读取旧结果。
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if self._df is None:
+                return None
+            if key not in self._derived:
+                prev = self._latest.get(key)
+                changed = None if prev is None else self.changes_since(prev[0], prev[1])
+                df = self._df.copy(deep=False)
+                self._derived[key] = build(df) if changed is None else patch(prev[2], df, changed)
+                self._latest[key] = (self.version, self.generation, self._derived[key])
+            return self._derived[key]
+
+    @contextmanager
+    def bulk_replace(self, columns):
+        """流式整表替换 (导入用)：分块写入后端，提交前其他会话继续读旧数据，提交后缓存失效。"""
+        with self.backend.asset_writer(columns) as write:
+            yield write
+        self.invalidate()
+
+    def apply_changes(self, generation, updates=None, inserts=None, deletes=None):
+        """按行 ID 增量应用编辑：updates={行ID: {列: 值}}，inserts=[{列: 值}]，deletes=[行ID]。"""
+        with self._lock:
+            self._ensure_loaded()
+            if self._df is None or generation != self.generation:
+                raise StaleDataError("资产数据已被重新导入或外部修改，请刷新后重新编辑。")
+            df = self._df.copy(deep=False)
+            updates = {r: c for r, c in (updates or {}).items() if r in df.index}
+            # 按列批量写入，避免逐个单元格 .loc 赋值
+            by_col = {}
+            for rid, changes in updates.items():
+                for col, val in changes.items():
+                    by_col.setdefault(col, ([], []))
+                    by_col[col][0].append(rid)
+                    by_col[col][1].append(val)
+            for col, (rids, vals) in by_col.items():
+                _set_column(df, rids, col, vals)
+            if deletes:
+                df = df.drop(index=list(deletes), errors="ignore")
+            new_rows = None
+            if inserts:
+                start = int(self._df.index.max()) + 1 if len(self._df) else 0
+                new_rows = pd.DataFrame(inserts, columns=df.columns,
+                                        index=range(start, start + len(inserts)))
+                new_rows = new_rows.astype(df.dtypes.to_dict(), errors="ignore")
+                df = pd.concat([df, new_rows])
+            if "序号" in df.columns:
+                df["序号"] = range(1, len(df) + 1)
+                if new_rows is not None:
+                    new_rows["序号"] = df.loc[new_rows.index, "序号"]
+            sig = self.backend.apply_asset_changes(self._sig, df, updates, new_rows, list(deletes or []))
+            # 写入后直接接管新内容与后端返回的签名，不必重新读盘，行 ID 保持不变
+            self._df, self._sig = df, sig
+            self._derived = {}
+            self.version += 1
+            touched = set(updates) | set(deletes or []) | set(() if new_rows is None else new_rows.index)
+            self._changelog = self._changelog[-(CHANGELOG_SIZE - 1):] + [(self.version, touched)]
+
+    def changes_since(self, version, generation):
+        """返回自 version 以来增量编辑涉及的行 ID；期间发生过整表重载或记录已滚出时返回 None。"""
+        with self._lock:
+            if generation != self.generation:
+                return None
+            if version == self.version:
+                return set()
+            logged = [(v, rids) for v, rids in self._changelog if v > version]
+            if len(logged) != self.version - version:
+                return None
+            return set().union(*(rids for _, rids in logged))
+
+    def department_summary(self):
+        # 各科室记录数/总价值/总数量，按数据版本缓存 (每次重跑会多处调用)；SQLite 后端直接用 SQL 聚合
+        if hasattr(self.backend, "department_summary"):
+            return self.derived("department_summary", lambda df: self.backend.department_summary())
+        return self.derived("department_summary", _department_summary)
+
+    def departments(self):
+        summary = self.department_summary()
+        return [] if summary is None else summary["科室"].astype(str).tolist()
+
+    def invalidate(self):
+        with self._lock:
+            self._df, self._sig = None, None
+            self._derived, self._latest = {}, {}
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "version": self.version, "generation": self.generation}
+
+
+def _department_summary(df):
+    return (df.assign(价值=pd.to_numeric(df["价值"], errors="coerce"),
+                      数量=pd.to_numeric(df["数量"], errors="coerce"))
+              .dropna(subset=["科室"])
+              .groupby("科室", sort=True)
+              .agg(记录数=("科室", "size"), 总价值=("价值", "sum"), 总数量=("数量", "sum"))
+              .reset_index())
+
+
+def _set_column(df, rids, col, vals):
+    if pd.api.types.is_numeric_dtype(df[col]):
+        # 编辑器/导入传来的数字常为文本，能转成数值的先转，保持列类型不变
+        nums = pd.to_numeric(pd.Series(vals, dtype=object), errors="coerce")
+        if nums.notna().sum() == pd.Series(vals, dtype=object).notna().sum():
+            vals = nums.to_numpy()
+    try:
+        df.loc[rids, col] = vals
+    except (TypeError, ValueError):
+        # 数值列中写入文本等情况：放宽为 object 列后再写
+        df[col] = df[col].astype(object)
+        df.loc[rids, col] = vals
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_asset_store(backend=None):
+    # 每个存储后端只对应一个进程级实例，所有会话共用
+    backend = backend or get_backend()
+    with _stores_lock:
+        if backend.name not in _stores:
+            _stores[backend.name] = AssetStore(backend)
+        return _stores[backend.name]
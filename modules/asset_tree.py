@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+
+class DeptTree:
+    """科室 → 设备名称/型号 两级分组索引，随资产缓存一起构建一次，之后按位置数组直接切片。"""
+
+    def __init__(self, df):
+        self.dept_codes, self.depts = pd.factorize(df["科室"], sort=True)
+        model = df["设备名称"].astype("string").fillna("未命名") + " / " + df["型号"].astype("string").fillna("-")
+        self.model_codes, self.models = pd.factorize(model, sort=True)
+        self.values = pd.to_numeric(df["价值"], errors="coerce").fillna(0).to_numpy(dtype=float)
+        self.full = self.group(np.arange(len(df)))
+
+    def group(self, positions):
+        """把给定行位置按 科室/型号 分组，一次排序完成，返回节点列表 (含数量、总价值与行位置)。"""
+        positions = np.asarray(positions, dtype=int)
+        positions = positions[self.dept_codes[positions] >= 0]  # 科室为空的不进树
+        order = np.lexsort((self.model_codes[positions], self.dept_codes[positions]))
+        positions = positions[order]
+
+        nodes = []
+        for dept_pos in _split(positions, self.dept_codes[positions]):
+            children = [{
+                "name": self.models[self.model_codes[p[0]]],
+                "count": len(p), "value": float(self.values[p].sum()), "positions": p,
+            } for p in _split(dept_pos, self.model_codes[dept_pos])]
+            nodes.append({
+                "dept": self.depts[self.dept_codes[dept_pos[0]]],
+                "count": len(dept_pos), "value": float(self.values[dept_pos].sum()),
+                "positions": dept_pos, "children": children,
+            })
+        return nodes
+
+    def dept_positions(self, dept):
+        return next((n["positions"] for n in self.full if n["dept"] == dept), np.array([], dtype=int))
+
+
+def _split(positions, codes):
+    # codes 已排好序：在取值变化处切开
+    if len(positions) == 0:
+        return []
+    cuts = np.flatnonzero(np.diff(codes)) + 1
+    return np.split(positions, cuts)
+
+
+def tree_for(store):
+    return store.derived("dept_tree", DeptTree)
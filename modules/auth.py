@@ -0,0 +1,169 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from modules.fileio import atomic_write
+
+SECRET_PATH = "data/.secret_key"
+SESSION_COOKIE = "mz_session"
+SESSION_MAX_AGE = 7 * 24 * 3600
+# 已校验的会话令牌在内存中缓存的时长 (秒)
+TOKEN_CACHE_TTL = 300
+TOKEN_CACHE_SIZE = 1024
+# scrypt 参数：约 16MB 内存、几十毫秒，每个会话只在登录时计算一次
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+
+_secret_cache = {}
+_token_cache = {}
+_token_lock = threading.Lock()
+
+
+def app_secret():
+    """签名密钥 (扫码链接、会话令牌共用，按 salt 区分)：环境变量优先，否则首次使用时生成并保存。"""
+    key = os.environ.get("APP_SECRET_KEY")
+    if key:
+        return key
+    if "key" not in _secret_cache:
+        if not os.path.exists(SECRET_PATH):
+            atomic_write(SECRET_PATH, lambda f: f.write(secrets.token_hex(32)))
+        with open(SECRET_PATH, 'r', encoding='utf-8') as f:
+            _secret_cache["key"] = f.read().strip()
+    return _secret_cache["key"]
+
+
+# --- 密码 ---
+def _b64(raw):
+    return base64.b64encode(raw).decode()
+
+
+def hash_password(password, salt=None, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = salt or os.urandom(16)
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, dklen=32)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(stored, password):
+    """返回 (是否匹配, 是否需要重新哈希)；旧版明文密码匹配后需要迁移为哈希。"""
+    stored = stored or ""
+    if not stored.startswith("scrypt$"):
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8")), True
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        salt, digest = base64.b64decode(salt), base64.b64decode(digest)
+    except ValueError:
+        return False, False
+    actual = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, dklen=len(digest))
+    ok = hmac.compare_digest(actual, digest)
+    return ok, ok and (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def authenticate(users, uid, password):
+    """校验账号密码，成功返回账号记录；明文或旧参数的密码在这次成功登录时透明升级。"""
+    record = users.get(uid)
+    if not record:
+        return None
+    ok, rehash = verify_password(record.get("password"), password)
+    if not ok:
+        return None
+    if rehash:
+        record["password"] = hash_password(password)
+        users.update(uid, password=record["password"])
+    return record
+
+
+# --- 会话令牌 ---
+def _serializer():
+    return URLSafeTimedSerializer(app_secret(), salt="session")
+
+
+def _epoch(record):
+    # 账号记录中的会话纪元：令牌里带签发时的值，纪元递增后该账号之前签发的令牌全部失效
+    return int(record.get("epoch") or 0)
+
+
+def issue_session(uid, record):
+    # sid 标识这一次登录，退出时只吊销它，不影响同一账号在其他设备上的会话
+    return _serializer().dumps({"uid": uid, "name": record.get("name", "用户"), "perms": record.get("perms", []),
+                                "ep": _epoch(record), "sid": secrets.token_urlsafe(12)})
+
+
+def verify_session(token, users):
+    """
+    校验会话令牌，返回 {"uid", "name", "perms"} 或 None。
+    校验通过的令牌缓存 TOKEN_CACHE_TTL 秒，期间刷新页面不再验签；
+    账号表有任何改动 (含其他进程的退出登录、改权限) 时缓存即不再命中。
+    """
+    if not token:
+        return None
+    now = time.monotonic()
+    sig = users.signature()
+    with _token_lock:
+        hit = _token_cache.get(token)
+        if hit and hit[0] > now and hit[1] == sig:
+            return hit[2]
+    try:
+        data = _serializer().loads(token, max_age=SESSION_MAX_AGE)
+    except BadSignature:
+        return None
+    record = users.get(data.get("uid"))
+    if not record or data.get("ep") != _epoch(record) or data.get("sid") in record.get("revoked", {}):
+        return None
+    session = {"uid": data["uid"], "name": record.get("name", data.get("name")),
+               "perms": record.get("perms", data.get("perms", []))}
+    with _token_lock:
+        if len(_token_cache) >= TOKEN_CACHE_SIZE:
+            # 先清过期项，仍然满了就丢掉最早缓存的四分之一
+            stale = [k for k, v in _token_cache.items() if v[0] <= now]
+            for key in stale or list(_token_cache)[:TOKEN_CACHE_SIZE // 4]:
+                _token_cache.pop(key, None)
+        _token_cache[token] = (now + TOKEN_CACHE_TTL, sig, session)
+    return session
+
+
+def end_sessions(users, uid, **fields):
+    """使该账号已签发的令牌全部失效 (改密、改权限时调用)，fields 一并写入账号记录。"""
+    record = users.get(uid) or {}
+    users.update(uid, epoch=_epoch(record) + 1, **fields)
+
+
+def end_session(users, token):
+    """
+    退出登录：只吊销这一个令牌。sid 记在账号记录的 revoked 中 (随账号表跨进程生效)，
+    到令牌本身过期后即可清理，所以名单长度不超过该账号 SESSION_MAX_AGE 内的登录次数。
+    """
+    try:
+        data = _serializer().loads(token or "", max_age=SESSION_MAX_AGE)
+    except BadSignature:
+        return
+    uid, sid = data.get("uid"), data.get("sid")
+    if not sid:
+        # 旧版令牌没有 sid，无法单独吊销，只能让该账号的令牌全部失效
+        end_sessions(users, uid)
+        return
+    now = time.time()
+
+    def revoke(record):
+        revoked = {k: v for k, v in record.get("revoked", {}).items() if v > now}
+        revoked[sid] = now + SESSION_MAX_AGE
+        return {"revoked": revoked}
+    users.modify(uid, revoke)
+
+
+def revoke_user(uid):
+    # 账号记录变更后丢弃本进程缓存的该账号令牌
+    with _token_lock:
+        for key in [k for k, v in _token_cache.items() if v[2]["uid"] == uid]:
+            del _token_cache[key]
+
+
+def cookie_script(token, max_age=SESSION_MAX_AGE):
+    """写入 (或清除) 会话 Cookie 的脚本片段；Streamlit 不能直接设置响应 Cookie，只能由浏览器端写入。"""
+    value = token or ""
+    age = max_age if token else 0
+    return (f"<script>document.cookie = '{SESSION_COOKIE}={value}; path=/; max-age={age}; SameSite=Strict'"
+            f" + (location.protocol === 'https:' ? '; Secure' : '');</script>")
@@ -0,0 +1,70 @@
+import base64
+import hashlib
+import io
+import os
+from PIL import Image, ImageOps
+from modules.fileio import atomic_write
+
+LOGO_PATH = "data/logo.png"
+# 不透明的图片 (照片、白底标志) 存为 JPEG，体积约为 PNG 的几分之一；带透明区域的才保留 PNG
+JPEG_PATH = "data/logo.jpg"
+JPEG_QUALITY = 85
+# .sidebar-logo 最大显示 180×90，按 2 倍存储以适配高分屏
+LOGO_MAX_SIZE = (360, 180)
+
+_uri_cache = {}
+
+
+def save_logo(data):
+    """把上传的图片缩放到侧边栏显示尺寸并压缩保存，返回内容版本号 (写入 config 用作 ETag)。"""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA")
+        img.thumbnail(LOGO_MAX_SIZE, Image.LANCZOS)
+        buf = io.BytesIO()
+        if img.getchannel("A").getextrema()[0] == 255:
+            path, stale = JPEG_PATH, LOGO_PATH
+            img.convert("RGB").save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            path, stale = LOGO_PATH, JPEG_PATH
+            img.save(buf, "PNG", optimize=True)
+    encoded = buf.getvalue()
+    atomic_write(path, lambda f: f.write(encoded), mode="wb")
+    if os.path.exists(stale):
+        os.remove(stale)
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+def remove_logo():
+    for path in (LOGO_PATH, JPEG_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def logo_data_uri(version):
+    """按版本号缓存 data URI，版本不变时不再读盘和编码。"""
+    if not version:
+        return None
+    if version not in _uri_cache:
+        path, mime = next(((p, m) for p, m in ((JPEG_PATH, "image/jpeg"), (LOGO_PATH, "image/png"))
+                           if os.path.exists(p)), (None, None))
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            encoded = base64.b64encode(f.read()).decode()
+        _uri_cache.clear()
+        _uri_cache[version] = f"data:{mime};base64,{encoded}"
+    return _uri_cache[version]
+
+
+def migrate_inline_logo(config):
+    """旧版把原图 base64 存在 config.json 里：转存为缩放后的文件，config 只保留版本号。返回是否有改动。"""
+    legacy = config.pop("logo_base64", None)
+    if legacy is None:
+        return False
+    if legacy:
+        try:
+            config["logo_version"] = save_logo(base64.b64decode(legacy))
+        except (ValueError, OSError):
+            config["logo_version"] = ""
+    return True
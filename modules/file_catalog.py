@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import zipfile
+from modules.fileio import atomic_write
+
+TEXT_CACHE_DIR = "data/file_text_cache"
+TEXT_EXTS = {".docx", ".xlsx", ".xls", ".txt", ".csv"}
+# 全文提取只读取前若干字节，避免超大文件拖慢首次建索引
+MAX_TEXT_CHARS = 200_000
+
+_log = logging.getLogger(__name__)
+
+
+class FileCatalog:
+    """
+    工作文件目录：按 目录 mtime 缓存扫描结果，记录 大小/修改时间/类型/哈希；
+    目录未变化时重跑页面不再 listdir，文件内容只在下载或首次全文检索时读取。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._dir_sig = None
+        self._entries = []
+        self._hashes = {}  # 相对路径 → (大小, mtime, sha1)
+        self._texts = {}   # sha1 → 提取出的文本
+
+    def _signature(self):
+        # 只 stat 上次扫描到的各级目录：增删/改名文件或子目录都会更新所在目录的 mtime
+        dirs = [d for d, _ in self._dir_sig] if self._dir_sig else [self.root]
+        sig = []
+        for d in dirs:
+            try:
+                sig.append((d, os.stat(d).st_mtime_ns))
+            except FileNotFoundError:
+                return None
+        return tuple(sig)
+
+    def _scan(self):
+        entries, dirs = [], []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            dirs.append((dirpath, os.stat(dirpath).st_mtime_ns))
+            for name in filenames:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(dirpath, name)
+                st_ = os.stat(path)
+                rel = os.path.relpath(path, self.root)
+                cached = self._hashes.get(rel)
+                if cached and cached[:2] == (st_.st_size, st_.st_mtime_ns):
+                    digest = cached[2]
+                else:
+                    digest = _file_hash(path)
+                    self._hashes[rel] = (st_.st_size, st_.st_mtime_ns, digest)
+                folder = os.path.relpath(dirpath, self.root)
+                entries.append({
+                    "name": name, "path": path, "rel": rel,
+                    "folder": "" if folder == "." else folder.replace(os.sep, "/"),
+                    "ext": os.path.splitext(name)[1].lower(),
+                    "size": st_.st_size, "mtime": st_.st_mtime, "sha1": digest,
+                })
+        return tuple(dirs), entries
+
+    def entries(self):
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            sig = self._signature()
+            if sig is None or sig != self._dir_sig:
+                self._dir_sig, self._entries = self._scan()
+            return self._entries
+
+    def folders(self):
+        return sorted({e["folder"] for e in self.entries()})
+
+    def text(self, entry):
+        """按内容哈希缓存提取出的文本 (内存 + 磁盘)，同一内容只提取一次。"""
+        digest = entry["sha1"]
+        if digest in self._texts:
+            return self._texts[digest]
+        cache_path = os.path.join(TEXT_CACHE_DIR, digest + ".txt")
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = extract_text(entry["path"], entry["ext"]).lower()
+            atomic_write(cache_path, lambda f: f.write(text))
+        self._texts[digest] = text
+        return text
+
+    def search(self, query="", folder=None, full_text=False, sort_by="name", descending=False):
+        query = (query or "").strip().lower()
+        items = self.entries()
+        if folder is not None:
+            items = [e for e in items if e["folder"] == folder]
+        if query:
+            items = [e for e in items if query in e["name"].lower()
+                     or (full_text and e["ext"] in TEXT_EXTS and query in self.text(e))]
+        key = {"name": lambda e: e["name"].lower(), "mtime": lambda e: e["mtime"],
+               "size": lambda e: e["size"]}[sort_by]
+        return sorted(items, key=key, reverse=descending)
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def extract_text(path, ext):
+    """尽力提取文档文本用于检索，无法解析时返回空串。"""
+    try:
+        if ext == ".docx":
+            with zipfile.ZipFile(path) as zf:
+                xml = zf.read("word/document.xml").decode("utf-8", "ignore")
+            text = " ".join(re.findall(r"<w:t[^>]*>([^<]*)</w:t>", xml))
+        elif ext == ".xlsx":
+            from openpyxl import load_workbook
+            wb = load_workbook(path, read_only=True, data_only=True)
+            text = " ".join(str(v) for ws in wb.worksheets for row in ws.iter_rows(values_only=True)
+                            for v in row if v is not None)
+            wb.close()
+        elif ext == ".xls":
+            text = _xls_text(path)
+        elif ext in (".txt", ".csv"):
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                text = f.read(MAX_TEXT_CHARS)
+        else:
+            text = ""
+    except Exception as e:
+        # 任何解析失败 (损坏的 zip、xlrd 的 CompDocError 等) 都只当作没有文本，不影响检索其他文件
+        _log.warning("无法提取文本 %s：%r", path, e)
+        text = ""
+    return text[:MAX_TEXT_CHARS]
+
+
+def _xls_text(path):
+    try:
+        import xlrd
+    except ImportError:
+        xlrd = None
+    if xlrd is not None:
+        book = xlrd.open_workbook(path, on_demand=True)
+        return " ".join(str(v) for sh in book.sheets() for r in range(sh.nrows)
+                        for v in sh.row_values(r) if v not in ("", None))
+    # 未安装 xlrd 时退而求其次：从 BIFF 字节流中找出 UTF-16LE 编码的中文片段
+    with open(path, "rb") as f:
+        data = f.read()
+    runs = re.findall(rb"(?:[\x00-\xff][\x4e-\x9f]|[\x20-\x7e]\x00){2,}", data)
+    return " ".join(r.decode("utf-16-le", "ignore") for r in runs)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(root):
+    with _catalogs_lock:
+        if root not in _catalogs:
+            _catalogs[root] = FileCatalog(root)
+        return _catalogs[root]
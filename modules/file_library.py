@@ -1,12 +1,20 @@
 import streamlit as st
-import os
+from datetime import datetime
+from modules.file_catalog import get_catalog
+from modules.profiling import stage
+from modules.file_store import AREA_LABELS, area_path, can_access, safe_name, store_upload, \
+    versions, versioned_files, blob_path
+
+SORT_OPTIONS = {"名称": ("name", False), "最近修改": ("mtime", True), "文件大小": ("size", True)}
+MAX_LISTED = 100
 
 def show_library():
     st.markdown("### 📚 医疗装备科工作文件库")
     
     # 定义分类路径
-    public_path = "work_files/public"
-    core_path = "work_files/core"
+    public_path = area_path("public")
+    core_path = area_path("core")
+    perms = st.session_state.get("user_perms", [])
 
     # 1. 所有人可见区域
     st.markdown("#### 🔓 公共办公文件")
@@ -14,50 +22,109 @@ def show_library():
 
     st.markdown("---")
 
-    # 2. 权限可见区域
+    # 2. 权限可见区域 (需『核心文件』权限)
     st.markdown("#### 🔐 核心管理文件")
-    if st.session_state.get('logged_in'):
+    if st.session_state.get('logged_in') and can_access("core", perms):
         st.success(f"✅ 已授权查看：{st.session_state.user_name}")
         display_file_list(core_path, "core")
+    elif st.session_state.get('logged_in'):
+        st.warning("⚠️ 此区域包含核心机密，需要『核心文件』权限，请联系管理员开通。")
     else:
         st.warning("⚠️ 此区域包含核心机密，请在左侧『用户登录』后查看。")
 
+    st.markdown("---")
+    # 展开时才渲染上传区
+    exp = st.expander("⬆️ 上传 / 历史版本", key="lib_upload", on_change="rerun")
+    if exp.open:
+        with exp:
+            show_upload_panel(perms, st.session_state.get("user_name", ""), "lib")
+
+def show_upload_panel(perms, user, key_prefix):
+    """上传文件到有权限的区域；同名文件保留历史版本，相同内容只存一份。"""
+    areas = [a for a in AREA_LABELS if can_access(a, perms)]
+    if not areas:
+        st.caption("没有可上传的文件区域。")
+        return
+    area = st.selectbox("上传到", areas, format_func=AREA_LABELS.get, key=f"{key_prefix}_area")
+    sub = st.text_input("子目录（可选，如 表格/采购）", key=f"{key_prefix}_sub")
+    uploads = st.file_uploader("选择文件", accept_multiple_files=True, key=f"{key_prefix}_files")
+    if uploads and st.button("📤 上传", key=f"{key_prefix}_go"):
+        for up in uploads:
+            try:
+                name = safe_name(f"{sub}/{up.name}" if sub.strip() else up.name)
+                up.seek(0)
+                r = store_upload(area, name, up, user)
+            except ValueError as e:
+                st.error(f"{up.name}：{e}")
+                continue
+            if r["status"] == "unchanged":
+                st.info(f"{name}：内容与当前版本相同，未新增版本")
+            else:
+                st.success(f"{name}：已保存为第 {r['version']} 版（{_human_size(r['size'])}）")
+
+    tracked = versioned_files(area)
+    if tracked:
+        st.markdown("**🕘 历史版本**")
+        name = st.selectbox("文件", sorted(tracked), format_func=lambda n: f"{n}（{tracked[n]} 个版本）",
+                            key=f"{key_prefix}_hist")
+        history = versions(area, name)
+        for i, v in reversed(list(enumerate(history, 1))):
+            c1, c2 = st.columns([4, 1])
+            c1.caption(f"第 {i} 版 · {v['time']} · {v.get('user') or '-'} · {_human_size(v['size'])}"
+                       + (" · 当前" if i == len(history) else ""))
+            c2.download_button("📥", data=lambda d=v["sha1"]: _read_bytes(blob_path(d)),
+                               file_name=name.split("/")[-1], key=f"{key_prefix}_v_{area}_{name}_{i}")
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def _human_size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
 def display_file_list(folder_path, key_prefix):
-    # 自动创建目录（如果不存在）
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path, exist_ok=True)
-    
-    # 获取目录下所有条目
-    all_entries = os.listdir(folder_path)
-    
-    # 过滤出真正的文件，排除文件夹
-    files = [f for f in all_entries if os.path.isfile(os.path.join(folder_path, f))]
-    
+    # 目录清单按目录 mtime 缓存，文件内容只在点击下载时读取
+    catalog = get_catalog(folder_path)
+
+    f1, f2, f3, f4 = st.columns([3, 2, 2, 1])
+    query = f1.text_input("🔎 搜索文件名", key=f"{key_prefix}_q")
+    with stage("catalog scan"):
+        folders = catalog.folders()
+    folder = f2.selectbox("子目录", ["全部"] + [f or "（根目录）" for f in folders], key=f"{key_prefix}_dir")
+    sort_label = f3.selectbox("排序", list(SORT_OPTIONS), key=f"{key_prefix}_sort")
+    full_text = f4.checkbox("全文", key=f"{key_prefix}_ft", help="同时检索 Word / Excel 文件内容")
+
+    if folder == "全部":
+        folder = None
+    elif folder == "（根目录）":
+        folder = ""
+    sort_by, descending = SORT_OPTIONS[sort_label]
+    with stage("search"):
+        files = catalog.search(query, folder, full_text, sort_by, descending)
+
     if not files:
-        st.caption("📂 该文件夹暂无办公文件")
-    else:
-        for file_name in files:
-            # 排除系统隐藏文件 (如 .DS_Store)
-            if file_name.startswith('.'):
-                continue
-                
-            file_ext = os.path.splitext(file_name)[1].lower()
+        st.caption("📂 该文件夹暂无办公文件" if not query else "没有匹配的文件")
+        return
+    st.caption(f"共 {len(files)} 个文件" + (f"，仅显示前 {MAX_LISTED} 个" if len(files) > MAX_LISTED else ""))
+    with stage("render list"):
+        for entry in files[:MAX_LISTED]:
+            file_ext = entry["ext"]
             icon = "📕" if file_ext == ".pdf" else "📗" if "xls" in file_ext else "📘"
-            
+
             # 使用容器包裹，确保在大屏小屏下对齐美观
             with st.container():
                 c1, c2 = st.columns([4, 1])
-                c1.write(f"{icon} {file_name}")
-                
-                try:
-                    file_full_path = os.path.join(folder_path, file_name)
-                    with open(file_full_path, "rb") as f:
-                        c2.download_button(
-                            label="📥 下载",
-                            data=f,
-                            file_name=file_name,
-                            key=f"{key_prefix}_{file_name}",
-                            use_container_width=True # 按钮宽度自适应
-                        )
-                except Exception as e:
-                    c2.error("读取错误")
+                where = f"{entry['folder']}/" if entry["folder"] else ""
+                c1.write(f"{icon} {where}{entry['name']}")
+                c1.caption(f"{_human_size(entry['size'])} · {datetime.fromtimestamp(entry['mtime']):%Y-%m-%d %H:%M}")
+                c2.download_button(
+                    label="📥 下载",
+                    data=lambda path=entry["path"]: _read_bytes(path),
+                    file_name=entry["name"],
+                    key=f"{key_prefix}_{entry['sha1'][:12]}_{entry['rel']}",
+                    use_container_width=True # 按钮宽度自适应
+                )
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+from modules.fileio import atomic_write, file_lock
+
+WORK_ROOT = "work_files"
+# 区域 → 所需权限 (与 ALL_PERMS 对应)
+AREA_PERMS = {"public": "工作文库", "core": "核心文件"}
+AREA_LABELS = {"public": "🔓 公共办公文件", "core": "🔐 核心管理文件"}
+VERSIONS_DIR = os.path.join(WORK_ROOT, ".versions")
+BLOB_DIR = os.path.join(VERSIONS_DIR, "blobs")
+MANIFEST_PATH = os.path.join(VERSIONS_DIR, "manifest.json")
+CHUNK_SIZE = 1 << 20
+
+_lock = threading.Lock()
+
+
+def area_path(area):
+    return os.path.join(WORK_ROOT, area)
+
+
+def can_access(area, perms):
+    return AREA_PERMS[area] in (perms or [])
+
+
+def safe_name(name):
+    """规范化 子目录/文件名，拒绝绝对路径、.. 和隐藏文件。"""
+    parts = [p.strip() for p in name.replace("\\", "/").split("/") if p.strip()]
+    if not parts or any(p in (".", "..") or p.startswith(".") for p in parts):
+        raise ValueError(f"非法文件名：{name}")
+    return "/".join(parts)
+
+
+def blob_path(digest):
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def _read_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _stream_to_blob(stream):
+    # 分块读写并同时计算哈希，内存占用与文件大小无关；相同内容的 blob 只保留一份
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    h, size = hashlib.sha1(), 0
+    fd, tmp = tempfile.mkstemp(prefix=".upload_", dir=BLOB_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        digest = h.hexdigest()
+        target = blob_path(digest)
+        deduped = os.path.exists(target)
+        if deduped:
+            os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp, target)
+        return digest, size, deduped
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _publish(digest, dest):
+    # 把 blob 复制为库中的当前版本 (先写临时文件再替换，阅读中的用户不会拿到半个文件)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(dest))
+    os.close(fd)
+    try:
+        shutil.copyfile(blob_path(digest), tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _snapshot_existing(path):
+    # 库里原有、尚未登记版本的文件：存为第 1 版，首次上传覆盖后仍可找回
+    with open(path, "rb") as f:
+        digest, size, _ = _stream_to_blob(f)
+    mtime = datetime.fromtimestamp(os.path.getmtime(path))
+    return {"sha1": digest, "size": size, "user": "（原有文件）", "time": mtime.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def store_upload(area, name, stream, user):
+    """
+    保存上传文件为新版本并发布到库目录，返回该版本信息。
+    内容与当前版本相同时不新增版本 (status="unchanged")。
+    """
+    key = f"{area}/{safe_name(name)}"
+    dest = os.path.join(WORK_ROOT, key)
+    digest, size, deduped = _stream_to_blob(stream)
+    # 清单的读-改-写在跨进程文件锁内完成，多个进程同时上传不会丢版本
+    with _lock, file_lock(MANIFEST_PATH):
+        manifest = _read_manifest()
+        history = manifest.setdefault(key, [])
+        if not history and os.path.exists(dest):
+            history.append(_snapshot_existing(dest))
+        if history[-1:] and history[-1]["sha1"] == digest:
+            return dict(history[-1], status="unchanged", version=len(history))
+        entry = {"sha1": digest, "size": size, "user": user,
+                 "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        history.append(entry)
+        _publish(digest, dest)
+        atomic_write(MANIFEST_PATH, lambda f: json.dump(manifest, f, ensure_ascii=False, indent=2))
+    return dict(entry, status="deduped" if deduped else "stored", version=len(history))
+
+
+def versions(area, name):
+    """某个文件的历史版本 (从旧到新)。"""
+    with _lock:
+        return list(_read_manifest().get(f"{area}/{name}", []))
+
+
+def versioned_files(area):
+    """有版本记录的文件 → 版本数。"""
+    prefix = f"{area}/"
+    with _lock:
+        return {k[len(prefix):]: len(v) for k, v in _read_manifest().items() if k.startswith(prefix)}
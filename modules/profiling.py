@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# 设置环境变量 APP_PROFILE=1 后所有会话都记录分段耗时；否则只有登录用户带 ?profile=1 访问时记录
+ENV_FLAG = "APP_PROFILE"
+QUERY_FLAG = "profile"
+
+_local = threading.local()
+_last = {"stages": []}
+
+
+def env_enabled():
+    return os.environ.get(ENV_FLAG, "").lower() in ("1", "true", "yes")
+
+
+def start_run(enabled):
+    """每次脚本重跑开始时调用；未启用时 stage() 不做任何记录。"""
+    _local.stages = [] if enabled else None
+
+
+@contextmanager
+def stage(name):
+    """
+    记录一段代码的耗时 (毫秒)；tracemalloc 已开启时 (基准测试 --tracemalloc) 同时记录该段的内存峰值。
+    同名分段多次进入时累加。
+    """
+    stages = getattr(_local, "stages", None)
+    if stages is None:
+        yield
+        return
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        peak = tracemalloc.get_traced_memory()[1] / 1e6 if tracing else None
+        for item in stages:
+            if item["stage"] == name:
+                item["ms"] += ms
+                item["calls"] += 1
+                if peak is not None:
+                    item["peak_mb"] = max(item["peak_mb"] or 0, peak)
+                break
+        else:
+            stages.append({"stage": name, "ms": ms, "calls": 1, "peak_mb": peak})
+
+
+def finish_run():
+    """结束本次重跑，返回分段列表 (未启用时为 None)，并留一份给基准测试读取。"""
+    stages = getattr(_local, "stages", None)
+    _local.stages = None
+    if stages is not None:
+        _last["stages"] = stages
+    return stages
+
+
+def last_run():
+    return list(_last["stages"])
+
+
+def render_overlay(stages):
+    """在侧边栏底部显示本次重跑的分段耗时。"""
+    if not stages:
+        return
+    import streamlit as st
+    total = sum(s["ms"] for s in stages)
+    with st.sidebar.expander(f"⏱️ 本次渲染分段耗时 · 合计 {total:.0f} ms", expanded=True):
+        st.dataframe([{"分段": s["stage"], "耗时(ms)": round(s["ms"], 1), "次数": s["calls"],
+                       **({"内存峰值(MB)": round(s["peak_mb"], 1)} if s["peak_mb"] is not None else {})}
+                      for s in stages], hide_index=True, use_container_width=True)
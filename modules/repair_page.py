@@ -1,17 +1,95 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from modules.asset_store import get_asset_store
+from modules.asset_lookup import lookup_for, asset_record
+from modules.repair_store import get_repair_store, fields_from_asset, RepairStateError, STATUS_FLOW, NEXT_STATUS, OPEN_STATUSES
+from modules.profiling import stage
+
+DEFAULT_DEPTS = ["ICU", "手术室", "放射科", "内科"]
+QUEUE_COLUMNS = ["单号", "设备编号", "设备名称", "使用科室", "维修状态", "审批状态", "故障描述",
+                 "申请时间", "操作人", "状态更新时间"]
+
+
+def _dept_options():
+    # 科室下拉取自资产表现有科室，资产表为空时退回默认列表
+    try:
+        depts = get_asset_store().departments()
+    except Exception:
+        depts = []
+    return depts or DEFAULT_DEPTS
+
 
 def show_repair():
     st.header("🔧 设备故障报修单")
-    
-    with st.form("repair_form"):
-        eq_id = st.text_input("设备编号/资产条码")
-        dept = st.selectbox("报修科室", ["ICU", "手术室", "放射科", "内科"])
-        desc = st.text_area("故障详细描述")
-        
-        submitted = st.form_submit_button("提交报修申请")
-        if submitted:
-            # 简单模拟保存
-            st.success(f"报修已受理！单号：REQ-{datetime.now().strftime('%m%d%H%M')}")
-            st.info("维修工程师将收到即时提醒。")
\ No newline at end of file
+    repairs = get_repair_store()
+    operator = st.session_state.get("user_name", "")
+
+    t_form, t_queue = st.tabs(["📝 报修申请", "🛠️ 工程师工单队列"])
+
+    with t_form:
+        # 编号输入放在表单外，输入时即可联想匹配的设备
+        typed = st.text_input("设备编号/资产条码", key="rq_code", placeholder="输入条码 / SN / 老编号前几位")
+        store = get_asset_store()
+        eq_id = typed.strip()
+        if eq_id and store.exists():
+            with stage("lookup"):
+                view, index = store.view(), lookup_for(store)
+                matches = index.prefix(eq_id) if index is not None else []
+            if matches:
+                labels = [f"{code} · {view.at[rid, '设备名称']} · {view.at[rid, '科室']}" for code, rid in matches]
+                pick = st.selectbox("匹配设备", range(len(matches)), format_func=labels.__getitem__, key="rq_match")
+                eq_id = matches[pick][0]
+            else:
+                st.caption("资产档案中没有以此开头的设备编号")
+        row = asset_record(store, eq_id) if eq_id else None
+        if row is not None:
+            st.caption(f"设备：{row.get('设备名称')} / {row.get('型号')} · 科室：{row.get('科室')}")
+
+        with st.form("repair_form"):
+            options = _dept_options()
+            dept_idx = options.index(row["科室"]) if row is not None and row["科室"] in options else 0
+            dept = st.selectbox("报修科室", options, index=dept_idx)
+            desc = st.text_area("故障详细描述")
+
+            submitted = st.form_submit_button("提交报修申请")
+            if submitted:
+                if not eq_id or not desc.strip():
+                    st.error("请填写设备编号和故障描述")
+                else:
+                    fields = fields_from_asset(row) if row is not None else {}
+                    fields.update({"设备编号": eq_id, "使用科室": dept, "故障描述": desc.strip()})
+                    order_no = repairs.submit(fields, operator)
+                    st.success(f"报修已受理！单号：{order_no}")
+                    if row is None:
+                        st.warning("该编号未在资产档案中找到，设备信息需工程师补充。")
+                    st.info("维修工程师将收到即时提醒。")
+
+    with t_queue:
+        with stage("queue"):
+            counts = repairs.status_counts()
+        cols = st.columns(len(STATUS_FLOW))
+        for col, status in zip(cols, STATUS_FLOW):
+            col.metric(status, counts[status])
+
+        c1, c2 = st.columns(2)
+        statuses = c1.multiselect("状态", STATUS_FLOW, default=OPEN_STATUSES, key="rq_status")
+        q_dept = c2.selectbox("科室", ["全部"] + _dept_options(), key="rq_dept")
+        with stage("queue"):
+            queue = repairs.work_queue(statuses, None if q_dept == "全部" else q_dept)
+        st.dataframe(queue[QUEUE_COLUMNS], use_container_width=True, hide_index=True)
+
+        open_orders = queue[queue["维修状态"].isin(NEXT_STATUS)]["单号"].tolist()
+        if open_orders:
+            st.divider()
+            order_no = st.selectbox("选择工单", open_orders, key="rq_pick")
+            current = repairs.get(order_no)
+            nxt = NEXT_STATUS[current["维修状态"]]
+            opinion = ""
+            if nxt == "已审批":
+                opinion = st.text_input("审核意见", key="rq_opinion")
+            if st.button(f"➡️ 推进到「{nxt}」", key="rq_advance"):
+                try:
+                    repairs.advance(order_no, operator, 分管领导审核意见=opinion)
+                    st.rerun()
+                except RepairStateError as e:
+                    st.error(str(e))
@@ -0,0 +1,139 @@
+import threading
+import uuid
+from datetime import datetime
+import pandas as pd
+from modules.asset_derive import parse_dates
+from modules.storage import get_backend, MAINTENANCE_COLUMNS
+
+# 维修状态流转：已提交 → 已审批 → 维修中 → 已关闭
+STATUS_FLOW = ["已提交", "已审批", "维修中", "已关闭"]
+NEXT_STATUS = dict(zip(STATUS_FLOW, STATUS_FLOW[1:]))
+OPEN_STATUSES = STATUS_FLOW[:-1]
+APPROVAL_BY_STATUS = {"已提交": "待审批", "已审批": "已批准", "维修中": "已批准", "已关闭": "已批准"}
+# 资产表没有保修期字段，按验收日期起算
+WARRANTY_YEARS = 3
+
+
+class RepairStateError(Exception):
+    """工单不存在或状态流转不合法。"""
+
+
+def fields_from_asset(row):
+    """由资产档案的一行 (Series 或 dict) 带出报修单的设备信息。"""
+    accepted = parse_dates(pd.Series([row.get("验收日期")])).iloc[0]
+    in_warranty = None
+    if pd.notna(accepted):
+        in_warranty = "是" if accepted + pd.DateOffset(years=WARRANTY_YEARS) >= pd.Timestamp.today() else "否"
+    return {"设备名称": row.get("设备名称"), "设备规格型号": row.get("型号"),
+            "购置价格": row.get("价值"), "生产厂家及国别": row.get("品牌"),
+            "购置日期": row.get("验收日期"), "使用科室": row.get("科室"), "是否在保修期内": in_warranty}
+
+
+class RepairStore:
+    """
+    维修工单：只追加写入 maintenance 表 (每次状态变化追加一条完整快照)，
+    内存中按 单号 保留最新快照，并维护 状态/科室 → 单号 的索引，查询工单队列无需扫描全部历史。
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._cursor = None
+        self._latest = {}
+        self._by_status = {}
+        self._by_dept = {}
+
+    def _index(self, record):
+        no = record["单号"]
+        old = self._latest.get(no)
+        if old is not None:
+            self._by_status.get(old.get("维修状态"), set()).discard(no)
+            self._by_dept.get(old.get("使用科室"), set()).discard(no)
+        self._latest[no] = record
+        self._by_status.setdefault(record.get("维修状态"), set()).add(no)
+        self._by_dept.setdefault(record.get("使用科室"), set()).add(no)
+
+    def refresh(self):
+        # 只读取上次之后追加的记录；旧版没有单号的历史行不进入工单索引
+        with self._lock:
+            df, self._cursor, reset = self.backend.read_maintenance_since(self._cursor)
+            if reset:
+                self._latest, self._by_status, self._by_dept = {}, {}, {}
+            if len(df) and "单号" in df.columns:
+                df = df.reindex(columns=MAINTENANCE_COLUMNS)
+                for record in df[df["单号"].notna()].to_dict("records"):
+                    self._index({k: (None if pd.isna(v) else v) for k, v in record.items()})
+
+    def _new_id(self):
+        # 秒级时间戳 + 随机后缀，同一分钟/同一秒内的并发报修也不会撞号
+        while True:
+            no = f"REQ-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:4].upper()}"
+            if no not in self._latest:
+                return no
+
+    def _append(self, record):
+        self.backend.append_maintenance([record])
+        self._index(record)
+
+    def submit(self, fields, operator):
+        """新建报修单，返回单号。"""
+        with self._lock:
+            self.refresh()
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            record = {c: None for c in MAINTENANCE_COLUMNS}
+            record.update({k: v for k, v in fields.items() if k in record})
+            record.update({"单号": self._new_id(), "维修状态": STATUS_FLOW[0],
+                           "审批状态": APPROVAL_BY_STATUS[STATUS_FLOW[0]],
+                           "申请时间": now, "操作人": operator, "状态更新时间": now})
+            self._append(record)
+            return record["单号"]
+
+    def advance(self, order_no, operator, **fields):
+        """把工单推进到下一状态，可同时填写审批意见等字段，返回新状态。"""
+        with self._lock:
+            self.refresh()
+            current = self._latest.get(order_no)
+            if current is None:
+                raise RepairStateError(f"工单 {order_no} 不存在")
+            nxt = NEXT_STATUS.get(current["维修状态"])
+            if nxt is None:
+                raise RepairStateError(f"工单 {order_no} 已关闭，不能继续流转")
+            record = dict(current)
+            record.update({k: v for k, v in fields.items() if k in record and v})
+            record.update({"维修状态": nxt, "审批状态": APPROVAL_BY_STATUS[nxt], "操作人": operator,
+                           "状态更新时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+            self._append(record)
+            return nxt
+
+    def get(self, order_no):
+        with self._lock:
+            self.refresh()
+            return self._latest.get(order_no)
+
+    def work_queue(self, statuses=OPEN_STATUSES, dept=None):
+        """按状态 (及科室) 取当前工单，直接走索引集合求交。"""
+        with self._lock:
+            self.refresh()
+            nos = set().union(*(self._by_status.get(s, set()) for s in statuses))
+            if dept:
+                nos &= self._by_dept.get(dept, set())
+            rows = [self._latest[n] for n in nos]
+        df = pd.DataFrame(rows, columns=MAINTENANCE_COLUMNS)
+        return df.sort_values("申请时间", ascending=False, ignore_index=True)
+
+    def status_counts(self):
+        with self._lock:
+            self.refresh()
+            return {s: len(self._by_status.get(s, ())) for s in STATUS_FLOW}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_repair_store(backend=None):
+    backend = backend or get_backend()
+    with _stores_lock:
+        if backend.name not in _stores:
+            _stores[backend.name] = RepairStore(backend)
+        return _stores[backend.name]
@@ -0,0 +1,44 @@
+import streamlit as st
+from modules.asset_labels import CODE_COLUMN, unsign_code
+from modules.repair_store import get_repair_store, fields_from_asset
+from modules.storage import get_backend
+
+CARD_FIELDS = ["科室", "型号", "品牌", "设备SN码", "资产国标代码", "验收日期", "设备状态", "厂家电话"]
+
+
+def show_scan(token):
+    """
+    扫码落地页：校验签名后按编码索引直接取这一台设备，显示设备卡片与一键报修。
+    不注入全局样式、不渲染侧边栏，也不加载整张资产表。
+    """
+    code = unsign_code(token)
+    if code is None:
+        st.error("❌ 二维码无效或已被篡改，请联系设备科。")
+        return
+    asset = get_backend().find_asset(CODE_COLUMN, code)
+    if asset is None:
+        st.warning(f"未在资产档案中找到设备：{code}")
+        return
+
+    st.subheader(f"🏷️ {asset.get('设备名称') or '未命名设备'}")
+    st.caption(code)
+    for i in range(0, len(CARD_FIELDS), 2):
+        c1, c2 = st.columns(2)
+        for col, field in zip((c1, c2), CARD_FIELDS[i:i + 2]):
+            col.markdown(f"**{field}**：{asset.get(field) or '-'}")
+
+    st.divider()
+    with st.form("scan_repair"):
+        st.markdown("**🔧 一键报修**")
+        reporter = st.session_state.get("user_name") or ""
+        if not reporter:
+            reporter = st.text_input("报修人")
+        desc = st.text_area("故障描述", placeholder="简要描述故障现象")
+        if st.form_submit_button("提交报修", use_container_width=True):
+            if not reporter.strip() or not desc.strip():
+                st.error("请填写报修人和故障描述")
+            else:
+                fields = fields_from_asset(asset)
+                fields.update({"设备编号": code, "故障描述": desc.strip()})
+                order_no = get_repair_store().submit(fields, reporter.strip())
+                st.success(f"报修已受理！单号：{order_no}")
@@ -0,0 +1,125 @@
+import copy
+import json
+import os
+import threading
+from modules.auth import revoke_user
+from modules.fileio import atomic_write, file_lock
+from modules.storage import get_backend
+
+_UNSET = object()
+
+
+class ConfigStore:
+    """
+    进程级 config.json：内存中只保留一份，文件变化 (mtime/大小) 时才重新解析；
+    写入按键合并，在文件锁内基于磁盘最新内容修改后原子替换。
+    """
+
+    def __init__(self, path, default):
+        self.path = path
+        self.default = default
+        self._lock = threading.Lock()
+        self._sig = None
+        self._data = None
+
+    def _signature(self):
+        try:
+            st_ = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st_.st_mtime_ns, st_.st_size)
+
+    def _load(self):
+        sig = self._signature()
+        if sig is None:
+            data = copy.deepcopy(self.default)
+            self._write(data)
+            return
+        if sig == self._sig:
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            try: data = json.load(f)
+            except ValueError: data = copy.deepcopy(self.default)
+        self._data, self._sig = data, sig
+
+    def _write(self, data):
+        atomic_write(self.path, lambda f: json.dump(data, f, ensure_ascii=False, indent=4))
+        self._data, self._sig = data, self._signature()
+
+    def get(self):
+        """返回配置副本，页面上临时修改不会影响共享缓存。"""
+        with self._lock:
+            self._load()
+            return copy.deepcopy(self._data)
+
+    def update(self, changes=None, remove=()):
+        """只写入给定的键 (remove 中的键删除)，其他键保持磁盘上的最新值。"""
+        with self._lock, file_lock(self.path):
+            self._load()
+            data = copy.deepcopy(self._data)
+            data.update(changes or {})
+            for key in remove:
+                data.pop(key, None)
+            self._write(data)
+            return copy.deepcopy(data)
+
+
+class UserDirectory:
+    """进程级账号表缓存：后端签名 (users.json 的 mtime 或 SQLite 版本号) 不变时直接复用。"""
+
+    def __init__(self, backend, default):
+        self.backend = backend
+        self.default = default
+        self._lock = threading.Lock()
+        self._sig = _UNSET
+        self._users = None
+
+    def _load(self):
+        sig = self.backend.users_signature()
+        if sig != self._sig or self._users is None:
+            self._users = self.backend.read_users(self.default)
+            self._sig = sig
+
+    def all(self):
+        with self._lock:
+            self._load()
+            return copy.deepcopy(self._users)
+
+    def get(self, uid):
+        with self._lock:
+            self._load()
+            return copy.deepcopy(self._users.get(uid))
+
+    def signature(self):
+        return self.backend.users_signature()
+
+    def update(self, uid, **fields):
+        """按账号写入单个字段 (如 perms / password)，不整表覆盖。"""
+        self.modify(uid, fields)
+
+    def modify(self, uid, fields):
+        """fields 可为函数：在后端的锁 (或写事务) 内基于该账号最新记录计算要写入的字段，读-改-写不会丢失并发修改。"""
+        with self._lock:
+            self.backend.update_user(uid, fields)
+            self._sig = _UNSET
+        revoke_user(uid)
+
+
+_configs = {}
+_directories = {}
+_registry_lock = threading.Lock()
+
+
+def get_config(path, default):
+    with _registry_lock:
+        if path not in _configs:
+            _configs[path] = ConfigStore(path, default)
+        return _configs[path]
+
+
+def get_users(default, backend=None):
+    backend = backend or get_backend()
+    with _registry_lock:
+        if backend.name not in _directories:
+            _directories[backend.name] = UserDirectory(backend, default)
+        return _directories[backend.name]
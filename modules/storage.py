@@ -0,0 +1,518 @@
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import io
+import itertools
+import threading
+from contextlib import closing, contextmanager
+import pandas as pd
+from modules.fileio import atomic_open, atomic_write, atomic_write_csv, file_lock
+
+EQUIPMENT_PATH = "data/equipment.csv"
+MAINTENANCE_PATH = "data/maintenance.csv"
+USERS_PATH = "data/users.json"
+CONFIG_PATH = "data/config.json"
+DB_PATH = "data/platform.db"
+
+ASSET_COLUMNS = [
+    "序号", "科室", "设备名称", "资产国标代码", "国标代码+地点+流水", "设备SN码",
+    "老编号", "价值", "设备名", "数量", "品牌", "型号", "生产编号",
+    "出厂日期", "价格", "验收日期", "设备状态", "械字号", "使用年限",
+    "调拨情况", "可报废年限", "厂家电话", "工作站厂家", "工作站厂家电话", "备注"
+]
+MAINTENANCE_COLUMNS = [
+    "单号", "设备编号",
+    "设备名称", "设备规格型号", "购置价格", "生产厂家及国别", "购置日期", "是否在保修期内",
+    "使用科室", "维修状态", "故障描述", "申请时间", "审批状态", "分管领导审核意见", "院长审批意见",
+    "操作人", "状态更新时间"
+]
+# 编码列在导入去重时作为匹配键
+CODE_COLUMNS = ["资产国标代码", "国标代码+地点+流水", "设备SN码", "老编号"]
+# 日期列按文本读取，避免 2015.10 之类被当成浮点数截成 2015.1；
+# 编码列同样按文本读取，否则带空值的纯数字编码会被推断成浮点，1001 读成 1001.0 后与导入的文本键对不上
+TEXT_COLUMNS = {"出厂日期": str, "验收日期": str, **{c: str for c in CODE_COLUMNS}}
+NUMERIC_COLUMNS = {"序号", "价值", "数量", "价格"}
+INDEXED_COLUMNS = ["科室", "资产国标代码", "国标代码+地点+流水", "设备SN码", "出厂日期"]
+
+
+class StaleDataError(Exception):
+    """编辑基于的数据已被外部替换 (重新导入或文件被改动)，行 ID 不再可靠。"""
+
+
+def _records(df):
+    # NaN -> None，便于写入 SQLite / JSON
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def _csv_records(f):
+    # 按物理行读取，引号未闭合 (字段内含换行) 时并入下一行；返回 (起始字节偏移, 原始字节)
+    offset = f.tell()
+    start, buf = offset, b""
+    for line in f:
+        if not buf:
+            start = offset
+        buf += line
+        offset += len(line)
+        if buf.count(b'"') % 2 == 0:
+            yield start, buf
+            buf = b""
+    if buf:
+        yield start, buf
+
+
+class CsvBackend:
+    """默认后端：资产/维修为 CSV，账号为 JSON，适合小规模部署。"""
+    name = "csv"
+
+    def __init__(self, equipment_path=EQUIPMENT_PATH, maintenance_path=MAINTENANCE_PATH,
+                 users_path=USERS_PATH):
+        self.equipment_path = equipment_path
+        self.maintenance_path = maintenance_path
+        self.users_path = users_path
+        # 单列 编码 → 行字节偏移 索引，按文件签名失效 (扫码查找用)
+        self._offsets = {}
+        self._offsets_lock = threading.Lock()
+
+    # --- 资产 ---
+    def asset_signature(self):
+        try:
+            st_ = os.stat(self.equipment_path)
+        except FileNotFoundError:
+            return None
+        return (st_.st_mtime_ns, st_.st_size)
+
+    def read_assets(self):
+        return pd.read_csv(self.equipment_path, encoding='utf-8-sig', dtype=TEXT_COLUMNS)
+
+    def replace_assets(self, df):
+        with file_lock(self.equipment_path):
+            atomic_write_csv(df, self.equipment_path)
+
+    def _offset_path(self, column):
+        return f"{self.equipment_path}.{hashlib.sha1(column.encode('utf-8')).hexdigest()[:8]}.idx"
+
+    def _load_offsets(self, column, sig):
+        # 磁盘上的旁路索引：签名一致才可用，各进程与重启之后共用
+        try:
+            with open(self._offset_path(column), 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get("sig") != list(sig):
+            return None
+        return saved["header"], saved["index"]
+
+    def _offset_index(self, column, sig):
+        with self._offsets_lock:
+            cached = self._offsets.get(column)
+            if cached and cached[0] == sig:
+                return cached[1], cached[2]
+            loaded = self._load_offsets(column, sig)
+            if loaded is not None:
+                self._offsets[column] = (sig, *loaded)
+                return loaded
+            header, index = None, {}
+            with open(self.equipment_path, "rb") as f:
+                for offset, raw in _csv_records(f):
+                    row = next(csv.reader([raw.decode("utf-8-sig")]), [])
+                    if header is None:
+                        header = row
+                        if column not in header:
+                            break
+                        pos = header.index(column)
+                        continue
+                    if pos < len(row) and row[pos].strip():
+                        index.setdefault(row[pos].strip(), offset)
+            self._offsets[column] = (sig, header, index)
+            atomic_write(self._offset_path(column),
+                         lambda f: json.dump({"sig": list(sig), "header": header, "index": index}, f, ensure_ascii=False))
+            return header, index
+
+    def find_asset(self, column, value):
+        """
+        按单列精确查找一台设备，返回 {列: 文本} 或 None。
+        编码→字节偏移 索引按文件签名保存在旁路文件 (equipment.csv.<列哈希>.idx) 中，命中时只读取那一行，
+        新进程或重启后也不必解析整表。限制：资产表每次保存/导入后签名改变，之后的第一次扫码
+        (任一进程) 仍要完整扫描一遍 CSV 重建索引，再由其他进程共用。
+        """
+        sig = self.asset_signature()
+        if sig is None:
+            return None
+        header, index = self._offset_index(column, sig)
+        offset = index.get(str(value).strip())
+        if offset is None:
+            return None
+        with open(self.equipment_path, "rb") as f:
+            f.seek(offset)
+            _, raw = next(_csv_records(f))
+        row = next(csv.reader([raw.decode("utf-8")]))
+        return {c: (v if v != "" else None) for c, v in zip(header, row)}
+
+    @contextmanager
+    def asset_writer(self, columns):
+        # 流式整表替换：逐块追加到临时文件，全部成功后才原子替换原文件；期间其他进程的保存等待
+        with file_lock(self.equipment_path), atomic_open(self.equipment_path, encoding='utf-8-sig', newline="") as f:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+            yield lambda df: df[columns].to_csv(f, index=False, header=False)
+
+    def apply_asset_changes(self, expected_sig, df_after, updates, inserted, deletes):
+        """
+        CSV 无法局部更新，只能把合并后的主表整体原子替换；返回写入后的签名。
+        签名校验与写入在同一把跨进程锁内，两个进程同时保存时后者会收到 StaleDataError 而不是覆盖前者。
+        """
+        with file_lock(self.equipment_path):
+            if self.asset_signature() != expected_sig:
+                raise StaleDataError("资产数据已被重新导入或外部修改，请刷新后重新编辑。")
+            atomic_write_csv(df_after, self.equipment_path)
+            return self.asset_signature()
+
+    # --- 维修记录 ---
+    def read_maintenance(self):
+        if not os.path.exists(self.maintenance_path):
+            return pd.DataFrame(columns=MAINTENANCE_COLUMNS)
+        return pd.read_csv(self.maintenance_path, encoding='utf-8-sig', dtype=str)
+
+    def _maintenance_header(self):
+        return list(pd.read_csv(self.maintenance_path, encoding='utf-8-sig', nrows=0).columns)
+
+    def append_maintenance(self, rows):
+        # 只追加不改写；旧表头缺少新列时先一次性补齐表头。建表、补表头与追加都在跨进程锁内，
+        # 补表头 (读出-整体重写) 期间其他进程的追加会等待，不会写进即将被替换的旧文件
+        with file_lock(self.maintenance_path):
+            if not os.path.exists(self.maintenance_path):
+                atomic_write_csv(pd.DataFrame(columns=MAINTENANCE_COLUMNS), self.maintenance_path)
+            header = self._maintenance_header()
+            if set(MAINTENANCE_COLUMNS) - set(header):
+                atomic_write_csv(self.read_maintenance().reindex(columns=MAINTENANCE_COLUMNS), self.maintenance_path)
+                header = MAINTENANCE_COLUMNS
+            df = pd.DataFrame(rows).reindex(columns=header)
+            with open(self.maintenance_path, "a", encoding='utf-8', newline="") as f:
+                df.to_csv(f, index=False, header=False)
+
+    def read_maintenance_since(self, cursor):
+        """
+        增量读取追加的记录：cursor 为 (文件 inode, 已读到的字节偏移)。
+        返回 (新增记录, 新 cursor, 是否需要全量重建)；文件被整体替换 (inode 变化或变短) 时从头读起。
+        """
+        if not os.path.exists(self.maintenance_path):
+            return pd.DataFrame(columns=MAINTENANCE_COLUMNS), (None, 0), bool(cursor)
+        st_ = os.stat(self.maintenance_path)
+        inode, offset = cursor or (st_.st_ino, 0)
+        reset = inode != st_.st_ino or st_.st_size < offset
+        if reset:
+            offset = 0
+        if st_.st_size == offset:
+            return pd.DataFrame(columns=MAINTENANCE_COLUMNS), (st_.st_ino, offset), reset
+        with open(self.maintenance_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]  # 只消费完整的行
+        if offset == 0:
+            df = pd.read_csv(io.BytesIO(data), encoding='utf-8-sig', dtype=str)
+        else:
+            df = pd.read_csv(io.BytesIO(data), header=None, names=self._maintenance_header(), dtype=str)
+        return df, (st_.st_ino, offset + len(data)), reset
+
+    # --- 账号 ---
+    def users_signature(self):
+        try:
+            st_ = os.stat(self.users_path)
+        except FileNotFoundError:
+            return None
+        return (st_.st_mtime_ns, st_.st_size)
+
+    def read_users(self, default):
+        if not os.path.exists(self.users_path):
+            self.write_users(default)
+            return dict(default)
+        with open(self.users_path, 'r', encoding='utf-8') as f:
+            try: return json.load(f)
+            except ValueError: return dict(default)
+
+    def write_users(self, users):
+        with file_lock(self.users_path):
+            atomic_write(self.users_path, lambda f: json.dump(users, f, ensure_ascii=False, indent=4))
+
+    def update_user(self, uid, fields):
+        """
+        只改一个账号的指定字段：加锁后基于磁盘最新内容合并再原子写回，不会覆盖他人同时做的修改。
+        fields 也可以是函数：在锁内接收该账号的最新记录，返回要写入的字段。
+        """
+        with file_lock(self.users_path):
+            users = self.read_users({}) if os.path.exists(self.users_path) else {}
+            record = users.setdefault(uid, {})
+            record.update(fields(dict(record)) if callable(fields) else fields)
+            atomic_write(self.users_path, lambda f: json.dump(users, f, ensure_ascii=False, indent=4))
+
+
+class SqliteBackend:
+    """嵌入式 SQLite (WAL) 后端：按行 ID 局部更新，常用筛选列建索引，聚合直接走 SQL。"""
+    name = "sqlite"
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._schema_lock = threading.Lock()
+        self._ready = False
+        self._indexed = set()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        with self._schema_lock, closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("CREATE TABLE IF NOT EXISTS users (uid TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            cols = ", ".join(f'"{c}" TEXT' for c in MAINTENANCE_COLUMNS)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS maintenance (id INTEGER PRIMARY KEY, {cols})")
+            have = {r[1] for r in conn.execute("PRAGMA table_info(maintenance)")}
+            for c in MAINTENANCE_COLUMNS:
+                if c not in have:
+                    conn.execute(f'ALTER TABLE maintenance ADD COLUMN "{c}" TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_maintenance_no ON maintenance ("单号")')
+            self._ready = True
+
+    @staticmethod
+    def _create_equipment(conn, columns):
+        defs = ", ".join(f'"{c}" {"NUMERIC" if c in NUMERIC_COLUMNS else "TEXT"}' for c in columns)
+        conn.execute("DROP TABLE IF EXISTS equipment")
+        conn.execute(f"CREATE TABLE equipment (rid INTEGER PRIMARY KEY, {defs})")
+
+    @staticmethod
+    def _create_indexes(conn, columns):
+        for c in INDEXED_COLUMNS:
+            if c in columns:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_equipment_{c}" ON equipment ("{c}")')
+
+    @staticmethod
+    def _bump(conn, key):
+        conn.execute("INSERT INTO meta VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+
+    # --- 资产 ---
+    def asset_signature(self):
+        if not os.path.exists(self.db_path):
+            return None
+        self._ensure_schema()
+        with closing(self._connect()) as conn:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='equipment'").fetchone():
+                return None
+            row = conn.execute("SELECT value FROM meta WHERE key='assets_version'").fetchone()
+        return row[0] if row else 0
+
+    def read_assets(self):
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query("SELECT * FROM equipment ORDER BY rid", conn, index_col="rid")
+        df.index.name = None
+        return df
+
+    def replace_assets(self, df):
+        with self.asset_writer(list(df.columns)) as write:
+            write(df)
+
+    @contextmanager
+    def asset_writer(self, columns):
+        # 整个导入在一个写事务内完成：WAL 下其他会话读到的仍是旧表，提交后一次切换；索引最后再建
+        self._ensure_schema()
+        rid = itertools.count()
+        sql = f"INSERT INTO equipment VALUES ({', '.join('?' * (len(columns) + 1))})"
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._create_equipment(conn, columns)
+                yield lambda df: conn.executemany(sql, ((next(rid), *r) for r in _records(df[columns])))
+                self._create_indexes(conn, columns)
+                self._bump(conn, "assets_version")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def apply_asset_changes(self, expected_sig, df_after, updates, inserted, deletes):
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key='assets_version'").fetchone()
+                if (row[0] if row else 0) != expected_sig:
+                    raise StaleDataError("资产数据已被其他进程修改，请刷新后重新编辑。")
+                for rid, changes in updates.items():
+                    sets = ", ".join(f'"{c}" = ?' for c in changes)
+                    conn.execute(f"UPDATE equipment SET {sets} WHERE rid = ?",
+                                 [None if pd.isna(v) else v for v in changes.values()] + [int(rid)])
+                if deletes:
+                    conn.executemany("DELETE FROM equipment WHERE rid = ?", [(int(r),) for r in deletes])
+                if inserted is not None and len(inserted):
+                    cols = ", ".join(f'"{c}"' for c in inserted.columns)
+                    marks = ", ".join("?" * (len(inserted.columns) + 1))
+                    conn.executemany(f"INSERT INTO equipment (rid, {cols}) VALUES ({marks})",
+                                     ((int(i), *r) for i, r in zip(inserted.index, _records(inserted))))
+                if (deletes or (inserted is not None and len(inserted))) and "序号" in df_after.columns:
+                    conn.executemany('UPDATE equipment SET "序号" = ? WHERE rid = ? AND "序号" IS NOT ?',
+                                     ((int(n), int(i), int(n)) for i, n in df_after["序号"].items()))
+                self._bump(conn, "assets_version")
+                sig = conn.execute("SELECT value FROM meta WHERE key='assets_version'").fetchone()[0]
+                conn.commit()
+                return sig
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def find_asset(self, column, value):
+        """按单列精确查找一台设备 (走索引)，返回 {列: 值} 或 None。"""
+        if self.asset_signature() is None:
+            return None
+        with closing(self._connect()) as conn:
+            if column not in self._indexed:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_equipment_{column}" ON equipment ("{column}")')
+                self._indexed.add(column)
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(f'SELECT * FROM equipment WHERE "{column}" = ? LIMIT 1', (str(value).strip(),)).fetchone()
+        if row is None:
+            return None
+        return {k: row[k] for k in row.keys() if k != "rid"}
+
+    def department_summary(self):
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                'SELECT "科室", COUNT(*) AS 记录数, SUM("价值") AS 总价值, SUM("数量") AS 总数量 '
+                'FROM equipment WHERE "科室" IS NOT NULL GROUP BY "科室" ORDER BY "科室"', conn)
+
+    # --- 维修记录 ---
+    def read_maintenance(self):
+        self._ensure_schema()
+        with closing(self._connect()) as conn:
+            df = pd.read_sql_query("SELECT * FROM maintenance ORDER BY id", conn, index_col="id")
+        df.index.name = None
+        return df
+
+    def append_maintenance(self, rows):
+        self._ensure_schema()
+        df = pd.DataFrame(rows)
+        cols = ", ".join(f'"{c}"' for c in df.columns)
+        marks = ", ".join("?" * len(df.columns))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(f"INSERT INTO maintenance ({cols}) VALUES ({marks})", _records(df))
+
+    def read_maintenance_since(self, cursor):
+        # cursor 为已读到的最大 id；表被清空重建 (id 回退) 时全量重读
+        self._ensure_schema()
+        cursor = cursor or 0
+        with closing(self._connect()) as conn:
+            top = conn.execute("SELECT COALESCE(MAX(id), 0) FROM maintenance").fetchone()[0]
+            reset = top < cursor
+            if reset:
+                cursor = 0
+            df = pd.read_sql_query("SELECT * FROM maintenance WHERE id > ? ORDER BY id", conn,
+                                   params=[cursor], index_col="id")
+        new_cursor = int(df.index.max()) if len(df) else cursor
+        df.index.name = None
+        return df, new_cursor, reset
+
+    # --- 账号 ---
+    def read_users(self, default):
+        self._ensure_schema()
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT uid, data FROM users").fetchall()
+        if not rows:
+            self.write_users(default)
+            return dict(default)
+        return {uid: json.loads(data) for uid, data in rows}
+
+    def users_signature(self):
+        self._ensure_schema()
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key='users_version'").fetchone()
+        return row[0] if row else 0
+
+    def write_users(self, users):
+        self._ensure_schema()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM users")
+            conn.executemany("INSERT INTO users VALUES (?, ?)",
+                             [(k, json.dumps(v, ensure_ascii=False)) for k, v in users.items()])
+            self._bump(conn, "users_version")
+
+    def update_user(self, uid, fields):
+        # 写事务内读-改-写单行，并发修改其他账号互不影响
+        self._ensure_schema()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT data FROM users WHERE uid = ?", (uid,)).fetchone()
+                data = json.loads(row[0]) if row else {}
+                data.update(fields(dict(data)) if callable(fields) else fields)
+                conn.execute("INSERT INTO users VALUES (?, ?) ON CONFLICT(uid) DO UPDATE SET data = excluded.data",
+                             (uid, json.dumps(data, ensure_ascii=False)))
+                self._bump(conn, "users_version")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+
+_config_cache = {"sig": None, "name": None}
+
+
+def backend_name():
+    # 环境变量优先，其次 config.json 中的 storage_backend (按 mtime 缓存)，默认 csv
+    name = os.environ.get("STORAGE_BACKEND")
+    if not name:
+        try:
+            st_ = os.stat(CONFIG_PATH)
+            sig = (st_.st_mtime_ns, st_.st_size)
+        except FileNotFoundError:
+            sig = None
+        if sig != _config_cache["sig"]:
+            try:
+                with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+                    _config_cache["name"] = json.load(f).get("storage_backend")
+            except (OSError, ValueError):
+                _config_cache["name"] = None
+            _config_cache["sig"] = sig
+        name = _config_cache["name"]
+    return name if name in _BACKENDS else "csv"
+
+
+_BACKENDS = {"csv": CsvBackend, "sqlite": SqliteBackend}
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name=None):
+    name = name or backend_name()
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = _BACKENDS[name]()
+        return _instances[name]
+
+
+def migrate_to_sqlite(db_path=DB_PATH, source=None):
+    """一次性把现有 CSV/JSON 数据迁入 SQLite，返回各表迁移条数。"""
+    source = source or CsvBackend()
+    target = SqliteBackend(db_path)
+    counts = {"equipment": 0, "maintenance": 0, "users": 0}
+    if source.asset_signature() is not None:
+        assets = source.read_assets()
+        target.replace_assets(assets)
+        counts["equipment"] = len(assets)
+    target._ensure_schema()
+    with closing(target._connect()) as conn, conn:
+        conn.execute("DELETE FROM maintenance")
+    maint = source.read_maintenance()
+    if len(maint):
+        target.append_maintenance(maint.to_dict("records"))
+    counts["maintenance"] = len(maint)
+    users = source.read_users({})
+    target.write_users(users)
+    counts["users"] = len(users)
+    return counts
+
+
+if __name__ == "__main__":
+    # python -m modules.storage  -> 从 data/ 下的文件迁移到 data/platform.db
+    print(migrate_to_sqlite())
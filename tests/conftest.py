@@ -0,0 +1,25 @@
+import os
+import sys
+import pytest
+
+# modules/ 没有 __init__.py，按应用的运行方式从仓库根目录导入
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """以临时目录为当前目录运行，data/ 等相对路径不会碰到仓库里的真实数据。"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    return tmp_path
+
+
+@pytest.fixture(params=["csv", "sqlite"])
+def backend(request, workdir):
+    from modules.storage import CsvBackend, SqliteBackend
+    if request.param == "csv":
+        return CsvBackend(str(workdir / "data/equipment.csv"), str(workdir / "data/maintenance.csv"),
+                          str(workdir / "data/users.json"))
+    return SqliteBackend(str(workdir / "data/platform.db"))
@@ -0,0 +1,50 @@
+import datetime
+import pandas as pd
+from modules.asset_derive import DerivedColumns, build_derived, parse_dates
+
+
+def test_parse_messy_dates():
+    raw = pd.Series(["2015-03-01", "2015.03", "2015年3月", "2015年3月5日", "2015/3/1", "20150301",
+                     "42064", "2015", " 2015-3-1 ", "", None, "不详", "3000-01-01"])
+    got = parse_dates(raw)
+    assert list(got[:9]) == [pd.Timestamp(2015, 3, 1), pd.Timestamp(2015, 3, 1), pd.Timestamp(2015, 3, 1),
+                             pd.Timestamp(2015, 3, 5), pd.Timestamp(2015, 3, 1), pd.Timestamp(2015, 3, 1),
+                             pd.Timestamp(2015, 3, 1), pd.Timestamp(2015, 1, 1), pd.Timestamp(2015, 3, 1)]
+    assert got[9:].isna().all()
+
+
+def test_out_of_range_dates_are_nat():
+    raw = pd.Series(["2015-13-40", "2015-02-30", "2015-00-10", "2015年4月31日", "20151301", "2016-02-29", "2015-12-31"])
+    got = parse_dates(raw)
+    assert got[:5].isna().all()
+    assert list(got[5:]) == [pd.Timestamp(2016, 2, 29), pd.Timestamp(2015, 12, 31)]
+
+
+def test_build_derived():
+    df = pd.DataFrame({
+        "出厂日期": ["2010-01-01", None, "不详"],
+        "验收日期": ["2012-01-01", "2020-01-01", None],
+        "使用年限": ["10", "5", None],
+        "可报废年限": ["", "3", "8"],
+        "价值": ["1000", None, "50"],
+        "价格": [None, "800", None],
+    }, index=[10, 11, 12])
+    out = build_derived(df, datetime.date(2024, 1, 1))
+    assert list(out.index) == [10, 11, 12]
+    assert list(out["age_years"][:2]) == [13, 4]
+    assert pd.isna(out.loc[12, "age_years"])
+    # 折旧自验收日期起算，超过使用年限后归零
+    assert out.loc[10, "depreciated_value"] == 0
+    # 价值为空时取价格：800 × (1 - 4/5)
+    assert out.loc[11, "depreciated_value"] == 160
+    # 可报废年限为空时按使用年限判断
+    assert list(out["scrap_eligible"]) == [True, True, False]
+    assert out.loc[11, "remaining_life"] == 1.0
+
+
+def test_index_at_least_keeps_table_order():
+    frame = pd.DataFrame({"age_years": [12.0, None, 3.0, 20.0], "scrap_eligible": False}, index=[5, 1, 9, 2])
+    derived = DerivedColumns(frame)
+    assert list(derived.index_at_least(10)) == [2, 5]
+    assert list(derived.index_at_least(0)) == [2, 5, 9]
+    assert list(derived.index_at_least(30)) == []
@@ -0,0 +1,95 @@
+import os
+import shutil
+import zipfile
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from modules import asset_export
+from modules.asset_export import export_table, fill_template, list_templates
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "work_files")
+FORM = "梅州市第三人民医院医疗设备调拨审批表.docx"
+SHEET = "梅州市第三人民医院固定资产处置申请表.xls"
+
+
+def _assets(n=5):
+    return pd.DataFrame({"设备名称": [f"监护仪{i}" for i in range(n)],
+                         "国标代码+地点+流水": [f"GB-{i:03d}" for i in range(n)],
+                         "型号": "iMEC8", "数量": [1.0, 2.0, None, 1.0, 1.0][:n],
+                         "价值": [1000.5 * (i + 1) for i in range(n)], "科室": "ICU", "验收日期": "2015-03-01",
+                         "备注": ["含\x01控制字符", None, "", "a", "b"][:n]})
+
+
+@pytest.fixture
+def templates(workdir):
+    root = workdir / "work_files"
+    root.mkdir()
+    for name in (FORM, SHEET):
+        shutil.copyfile(os.path.join(TEMPLATES, name), root / name)
+    return root
+
+
+def test_export_csv_roundtrip(workdir, monkeypatch):
+    monkeypatch.setattr(asset_export, "CHUNK_ROWS", 2)
+    df = _assets()
+    extra = pd.DataFrame({"设备年龄": range(5)}, index=df.index)
+    seen = []
+    path = export_table([df, extra], [4, 0, 2], "csv", progress=lambda done, total: seen.append((done, total)))
+    out = pd.read_csv(path, encoding="utf-8-sig", dtype=str)
+    assert list(out.columns) == list(df.columns) + ["设备年龄"]
+    assert out["国标代码+地点+流水"].tolist() == ["GB-004", "GB-000", "GB-002"]
+    assert out["设备年龄"].tolist() == ["4", "0", "2"]
+    assert seen == [(2, 3), (3, 3)]
+    empty = pd.read_csv(export_table(df, [], "csv"), encoding="utf-8-sig")
+    assert list(empty.columns) == list(df.columns) and len(empty) == 0
+
+
+def test_export_xlsx_roundtrip(workdir, monkeypatch):
+    monkeypatch.setattr(asset_export, "CHUNK_ROWS", 2)
+    df = _assets()
+    path = export_table(df, [1, 3, 0], "xlsx")
+    rows = list(load_workbook(path).worksheets[0].iter_rows(values_only=True))
+    assert list(rows[0]) == list(df.columns)
+    assert [r[1] for r in rows[1:]] == ["GB-001", "GB-003", "GB-000"]
+    # 缺失值留空，控制字符被去掉
+    assert rows[1][3] == 2 and rows[3][7] == "含控制字符" and rows[1][7] is None
+
+
+def test_list_templates_skips_corrupt_files(templates):
+    (templates / "坏文件.xls").write_bytes(b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1" + b"junk" * 200)
+    (templates / "空.docx").write_bytes(b"")
+    (templates / "说明.txt").write_text("不是模板")
+    kinds = {t["name"]: t["kind"] for t in list_templates(str(templates))}
+    assert kinds == {FORM: "form", SHEET: "list"}
+
+
+def test_fill_docx_one_page_per_asset(templates):
+    df = _assets(3)
+    path = fill_template(str(templates / FORM), df, [2, 0])
+    with zipfile.ZipFile(path) as zf:
+        xml = zf.read("word/document.xml").decode("utf-8")
+        assert "word/styles.xml" in zf.namelist()
+    assert xml.count('<w:br w:type="page"/>') == 1
+    assert xml.index("GB-002") < xml.index("GB-000")
+    assert "监护仪1" not in xml
+
+
+def test_fill_xls_expands_rows_and_sums(templates):
+    df = pd.concat([_assets()] * 6, ignore_index=True)
+    path = fill_template(str(templates / SHEET), df, list(range(30)))
+    ws = load_workbook(path).worksheets[0]
+    rows = [[c.value for c in row] for row in ws.iter_rows()]
+    header = next(i for i, r in enumerate(rows) if "序号" in [str(v).strip() if v else v for v in r])
+    items = rows[header + 1:header + 31]
+    assert [r[0] for r in items] == list(range(1, 31))
+    names = [str(v).replace(" ", "") for v in rows[header]]
+    assert items[0][names.index("编号")] == "GB-000"
+    total = next(r for r in rows[header + 31:] if r[0] and str(r[0]).replace(" ", "") == "合计")
+    # 每 5 台一组的数量为 1+2+空+1+1
+    assert total[names.index("数量")] == 6 * 5
+
+
+def test_fill_rejects_non_template(templates):
+    (templates / "坏文件.xls").write_bytes(b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1" + b"junk" * 200)
+    with pytest.raises(ValueError):
+        fill_template(str(templates / "坏文件.xls"), _assets(), [0])
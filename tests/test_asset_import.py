@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+from modules.asset_import import run_import, upsert_import
+from modules.asset_store import AssetStore
+from modules.storage import ASSET_COLUMNS
+
+ROWS = [
+    {"科室": "ICU", "设备名称": "监护仪", "老编号": "1001", "价值": "5000", "数量": "1"},
+    {"科室": "ICU", "设备名称": "呼吸机", "国标代码+地点+流水": "GB-2", "价值": "8000", "数量": "1"},
+    {"科室": "手术室", "设备名称": "麻醉机", "老编号": "1003", "设备SN码": "77", "价值": "9000", "数量": "1"},
+]
+
+
+def _sheet(path, rows):
+    pd.DataFrame(rows).reindex(columns=[c for c in ASSET_COLUMNS if c != "序号"]) \
+        .to_csv(path, index=False, encoding="utf-8-sig")
+    return str(path)
+
+
+def test_reimport_same_sheet_changes_nothing(backend, workdir):
+    # 带空值的纯数字编码列不能被读成 1001.0，否则重复导入会把已有设备当成新设备
+    src = _sheet(workdir / "sheet.csv", ROWS)
+    store = AssetStore(backend)
+    run_import([src], store=store, max_workers=1)
+    stats = upsert_import([src], store=store, max_workers=1)
+    assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (0, 0, 3)
+    assert len(store.view()) == 3
+
+
+def test_upsert_updates_changed_fields_and_inserts_new(backend, workdir):
+    store = AssetStore(backend)
+    run_import([_sheet(workdir / "a.csv", ROWS)], store=store, max_workers=1)
+    changed = [dict(ROWS[0], 价值="6000"), {"科室": "急诊科", "设备名称": "除颤仪", "老编号": "2001"}]
+    stats = upsert_import([_sheet(workdir / "b.csv", changed)], store=store, max_workers=1)
+    assert (stats["inserted"], stats["updated"]) == (1, 1)
+    df = store.view()
+    assert len(df) == 4
+    assert float(df.loc[df["老编号"] == "1001", "价值"].iloc[0]) == 6000
+    assert df["序号"].tolist() == [1, 2, 3, 4]
+
+
+def test_conflicting_keys_are_skipped(backend, workdir):
+    store = AssetStore(backend)
+    run_import([_sheet(workdir / "a.csv", ROWS)], store=store, max_workers=1)
+    # 老编号指向第一台、SN 指向第三台：判为冲突，不更新也不新增
+    stats = upsert_import([_sheet(workdir / "b.csv", [{"老编号": "1001", "设备SN码": "77", "价值": "1"}])],
+                          store=store, max_workers=1)
+    assert stats["conflicts"] == 1
+    assert (stats["inserted"], stats["updated"]) == (0, 0)
+
+
+def _workbook(path, sheets):
+    from openpyxl import Workbook
+    wb = Workbook()
+    wb.remove(wb.active)
+    for title, rows in sheets.items():
+        ws = wb.create_sheet(title)
+        ws.append(["科室", "设备名", "编号"])
+        for r in rows:
+            ws.append(r)
+    wb.save(path)
+    return str(path)
+
+
+def test_streaming_import_keeps_source_order(backend, workdir):
+    names = [f"设备{i}" for i in range(12)]
+    first = _sheet(workdir / "first.csv", [{"科室": "ICU", "设备名称": n} for n in names[:5]])
+    book = _workbook(workdir / "book.xlsx", {"S1": [["放射科", n, None] for n in names[5:8]],
+                                             "S2": [["检验科", n, f"00{i}"] for i, n in enumerate(names[8:])]})
+    store = AssetStore(backend)
+    seen = []
+    stats = run_import([first, book], store=store, chunk_rows=2, max_workers=3,
+                       progress=lambda s: seen.append(s["rows"]))
+    df = store.view()
+    assert df["设备名称"].tolist() == names
+    assert [int(x) for x in df["序号"]] == list(range(1, 13))
+    # 按映射表改名，编码列的前导零保留
+    assert df["老编号"].dropna().tolist() == ["000", "001", "002", "003"]
+    assert {k: (v["rows"], v["status"]) for k, v in stats["files"].items()} == {
+        "first.csv": (5, "完成"), "book.xlsx - S1": (3, "完成"), "book.xlsx - S2": (4, "完成")}
+    assert stats["rows"] == 12 and seen == sorted(seen) and seen[-1] == 12
+
+
+def test_failed_source_keeps_existing_table(backend, workdir):
+    store = AssetStore(backend)
+    run_import([_sheet(workdir / "ok.csv", ROWS)], store=store, max_workers=1)
+    with pytest.raises(FileNotFoundError):
+        run_import([_sheet(workdir / "new.csv", ROWS[:1]), str(workdir / "missing.csv")],
+                   store=store, chunk_rows=1, max_workers=2)
+    assert store.view()["设备名称"].tolist() == [r["设备名称"] for r in ROWS]
@@ -0,0 +1,35 @@
+from urllib.parse import unquote
+import pytest
+import pandas as pd
+from modules import asset_labels
+
+
+def test_label_items_resolve_config_once(workdir, monkeypatch):
+    monkeypatch.setenv("APP_SECRET_KEY", "test-secret")
+    monkeypatch.setenv("PUBLIC_BASE_URL", "https://assets.example/")
+    calls = []
+    real = asset_labels.public_base_url
+    monkeypatch.setattr(asset_labels, "public_base_url", lambda: calls.append(1) or real())
+    df = pd.DataFrame({asset_labels.CODE_COLUMN: ["A-1", None, " ", "B-2"],
+                       "设备名称": ["监护仪", "呼吸机", "泵", None], "科室": ["ICU", "ICU", None, None]})
+    items = asset_labels.label_items(df)
+    assert len(calls) == 1
+    assert [it["code"] for it in items] == ["A-1", "B-2"]
+    assert items[1]["name"] == "" and items[1]["dept"] == ""
+    for item in items:
+        base, token = item["url"].split("/?asset=")
+        assert base == "https://assets.example"
+        assert asset_labels.unsign_code(unquote(token)) == item["code"]
+    assert asset_labels.unsign_code("A-1.forged") is None
+
+
+def test_base_url_must_be_configured(workdir, monkeypatch):
+    monkeypatch.setenv("APP_SECRET_KEY", "test-secret")
+    monkeypatch.delenv("PUBLIC_BASE_URL", raising=False)
+    df = pd.DataFrame({asset_labels.CODE_COLUMN: ["A-1"], "设备名称": ["监护仪"], "科室": ["ICU"]})
+    # 未配置时不再静默回退到 localhost
+    assert asset_labels.public_base_url() == ""
+    with pytest.raises(ValueError):
+        asset_labels.label_items(df)
+    (workdir / "data/config.json").write_text('{"public_base_url": "http://10.0.0.8:8501/"}', encoding="utf-8")
+    assert asset_labels.label_items(df)[0]["url"].startswith("http://10.0.0.8:8501/?asset=")
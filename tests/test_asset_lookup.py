@@ -0,0 +1,59 @@
+import pandas as pd
+from modules.asset_lookup import AssetLookup, asset_record, lookup_for
+from modules.asset_store import AssetStore
+from modules.storage import ASSET_COLUMNS
+
+
+def _frame():
+    return pd.DataFrame({"国标代码+地点+流水": ["6821-ICU-001", "6821-ICU-002", None, "6830-FS-001"],
+                         "设备SN码": ["SN100", None, "sn101", " SN100 "],
+                         "老编号": [1001.0, None, 1003.0, None],
+                         "设备名称": ["监护仪", "呼吸机", "泵", "DR"]}, index=[0, 1, 5, 7])
+
+
+def _state(index):
+    return index._sorted, index._exact, index._by_rid
+
+
+def test_exact_and_prefix():
+    index = AssetLookup()
+    index.rebuild(_frame())
+    assert index.exact("6821-icu-002") == 1
+    # 同一编码对应多台设备时取第一条；浮点列中的整数编码按整数文本索引
+    assert index.exact("SN100") == 0 and index.exact("1003") == 5
+    assert index.exact("nope") is None
+    assert index.prefix("6821") == [("6821-ICU-001", 0), ("6821-ICU-002", 1)]
+    assert index.prefix("sn10", limit=2) == [("SN100", 0), ("SN100", 7)]
+    assert index.prefix("  ") == []
+
+
+def test_patch_matches_rebuild():
+    # 编码列按文本读入 (storage.TEXT_COLUMNS)
+    df = _frame().assign(老编号=pd.array(["1001", None, "1003", None], dtype="string"))
+    index, before = AssetLookup(), AssetLookup()
+    index.rebuild(df)
+    before.rebuild(df)
+    df = df.drop(index=[1])
+    df.loc[5, "设备SN码"] = "SN200"
+    df.loc[9] = ["6830-FS-002", "SN300", None, "CT"]
+    patched = index.patched(df, {1, 5, 9})
+    # 旧索引不受影响 (其他会话可能正在读取)
+    assert _state(index) == _state(before)
+    index = patched
+    fresh = AssetLookup()
+    fresh.rebuild(df)
+    assert _state(index) == _state(fresh)
+    assert index.exact("sn101") is None and index.exact("sn200") == 5
+    assert index.prefix("6830") == [("6830-FS-001", 7), ("6830-FS-002", 9)]
+
+
+def test_lookup_for_follows_store_edits(backend):
+    backend.replace_assets(_frame().reset_index(drop=True).reindex(columns=ASSET_COLUMNS))
+    store = AssetStore(backend)
+    index = lookup_for(store)
+    assert asset_record(store, "6821-ICU-002")["设备名称"] == "呼吸机"
+    rid = index.exact("6821-ICU-002")
+    store.apply_changes(store.generation, updates={rid: {"国标代码+地点+流水": "6821-ICU-099"}})
+    assert lookup_for(store) is not index and index.exact("6821-ICU-002") == rid
+    assert asset_record(store, "6821-ICU-002") is None
+    assert asset_record(store, "6821-icu-099")["设备名称"] == "呼吸机"
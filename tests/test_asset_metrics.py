@@ -0,0 +1,62 @@
+import datetime
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from modules import asset_derive
+from modules.asset_derive import build_derived, derived_for
+from modules.asset_metrics import MetricsCube, metrics_for
+from modules.asset_store import AssetStore
+from modules.storage import ASSET_COLUMNS
+
+
+def _store(backend, n=30):
+    rows = [{"序号": i + 1, "科室": ["ICU", "放射科", None][i % 3], "设备名称": f"设备{i}",
+             "老编号": f"LB{i:03d}", "价值": 1000 * (i + 1), "数量": 1,
+             "出厂日期": f"{2000 + i % 20}-03-01", "验收日期": f"{2001 + i % 20}.05",
+             "使用年限": "8", "可报废年限": ["6", "", "10"][i % 3]} for i in range(n)]
+    backend.replace_assets(pd.DataFrame(rows, columns=ASSET_COLUMNS).astype(str))
+    return AssetStore(backend)
+
+
+def _edit(store):
+    df = store.view()
+    rids = list(df.index)
+    store.apply_changes(store.generation,
+                        updates={rids[0]: {"出厂日期": "2024-01-01", "价值": "1"},
+                                 rids[4]: {"科室": "检验科", "可报废年限": "1"}},
+                        inserts=[{"科室": "ICU", "价值": "500", "数量": "2", "出厂日期": "1999年3月",
+                                  "使用年限": "5"}],
+                        deletes=[rids[7]])
+
+
+def test_patched_derived_and_metrics_match_rebuild(backend, monkeypatch):
+    store = _store(backend)
+    before_derived, before_cube = derived_for(store), metrics_for(store)
+    _edit(store)
+    _edit(store)
+    sizes = []
+
+    def spy(df, today=None):
+        sizes.append(len(df))
+        return build_derived(df, today)
+    monkeypatch.setattr(asset_derive, "build_derived", spy)
+    derived, cube = derived_for(store), metrics_for(store)
+    # 只重算改动过的行；修补得到新对象，旧结果保持不变
+    assert derived is not before_derived and cube is not before_cube
+    assert sizes and max(sizes) <= 6
+    assert len(before_derived.frame) == 30 and before_cube.totals["value"] == sum(1000 * (i + 1) for i in range(30))
+
+    df, today = store.view(), datetime.date.today()
+    expected = build_derived(df, today)
+    assert_frame_equal(derived.frame, expected, check_dtype=False)
+    assert list(derived.index_at_least(10)) == list(expected.index[expected["age_years"] >= 10])
+    fresh = MetricsCube(df, expected)
+    assert cube.totals == fresh.totals
+    assert_frame_equal(cube.by_dept, fresh.by_dept, check_dtype=False)
+
+
+def test_metrics_totals(backend):
+    totals = metrics_for(_store(backend, n=3)).totals
+    assert totals["value"] == 6000
+    assert totals["quantity"] == 3
+    # 第三行科室为空，不计入科室数
+    assert totals["departments"] == 2
@@ -0,0 +1,46 @@
+import pandas as pd
+from modules.asset_page import editor_delta, has_edits
+from modules.asset_query import page_slice, select_positions
+from modules.asset_store import AssetStore
+from modules.storage import ASSET_COLUMNS
+
+
+def _store(backend, n=12):
+    rows = [{"序号": i + 1, "科室": "ICU" if i % 2 else "急诊科", "设备名称": f"设备{i:02d}",
+             "型号": "M1", "价值": 100 * (n - i)} for i in range(n)]
+    backend.replace_assets(pd.DataFrame(rows, columns=ASSET_COLUMNS))
+    return AssetStore(backend)
+
+
+def test_select_filter_sort_and_page(backend):
+    store = _store(backend)
+    df = store.view()
+    positions = select_positions(store, dept="ICU", keyword="设备", sort_by="价值", ascending=True)
+    assert list(df["设备名称"].iloc[positions]) == ["设备11", "设备09", "设备07", "设备05", "设备03", "设备01"]
+    assert len(select_positions(store, keyword="设备1")) == 2
+    page = page_slice(df, positions, page=2, page_size=4, columns=["设备名称", "价值", "不存在"])
+    # 第二页只剩两行，只投影存在的可见列，索引仍是主表行 ID
+    assert list(page.columns) == ["设备名称", "价值"]
+    assert list(page.index) == list(df.index[positions[4:]])
+
+
+def test_editor_delta_maps_page_rows_to_row_ids(backend):
+    store = _store(backend)
+    df = store.view()
+    positions = select_positions(store, sort_by="价值", ascending=True)
+    page = page_slice(df, positions, page=2, page_size=5, columns=["序号", "设备名称", "价值"])
+    row_ids = list(page.index)
+    state = {"edited_rows": {"0": {"设备名称": "改名", "序号": 99, "age_years": 1}, "3": {"age_years": 2}},
+             "added_rows": [{"设备名称": "新设备", "scrap_eligible": True}],
+             "deleted_rows": [4]}
+    assert has_edits(state) and not has_edits({"edited_rows": {}, "added_rows": [], "deleted_rows": []})
+    updates, inserts, deletes = editor_delta(state, row_ids, page.columns)
+    # 只读的序号与派生列被丢弃，只剩派生列改动的行不产生更新
+    assert updates == {row_ids[0]: {"设备名称": "改名"}}
+    assert inserts == [{"设备名称": "新设备"}]
+    assert deletes == [row_ids[4]]
+
+    store.apply_changes(store.generation, updates, inserts, deletes)
+    df = store.view()
+    assert df.loc[row_ids[0], "设备名称"] == "改名" and row_ids[4] not in df.index
+    assert (df["设备名称"] == "新设备").sum() == 1 and len(df) == 12
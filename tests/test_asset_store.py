@@ -0,0 +1,115 @@
+import pandas as pd
+import pytest
+from modules.asset_store import CHANGELOG_SIZE, AssetStore
+from modules.storage import ASSET_COLUMNS, StaleDataError
+
+
+def _seed(backend, n=5):
+    rows = [{"序号": i + 1, "科室": "ICU", "设备名称": f"设备{i}", "老编号": f"LB{i}", "价值": 100 * (i + 1)}
+            for i in range(n)]
+    backend.replace_assets(pd.DataFrame(rows, columns=ASSET_COLUMNS))
+
+
+def test_view_is_cached_until_data_changes(backend):
+    assert AssetStore(backend).view() is None
+    _seed(backend)
+    store = AssetStore(backend)
+    first = store.view()
+    store.view()
+    assert store.stats()["misses"] == 1 and store.stats()["hits"] >= 1
+    # 会话内改动视图不会影响共享主表
+    first.loc[first.index[0], "设备名称"] = "改了"
+    assert store.view()["设备名称"].iloc[0] == "设备0"
+    generation = store.generation
+    _seed(backend, n=3)
+    assert len(store.view()) == 3
+    assert store.generation == generation + 1
+
+
+def test_apply_changes_persists_and_renumbers(backend):
+    _seed(backend)
+    store = AssetStore(backend)
+    rids = list(store.view().index)
+    store.apply_changes(store.generation, updates={rids[1]: {"设备名称": "新名称"}},
+                        inserts=[{"设备名称": "新增", "科室": "急诊科"}], deletes=[rids[0]])
+    df = store.view()
+    assert list(df["设备名称"]) == ["新名称", "设备2", "设备3", "设备4", "新增"]
+    assert list(df["序号"]) == [1, 2, 3, 4, 5]
+    # 行 ID 保持不变，新行接在最大 ID 之后
+    assert list(df.index[:4]) == rids[1:] and df.index[-1] == max(rids) + 1
+    reloaded = AssetStore(backend).view()
+    assert list(reloaded["设备名称"]) == list(df["设备名称"])
+    assert [int(x) for x in reloaded["序号"]] == [1, 2, 3, 4, 5]
+
+
+def test_stale_generation_is_rejected(backend):
+    _seed(backend)
+    store = AssetStore(backend)
+    store.view()
+    generation = store.generation
+    _seed(backend, n=2)
+    with pytest.raises(StaleDataError):
+        store.apply_changes(generation, updates={0: {"设备名称": "x"}})
+
+
+def test_changes_since(backend):
+    _seed(backend)
+    store = AssetStore(backend)
+    store.view()
+    version, generation = store.version, store.generation
+    assert store.changes_since(version, generation) == set()
+    rids = list(store.view().index)
+    store.apply_changes(generation, updates={rids[0]: {"价值": 1}})
+    store.apply_changes(generation, deletes=[rids[2]])
+    assert store.changes_since(version, generation) == {rids[0], rids[2]}
+    assert store.changes_since(version + 1, generation) == {rids[2]}
+    assert store.changes_since(version, generation - 1) is None
+    # 记录滚出日志后只能全量重建
+    for _ in range(CHANGELOG_SIZE):
+        store.apply_changes(generation, updates={rids[1]: {"价值": 2}})
+    assert store.changes_since(version, generation) is None
+
+
+def test_derived_is_rebuilt_per_version(backend):
+    _seed(backend)
+    store = AssetStore(backend)
+    calls = []
+    build = lambda df: calls.append(len(df)) or len(df)
+    assert store.derived("n", build) == 5 and store.derived("n", build) == 5
+    store.apply_changes(store.generation, deletes=[store.view().index[0]])
+    assert store.derived("n", build) == 4
+    assert calls == [5, 4]
+
+
+def test_department_summary_is_cached_per_version(backend):
+    _seed(backend)
+    store = AssetStore(backend)
+    summary = store.department_summary()
+    assert store.department_summary() is summary
+    assert store.departments() == ["ICU"]
+    store.apply_changes(store.generation, updates={store.view().index[0]: {"科室": "急诊科"}})
+    assert store.departments() == ["ICU", "急诊科"]
+
+
+def test_incremental_patches_from_previous_result(backend):
+    _seed(backend)
+    store = AssetStore(backend)
+    calls = []
+
+    def build(df):
+        calls.append(("build", None))
+        return frozenset(df.index)
+
+    def patch(old, df, rids):
+        calls.append(("patch", set(rids)))
+        return frozenset(df.index)
+    first = store.incremental("ids", build, patch)
+    assert store.incremental("ids", build, patch) is first
+    rid = store.view().index[0]
+    store.apply_changes(store.generation, updates={rid: {"科室": "急诊科"}})
+    assert store.incremental("ids", build, patch) == first
+    assert calls == [("build", None), ("patch", {rid})]
+    # 整表替换后无法增量，回到完整构建
+    _seed(backend, n=2)
+    store.invalidate()
+    assert len(store.incremental("ids", build, patch)) == 2 and calls[-1] == ("build", None)
@@ -0,0 +1,39 @@
+import pandas as pd
+from modules.asset_store import AssetStore
+from modules.asset_tree import DeptTree, tree_for
+from modules.storage import ASSET_COLUMNS
+
+
+def _frame():
+    return pd.DataFrame({"科室": ["ICU", "急诊科", "ICU", None, "ICU"],
+                         "设备名称": ["监护仪", "呼吸机", "监护仪", "泵", None],
+                         "型号": ["M1", None, "M1", "P1", "X"],
+                         "价值": ["100", "200", "50", "10", "不详"]})
+
+
+def test_group_by_dept_and_model():
+    tree = DeptTree(_frame())
+    # 科室为空的行不进树；无名称/型号的用占位文本，价值无法解析按 0 计
+    assert [(n["dept"], n["count"], n["value"]) for n in tree.full] == [("ICU", 3, 150.0), ("急诊科", 1, 200.0)]
+    icu = tree.full[0]["children"]
+    assert [(c["name"], c["count"], list(c["positions"])) for c in icu] == [("未命名 / X", 1, [4]),
+                                                                           ("监护仪 / M1", 2, [0, 2])]
+    assert tree.full[1]["children"][0]["name"] == "呼吸机 / -"
+    assert sorted(tree.dept_positions("ICU")) == [0, 2, 4]
+    assert len(tree.dept_positions("不存在")) == 0
+
+
+def test_group_subset_of_positions():
+    tree = DeptTree(_frame())
+    nodes = tree.group([4, 3, 1])
+    assert [(n["dept"], list(n["positions"])) for n in nodes] == [("ICU", [4]), ("急诊科", [1])]
+    assert tree.group([3]) == [] and tree.group([]) == []
+
+
+def test_tree_follows_store(backend):
+    backend.replace_assets(_frame().reindex(columns=ASSET_COLUMNS))
+    store = AssetStore(backend)
+    tree = tree_for(store)
+    assert tree_for(store) is tree
+    store.apply_changes(store.generation, updates={store.view().index[1]: {"科室": "ICU"}})
+    assert [n["dept"] for n in tree_for(store).full] == ["ICU"]
@@ -0,0 +1,91 @@
+import pytest
+from modules import auth
+from modules.settings import UserDirectory
+
+
+@pytest.fixture
+def users(backend, monkeypatch):
+    monkeypatch.setenv("APP_SECRET_KEY", "test-secret")
+    monkeypatch.setattr(auth, "_token_cache", {})
+    return UserDirectory(backend, {"u1": {"password": auth.hash_password("pw"), "name": "张三", "perms": ["资产档案"]}})
+
+
+def _login(users, uid="u1"):
+    return auth.issue_session(uid, users.get(uid))
+
+
+def test_password_hash_roundtrip():
+    stored = auth.hash_password("秘密")
+    assert stored.startswith("scrypt$")
+    assert auth.verify_password(stored, "秘密") == (True, False)
+    assert auth.verify_password(stored, "错误")[0] is False
+    # 旧版明文密码能匹配，但需要升级
+    assert auth.verify_password("123", "123") == (True, True)
+
+
+def test_authenticate_upgrades_plaintext(users):
+    users.update("u2", password="123", name="李四")
+    assert auth.authenticate(users, "u2", "bad") is None
+    assert auth.authenticate(users, "u2", "123")["name"] == "李四"
+    assert users.get("u2")["password"].startswith("scrypt$")
+    assert auth.authenticate(users, "u2", "123") is not None
+
+
+def test_session_roundtrip(users):
+    session = auth.verify_session(_login(users), users)
+    assert session == {"uid": "u1", "name": "张三", "perms": ["资产档案"]}
+
+
+def test_tampered_and_foreign_tokens_rejected(users, monkeypatch):
+    token = _login(users)
+    assert auth.verify_session(token[:-2] + ("AA" if token[-2:] != "AA" else "BB"), users) is None
+    assert auth.verify_session("", users) is None
+    monkeypatch.setenv("APP_SECRET_KEY", "other-secret")
+    assert auth.verify_session(token, users) is None
+
+
+def test_expired_token_rejected(users, monkeypatch):
+    token = _login(users)
+    monkeypatch.setattr(auth, "SESSION_MAX_AGE", -1)
+    assert auth.verify_session(token, users) is None
+
+
+def test_end_sessions_revokes_cached_tokens(users):
+    token = _login(users)
+    assert auth.verify_session(token, users) is not None
+    auth.end_sessions(users, "u1")
+    assert auth.verify_session(token, users) is None
+    # 重新登录拿到的新令牌可用
+    assert auth.verify_session(_login(users), users) is not None
+
+
+def test_permission_change_is_not_served_from_cache(users):
+    token = _login(users)
+    assert auth.verify_session(token, users)["perms"] == ["资产档案"]
+    # 其他进程改了账号表 (绕过本进程的 UserDirectory)
+    users.backend.update_user("u1", {"perms": ["资产档案", "维修管理"]})
+    assert auth.verify_session(token, users)["perms"] == ["资产档案", "维修管理"]
+    auth.end_sessions(users, "u1", perms=[])
+    assert auth.verify_session(token, users) is None
+
+
+def test_logout_revokes_only_that_token(users, backend):
+    phone, laptop = _login(users), _login(users)
+    assert auth.verify_session(phone, users) and auth.verify_session(laptop, users)
+    auth.end_session(users, phone)
+    assert auth.verify_session(phone, users) is None
+    assert auth.verify_session(laptop, users) is not None
+    # 另一个进程 (独立的账号缓存) 同样拒绝已退出的令牌
+    other = UserDirectory(backend, {})
+    assert auth.verify_session(phone, other) is None and auth.verify_session(laptop, other) is not None
+    auth.end_session(users, "garbage")
+    assert auth.verify_session(laptop, users) is not None
+
+
+def test_revoked_list_drops_expired_entries(users):
+    # 早已过期的吊销记录在下一次退出时清理掉
+    users.update("u1", revoked={"old": 1.0})
+    token = _login(users)
+    auth.end_session(users, token)
+    revoked = users.get("u1")["revoked"]
+    assert list(revoked) == [auth._serializer().loads(token)["sid"]]
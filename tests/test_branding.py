@@ -0,0 +1,47 @@
+import base64
+import io
+import os
+from PIL import Image
+from modules import branding
+from modules.branding import JPEG_PATH, LOGO_PATH, logo_data_uri, migrate_inline_logo, remove_logo, save_logo
+
+
+def _image(mode, size, color, fmt="PNG"):
+    buf = io.BytesIO()
+    Image.new(mode, size, color).save(buf, fmt)
+    return buf.getvalue()
+
+
+def test_opaque_logo_saved_as_scaled_jpeg(workdir, monkeypatch):
+    monkeypatch.setattr(branding, "_uri_cache", {})
+    version = save_logo(_image("RGB", (1600, 400), (200, 30, 30), "JPEG"))
+    with Image.open(JPEG_PATH) as img:
+        assert img.format == "JPEG" and img.size == (360, 90)
+    assert not os.path.exists(LOGO_PATH)
+    uri = logo_data_uri(version)
+    assert uri.startswith("data:image/jpeg;base64,") and logo_data_uri(version) is uri
+
+
+def test_transparent_logo_stays_png(workdir, monkeypatch):
+    monkeypatch.setattr(branding, "_uri_cache", {})
+    save_logo(_image("RGB", (100, 100), "white", "JPEG"))
+    version = save_logo(_image("RGBA", (100, 300), (0, 0, 0, 0)))
+    with Image.open(LOGO_PATH) as img:
+        assert img.format == "PNG" and img.size == (60, 180)
+    # 换图后旧格式的文件被清掉，不会被误用
+    assert not os.path.exists(JPEG_PATH)
+    assert logo_data_uri(version).startswith("data:image/png;base64,")
+    remove_logo()
+    assert not os.path.exists(LOGO_PATH) and logo_data_uri("") is None
+
+
+def test_migrate_inline_logo(workdir):
+    assert migrate_inline_logo({"logo_version": "abc"}) is False
+    config = {"logo_base64": base64.b64encode(_image("RGB", (40, 40), "blue")).decode()}
+    assert migrate_inline_logo(config) is True
+    assert "logo_base64" not in config and config["logo_version"] and os.path.exists(JPEG_PATH)
+    # 旧配置里损坏的图片不阻塞启动，只是清掉 Logo
+    config = {"logo_base64": "not-an-image"}
+    assert migrate_inline_logo(config) is True and config["logo_version"] == ""
+    config = {"logo_base64": ""}
+    assert migrate_inline_logo(config) is True and "logo_version" not in config
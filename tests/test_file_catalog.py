@@ -0,0 +1,69 @@
+import os
+import shutil
+from openpyxl import Workbook
+from modules import file_catalog
+from modules.file_catalog import FileCatalog, extract_text
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "work_files")
+FORM = "梅州市第三人民医院医疗设备调拨审批表.docx"
+CORRUPT_XLS = b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1" + b"junk" * 200
+
+
+def _write(path, text="", data=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if data is not None:
+        path.write_bytes(data)
+    else:
+        path.write_text(text, encoding="utf-8")
+
+
+def test_rescans_only_when_directories_change(workdir, monkeypatch):
+    root = workdir / "lib"
+    _write(root / "a.txt", "甲")
+    _write(root / "sub" / "b.txt", "乙")
+    _write(root / ".hidden", "x")
+    hashed = []
+    real = file_catalog._file_hash
+    monkeypatch.setattr(file_catalog, "_file_hash", lambda p: hashed.append(p) or real(p))
+    catalog = FileCatalog(str(root))
+    assert [(e["folder"], e["name"]) for e in catalog.entries()] == [("", "a.txt"), ("sub", "b.txt")]
+    assert catalog.folders() == ["", "sub"]
+    first = catalog.entries()
+    assert catalog.entries() is first and len(hashed) == 2
+    # 子目录里新增文件：只有该文件需要计算哈希
+    _write(root / "sub" / "c.txt", "丙")
+    assert [e["name"] for e in catalog.entries()] == ["a.txt", "b.txt", "c.txt"]
+    assert len(hashed) == 3
+    (root / "a.txt").unlink()
+    assert [e["rel"] for e in catalog.entries()] == [os.path.join("sub", "b.txt"), os.path.join("sub", "c.txt")]
+
+
+def test_extract_text(workdir):
+    shutil.copyfile(os.path.join(TEMPLATES, FORM), workdir / FORM)
+    assert "设备名称" in extract_text(str(workdir / FORM), ".docx").replace(" ", "")
+    wb = Workbook()
+    wb.active.append(["设备", "监护仪", 3])
+    wb.save(workdir / "t.xlsx")
+    assert extract_text(str(workdir / "t.xlsx"), ".xlsx") == "设备 监护仪 3"
+    # 损坏的文件当作没有文本
+    _write(workdir / "bad.xls", data=CORRUPT_XLS)
+    _write(workdir / "bad.docx", data=b"PK\x03\x04 broken")
+    assert extract_text(str(workdir / "bad.xls"), ".xls") == ""
+    assert extract_text(str(workdir / "bad.docx"), ".docx") == ""
+    assert extract_text(str(workdir / "missing.txt"), ".txt") == ""
+
+
+def test_search(workdir):
+    root = workdir / "lib"
+    _write(root / "维修记录.txt", "ICU 呼吸机 故障")
+    _write(root / "制度" / "采购制度.txt", "监护仪 采购流程")
+    _write(root / "制度" / "坏表.xls", data=CORRUPT_XLS)
+    catalog = FileCatalog(str(root))
+    assert [e["name"] for e in catalog.search("制度")] == ["采购制度.txt"]
+    assert catalog.search("监护仪") == []
+    assert [e["name"] for e in catalog.search("监护仪", full_text=True)] == ["采购制度.txt"]
+    assert [e["name"] for e in catalog.search("icu", full_text=True)] == ["维修记录.txt"]
+    assert [e["name"] for e in catalog.search(folder="制度", sort_by="size", descending=True)] == ["坏表.xls", "采购制度.txt"]
+    # 提取结果按内容哈希缓存到磁盘，新建的目录对象直接复用
+    assert os.listdir(file_catalog.TEXT_CACHE_DIR)
+    assert [e["name"] for e in FileCatalog(str(root)).search("采购", full_text=True)] == ["采购制度.txt"]
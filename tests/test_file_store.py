@@ -0,0 +1,53 @@
+import io
+import json
+import os
+import pytest
+from modules import file_store
+
+
+def _upload(name, data, user="u1"):
+    return file_store.store_upload("public", name, io.BytesIO(data), user)
+
+
+def _read(name):
+    with open(os.path.join(file_store.WORK_ROOT, "public", name), "rb") as f:
+        return f.read()
+
+
+def test_versions_and_unchanged(workdir):
+    assert _upload("制度.txt", b"v1")["version"] == 1
+    assert _upload("制度.txt", b"v2")["version"] == 2
+    same = _upload("制度.txt", b"v2")
+    assert same["status"] == "unchanged" and same["version"] == 2
+    assert _read("制度.txt") == b"v2"
+    history = file_store.versions("public", "制度.txt")
+    assert [h["user"] for h in history] == ["u1", "u1"]
+    with open(file_store.blob_path(history[0]["sha1"]), "rb") as f:
+        assert f.read() == b"v1"
+
+
+def test_same_content_is_deduped(workdir):
+    assert _upload("a.txt", b"same")["status"] == "stored"
+    assert _upload("b.txt", b"same")["status"] == "deduped"
+
+
+def test_first_upload_keeps_existing_file(workdir):
+    os.makedirs(os.path.join(file_store.WORK_ROOT, "public", "sub"))
+    with open(os.path.join(file_store.WORK_ROOT, "public", "sub", "旧.txt"), "wb") as f:
+        f.write(b"original")
+    result = _upload("sub/旧.txt", b"new")
+    assert result["version"] == 2
+    assert _read("sub/旧.txt") == b"new"
+    first = file_store.versions("public", "sub/旧.txt")[0]
+    with open(file_store.blob_path(first["sha1"]), "rb") as f:
+        assert f.read() == b"original"
+    assert file_store.versioned_files("public") == {"sub/旧.txt": 2}
+    with open(file_store.MANIFEST_PATH, encoding="utf-8") as f:
+        assert len(json.load(f)["public/sub/旧.txt"]) == 2
+
+
+def test_unsafe_names_rejected():
+    assert file_store.safe_name("/子目录//a.txt") == "子目录/a.txt"
+    for name in ("../x.txt", ".hidden", "a/../b", "  "):
+        with pytest.raises(ValueError):
+            file_store.safe_name(name)
@@ -0,0 +1,49 @@
+import pytest
+from modules.repair_store import STATUS_FLOW, RepairStateError, RepairStore, fields_from_asset
+
+
+def _submit(store, dept="ICU"):
+    return store.submit({"设备名称": "监护仪", "使用科室": dept, "故障描述": "黑屏", "无关字段": 1}, "张三")
+
+
+def test_status_flow_and_queue(backend):
+    store = RepairStore(backend)
+    a, b = _submit(store), _submit(store, dept="放射科")
+    assert a != b
+    assert store.get(a)["维修状态"] == "已提交" and store.get(a)["审批状态"] == "待审批"
+    assert store.advance(a, "李四", 分管领导审核意见="同意") == "已审批"
+    assert store.get(a)["分管领导审核意见"] == "同意" and store.get(a)["操作人"] == "李四"
+    assert set(store.work_queue(["已提交"])["单号"]) == {b}
+    assert set(store.work_queue(dept="ICU")["单号"]) == {a}
+    assert store.status_counts() == {"已提交": 1, "已审批": 1, "维修中": 0, "已关闭": 0}
+    # 每次流转追加一条快照，不改写历史
+    assert len(backend.read_maintenance()) == 3
+
+
+def test_invalid_transitions(backend):
+    store = RepairStore(backend)
+    with pytest.raises(RepairStateError):
+        store.advance("REQ-不存在", "张三")
+    no = _submit(store)
+    for status in STATUS_FLOW[1:]:
+        assert store.advance(no, "张三") == status
+    with pytest.raises(RepairStateError):
+        store.advance(no, "张三")
+    assert len(store.work_queue()) == 0
+
+
+def test_other_process_appends_are_picked_up(backend):
+    mine, other = RepairStore(backend), RepairStore(backend)
+    no = _submit(mine)
+    assert other.get(no)["维修状态"] == "已提交"
+    other.advance(no, "王五")
+    assert mine.get(no)["维修状态"] == "已审批"
+    assert mine.status_counts()["已审批"] == 1
+
+
+def test_fields_from_asset():
+    fields = fields_from_asset({"设备名称": "呼吸机", "型号": "SV300", "价值": 1000, "科室": "ICU",
+                                "验收日期": "2001.05"})
+    assert fields["设备规格型号"] == "SV300" and fields["使用科室"] == "ICU"
+    assert fields["是否在保修期内"] == "否"
+    assert fields_from_asset({"验收日期": None})["是否在保修期内"] is None
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+from modules import repair_store, storage
+from modules.asset_labels import sign_code
+from modules.storage import ASSET_COLUMNS
+
+SCRIPT = """
+from modules.scan_page import show_scan
+show_scan(TOKEN)
+"""
+
+
+@pytest.fixture
+def scan(backend, monkeypatch):
+    monkeypatch.setenv("APP_SECRET_KEY", "test-secret")
+    monkeypatch.setenv("STORAGE_BACKEND", backend.name)
+    monkeypatch.setattr(storage, "_instances", {backend.name: backend})
+    monkeypatch.setattr(repair_store, "_stores", {})
+    rows = [{"序号": 1, "科室": "ICU", "设备名称": "监护仪", "国标代码+地点+流水": "6821-ICU-001", "型号": "M1"}]
+    backend.replace_assets(pd.DataFrame(rows, columns=ASSET_COLUMNS))
+
+    def run(token):
+        at = AppTest.from_string(SCRIPT.replace("TOKEN", repr(token)), default_timeout=30)
+        at.run()
+        assert not at.exception
+        return at
+    return run
+
+
+def test_scan_shows_card_and_accepts_repair(scan, backend):
+    at = scan(sign_code("6821-ICU-001"))
+    assert at.subheader[0].value == "🏷️ 监护仪"
+    assert any("**型号**：M1" in m.value for m in at.markdown)
+    at.text_input[0].input("张三")
+    at.text_area[0].input("黑屏")
+    at.button[0].click().run()
+    assert at.success and not at.error
+    maint = backend.read_maintenance()
+    assert list(maint["设备编号"]) == ["6821-ICU-001"] and list(maint["故障描述"]) == ["黑屏"]
+
+
+def test_scan_rejects_bad_tokens(scan):
+    assert "篡改" in scan("6821-ICU-001.forged").error[0].value
+    assert "未在资产档案中找到" in scan(sign_code("6821-ICU-404")).warning[0].value
@@ -0,0 +1,52 @@
+import json
+import threading
+from modules.settings import ConfigStore, UserDirectory
+from modules.storage import CsvBackend, SqliteBackend
+
+
+def _run(*jobs):
+    threads = [threading.Thread(target=job) for job in jobs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_config_updates_merge_per_key(workdir):
+    path = str(workdir / "data/config.json")
+    # 两个实例相当于两个进程，各自持有缓存
+    a, b = ConfigStore(path, {"title": "默认"}), ConfigStore(path, {"title": "默认"})
+    assert a.get() == {"title": "默认"} and b.get() == {"title": "默认"}
+    _run(*[lambda i=i: (a if i % 2 else b).update({f"k{i}": i}) for i in range(20)])
+    data = a.get()
+    assert data == b.get() == {"title": "默认", **{f"k{i}": i for i in range(20)}}
+    assert b.update(remove=["title"]) == {f"k{i}": i for i in range(20)}
+    assert "title" not in a.get()
+    # 返回副本，页面上的临时修改不影响缓存
+    a.get()["k0"] = "改了"
+    assert a.get()["k0"] == 0
+
+
+def test_config_falls_back_to_default_on_bad_json(workdir):
+    path = workdir / "data/config.json"
+    path.write_text("{broken", encoding="utf-8")
+    store = ConfigStore(str(path), {"title": "默认"})
+    assert store.get() == {"title": "默认"}
+    store.update({"nav": "导航"})
+    assert json.loads(path.read_text(encoding="utf-8")) == {"title": "默认", "nav": "导航"}
+
+
+def test_user_updates_merge_per_account(backend, workdir):
+    default = {"admin": {"password": "123", "perms": []}}
+    # 第二个目录用独立的后端实例，模拟另一个进程
+    other = (CsvBackend(backend.equipment_path, backend.maintenance_path, backend.users_path)
+             if backend.name == "csv" else SqliteBackend(backend.db_path))
+    a, b = UserDirectory(backend, default), UserDirectory(other, default)
+    assert a.all() == b.all() == default
+    _run(*[lambda i=i: (a if i % 2 else b).update(f"u{i}", name=f"用户{i}") for i in range(10)],
+         lambda: a.update("admin", perms=["资产档案"]), lambda: b.update("admin", password="456"))
+    users = b.all()
+    assert set(users) == {"admin", *(f"u{i}" for i in range(10))}
+    assert users["admin"] == {"password": "456", "perms": ["资产档案"]}
+    # 另一个实例的缓存按后端签名失效
+    assert a.get("u9") == {"name": "用户9"} and a.all() == users
@@ -0,0 +1,130 @@
+import pandas as pd
+import pytest
+from modules.storage import ASSET_COLUMNS, CsvBackend, SqliteBackend, StaleDataError, migrate_to_sqlite
+
+
+def _order(no, status):
+    return {"单号": no, "设备名称": "监护仪", "维修状态": status, "使用科室": "ICU"}
+
+
+def test_read_maintenance_since_only_returns_new_rows(backend):
+    df, cursor, reset = backend.read_maintenance_since(None)
+    assert len(df) == 0 and not reset
+    backend.append_maintenance([_order("A", "已提交"), _order("B", "已提交")])
+    df, cursor, reset = backend.read_maintenance_since(cursor)
+    assert list(df["单号"]) == ["A", "B"]
+    df, cursor, _ = backend.read_maintenance_since(cursor)
+    assert len(df) == 0
+    backend.append_maintenance([_order("A", "已审批")])
+    df, cursor, reset = backend.read_maintenance_since(cursor)
+    assert list(df["维修状态"]) == ["已审批"] and not reset
+    assert len(backend.read_maintenance()) == 3
+
+
+def test_update_user_merges_single_account(backend):
+    users = backend.read_users({"admin": {"name": "管理员", "perms": ["后台管理"]}})
+    assert "admin" in users
+    sig = backend.users_signature()
+    backend.update_user("admin", {"perms": []})
+    backend.update_user("u2", {"name": "新员工"})
+    assert backend.users_signature() != sig
+    users = backend.read_users({})
+    assert users["admin"] == {"name": "管理员", "perms": []}
+    assert users["u2"] == {"name": "新员工"}
+
+
+def test_find_asset(backend):
+    df = pd.DataFrame([{"序号": 1, "设备名称": "监护仪", "设备SN码": "SN1"},
+                       {"序号": 2, "设备名称": "呼吸机", "设备SN码": "SN2"}], columns=ASSET_COLUMNS)
+    assert backend.find_asset("设备SN码", "SN1") is None
+    backend.replace_assets(df)
+    assert backend.find_asset("设备SN码", " SN2 ")["设备名称"] == "呼吸机"
+    assert backend.find_asset("设备SN码", "SN3") is None
+
+
+def test_sqlite_department_summary(workdir):
+    backend = SqliteBackend(str(workdir / "data/platform.db"))
+    df = pd.DataFrame([{"序号": i + 1, "科室": d, "价值": 10.0, "数量": 1} for i, d in enumerate("AABA")],
+                      columns=ASSET_COLUMNS)
+    backend.replace_assets(df)
+    summary = backend.department_summary()
+    assert summary.set_index("科室")["记录数"].to_dict() == {"A": 3, "B": 1}
+
+
+def test_migrate_to_sqlite(workdir):
+    source = CsvBackend(str(workdir / "data/equipment.csv"), str(workdir / "data/maintenance.csv"),
+                        str(workdir / "data/users.json"))
+    source.replace_assets(pd.DataFrame([{"序号": 1, "设备名称": "监护仪"}], columns=ASSET_COLUMNS))
+    source.append_maintenance([_order("A", "已提交")])
+    source.update_user("admin", {"name": "管理员"})
+    counts = migrate_to_sqlite(str(workdir / "data/platform.db"), source)
+    assert counts == {"equipment": 1, "maintenance": 1, "users": 1}
+    target = SqliteBackend(str(workdir / "data/platform.db"))
+    assert list(target.read_assets()["设备名称"]) == ["监护仪"]
+    assert target.read_users({})["admin"]["name"] == "管理员"
+
+
+def test_csv_cursor_resets_when_file_is_replaced(workdir):
+    backend = CsvBackend(str(workdir / "data/equipment.csv"), str(workdir / "data/maintenance.csv"),
+                         str(workdir / "data/users.json"))
+    backend.append_maintenance([_order("A", "已提交"), _order("B", "已提交")])
+    _, cursor, _ = backend.read_maintenance_since(None)
+    # 整体替换 (如手工整理后重新保存) 时从头读起
+    (workdir / "data/maintenance.csv").unlink()
+    backend.append_maintenance([_order("C", "已提交")])
+    df, _, reset = backend.read_maintenance_since(cursor)
+    assert reset and list(df["单号"]) == ["C"]
+
+
+def test_apply_asset_changes_checks_and_returns_signature(backend):
+    df = pd.DataFrame([{"序号": 1, "设备名称": "监护仪"}], columns=ASSET_COLUMNS)
+    backend.replace_assets(df)
+    sig = backend.asset_signature()
+    after = df.assign(设备名称="呼吸机")
+    new_sig = backend.apply_asset_changes(sig, after, {0: {"设备名称": "呼吸机"}}, None, [])
+    assert new_sig == backend.asset_signature() != sig
+    # 基于旧签名的第二次保存被拒绝，不覆盖前一次
+    with pytest.raises(StaleDataError):
+        backend.apply_asset_changes(sig, df, {0: {"设备名称": "监护仪"}}, None, [])
+    assert list(backend.read_assets()["设备名称"]) == ["呼吸机"]
+
+
+def test_concurrent_appends_during_header_upgrade(workdir):
+    from concurrent.futures import ThreadPoolExecutor
+    path = workdir / "data/maintenance.csv"
+    # 旧版表头缺少 单号 等新列
+    path.write_text("设备名称,维修状态\n旧设备,已完成\n", encoding="utf-8-sig")
+    backends = [CsvBackend(str(workdir / "data/equipment.csv"), str(path), str(workdir / "data/users.json"))
+                for _ in range(4)]
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda i: backends[i % 4].append_maintenance([_order(f"N{i}", "已提交")]), range(40)))
+    df = backends[0].read_maintenance()
+    assert len(df) == 41 and set(df["单号"].dropna()) == {f"N{i}" for i in range(40)}
+    assert df.loc[0, "设备名称"] == "旧设备"
+
+
+def test_csv_offset_index_is_shared_through_sidecar(workdir, monkeypatch):
+    from modules import storage
+    paths = [str(workdir / "data" / name) for name in ("equipment.csv", "maintenance.csv", "users.json")]
+    rows = [{"序号": i + 1, "设备名称": f"设备{i}", "国标代码+地点+流水": f"GB-{i}",
+             "备注": "多行\n备注" if i == 2 else None} for i in range(50)]
+    CsvBackend(*paths).replace_assets(pd.DataFrame(rows, columns=ASSET_COLUMNS))
+    read = []
+    real = storage._csv_records
+
+    def spy(f):
+        for record in real(f):
+            read.append(record[0])
+            yield record
+    monkeypatch.setattr(storage, "_csv_records", spy)
+    assert CsvBackend(*paths).find_asset("国标代码+地点+流水", "GB-3")["设备名称"] == "设备3"
+    assert len(read) > 50
+    # 另一个进程 (新实例) 直接读旁路索引，只读取命中的那一行
+    read.clear()
+    other = CsvBackend(*paths)
+    assert other.find_asset("国标代码+地点+流水", "GB-40")["设备名称"] == "设备40"
+    assert other.find_asset("国标代码+地点+流水", "GB-2")["备注"] == "多行\n备注"
+    assert len(read) == 2
+    # 文件改变后旁路索引失效，重新扫描
+    CsvBackend(*paths).replace_assets(pd.DataFrame(rows[:5], columns=ASSET_COLUMNS))
+    assert CsvBackend(*paths).find_asset("国标代码+地点+流水", "GB-40") is None